@@ -0,0 +1,145 @@
+"""
+activity_format の種目・トレーニング効果フォーマッターのマイクロベンチマーク。
+
+1万件の合成アクティビティ履歴に対して、呼び出しごとに変換表を組み立てていた
+旧実装（下に同梱）と、モジュール定数 + lru_cache の現実装の1回あたりのコストを比較する。
+結果が旧実装と一致することも確認する。
+
+使い方:
+  python scripts/bench_activity_format.py [件数]
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from activity_format import format_activity_type, format_training_effect  # noqa: E402
+
+
+TYPE_KEYS = [
+    "running", "treadmill_running", "trail_running", "cycling", "indoor_cycling", "walking",
+    "speed_walking", "strength_training", "yoga", "pilates", "barre", "indoor_rowing",
+    "rowing_v2", "hiking", "lap_swimming", "indoor_cardio", "breathwork", "", None,
+]
+NAMES = [
+    "Morning Run", "Easy Run", "Tempo Run", "Long Run", "Evening Walk", "Yoga Flow",
+    "Barre Class", "Full Body Stretch", "Meditation", "Ride", "無題", "",
+]
+TE_LABELS = [
+    "RECOVERY", "AEROBIC_BASE", "TEMPO", "LACTATE_THRESHOLD", "SPEED", "VO2MAX",
+    "ANAEROBIC_CAPACITY", "NO_BENEFIT", "UNKNOWN",
+]
+
+
+# ── 旧実装（比較用にそのまま残す） ──
+def legacy_format_activity_type(activity_type: str, activity_name: str = "") -> tuple[str, str]:
+    formatted_type = activity_type.replace('_', ' ').title() if activity_type else "Unknown"
+    activity_subtype = formatted_type
+    activity_type = formatted_type
+
+    activity_mapping = {
+        "Barre": "Strength", "Indoor Cardio": "Cardio", "Indoor Cycling": "Cycling",
+        "Indoor Rowing": "Rowing", "Speed Walking": "Walking", "Strength Training": "Strength",
+        "Treadmill Running": "Running"
+    }
+
+    if formatted_type == "Rowing V2":
+        activity_type = "Rowing"
+    elif formatted_type in ["Yoga", "Pilates"]:
+        activity_type = "Yoga/Pilates"
+        activity_subtype = formatted_type
+
+    if formatted_type in activity_mapping:
+        activity_type = activity_mapping[formatted_type]
+        activity_subtype = formatted_type
+
+    japanese_map = {
+        "Running": "ランニング", "Cycling": "サイクリング", "Walking": "ウォーキング",
+        "Strength": "筋トレ", "Yoga/Pilates": "ヨガ/ピラティス", "Stretching": "ストレッチ",
+        "Meditation": "瞑想", "Swimming": "スイミング", "Rowing": "ローイング",
+        "Hiking": "ハイキング", "Cardio": "有酸素運動", "Treadmill Running": "トレッドミル",
+        "Indoor Cycling": "室内サイクリング", "Yoga": "ヨガ", "Pilates": "ピラティス", "Barre": "バー"
+    }
+
+    if activity_name and "meditation" in activity_name.lower(): return "瞑想", "瞑想"
+    if activity_name and "barre" in activity_name.lower(): return "筋トレ", "バー"
+    if activity_name and "stretch" in activity_name.lower(): return "ストレッチ", "ストレッチ"
+
+    return japanese_map.get(activity_type, activity_type), japanese_map.get(activity_subtype, activity_subtype)
+
+
+def legacy_format_training_effect(training_effect_label: str) -> str:
+    # 画像にあるオプションをすべて網羅
+    label_map = {
+        "Recovery": "リカバリー",
+        "Aerobic Base": "ベース",
+        "Base": "ベース",
+        "Tempo": "テンポ",
+        "Lactate Threshold": "乳酸閾値",
+        "Threshold": "閾値",
+        "Speed": "スピード",
+        "Anaerobic": "無酸素",
+        "Sprint": "スプリント",
+        "Vo2 Max": "VO2max",  # VO2maxはそのまま
+        "Maintaining": "維持",
+        "Improving": "向上",
+        "Impacting": "影響あり",
+        "Highly Impacting": "高い影響",
+        "Overreaching": "オーバーリーチ",
+        "No Benefit": "効果なし",
+        "Unknown": "不明"
+    }
+    # _ を半角スペースにしてタイトル形式にする（例: AEROBIC_BASE -> Aerobic Base）
+    formatted = training_effect_label.replace('_', ' ').title()
+    return label_map.get(formatted, formatted)
+
+
+def synthetic_history(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [
+        (rng.choice(TYPE_KEYS), rng.choice(NAMES), rng.choice(TE_LABELS))
+        for _ in range(n)
+    ]
+
+
+def _per_call_us(func, history, repeat: int = 5) -> float:
+    best = min(timeit.repeat(lambda: func(history), number=1, repeat=repeat))
+    return best / len(history) * 1e6
+
+
+def _run_legacy(history):
+    for type_key, name, te in history:
+        legacy_format_activity_type(type_key, name)
+        legacy_format_training_effect(te)
+
+
+def _run_current(history):
+    for type_key, name, te in history:
+        format_activity_type(type_key, name)
+        format_training_effect(te)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    history = synthetic_history(n)
+
+    mismatches = [
+        h for h in history
+        if legacy_format_activity_type(h[0], h[1]) != format_activity_type(h[0], h[1])
+        or legacy_format_training_effect(h[2]) != format_training_effect(h[2])
+    ]
+    if mismatches:
+        print(f"❌ 旧実装と結果が一致しません: {mismatches[:5]}")
+        sys.exit(1)
+    print(f"✓ {n} 件すべて旧実装と同じ結果")
+
+    before = _per_call_us(_run_legacy, history)
+    after = _per_call_us(_run_current, history)
+    print(f"  旧実装: {before:.2f} µs/activity")
+    print(f"  現実装: {after:.2f} µs/activity  ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,9 +17,19 @@ import os
 import re
 import sys
 import time
+from datetime import datetime, timedelta, timezone
 
 import requests
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from local_cache import cache_path, load_json, save_json  # noqa: E402
+from garmin_endpoints import (  # noqa: E402
+    HEALTH_DAILY_ENDPOINTS, HEALTH_RACE_PREDICTIONS, HEALTH_RANGE_ENDPOINTS, SOCIAL_PROFILE,
+    range_chunks, split_range_by_date,
+)
+from health_store import HealthStore  # noqa: E402
+from prefetch_store import DETAIL_DROP_KEYS, PREFETCH_DB, PrefetchWriter, health_key  # noqa: E402
+
 EMAIL = os.environ.get("GARMIN_EMAIL", "")
 PASSWORD = os.environ.get("GARMIN_PASSWORD", "")
 
@@ -31,6 +41,16 @@ SSO_BASE = "https://sso.garmin.com/sso"
 CONNECT_BASE = "https://connect.garmin.com"
 SESSION_COOKIE_FILE = "/tmp/garmin_session_cookies.txt"
 
+# 取得済みスプリット・詳細・天気の永続キャッシュ（~/.garmin_cache。終わった活動の内容は変わらない）
+# 実行ごとに今回の対象活動の分だけに絞って保存するので、履歴が増えても大きくならない
+PREFETCH_SPLITS_CACHE = cache_path("prefetch_splits.json")
+PREFETCH_DETAILS_CACHE = cache_path("prefetch_details.json")
+PREFETCH_WEATHER_CACHE = cache_path("prefetch_weather.json")
+# ブラウザ内で同時に実行するスプリット取得数と、429 時の再試行回数・初回待機
+PREFETCH_CONCURRENCY = int(os.environ.get("GARMIN_PREFETCH_CONCURRENCY", "6"))
+PREFETCH_MAX_RETRIES = 4
+PREFETCH_BACKOFF_MS = 2000
+
 UA = (
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
     "AppleWebKit/537.36 (KHTML, like Gecko) "
@@ -532,22 +552,228 @@ def get_jwt_via_playwright(ticket_url: str, sso_cookies: dict) -> dict:
         return result
 
 
+def _browser_fetch_json(page, spa_headers: dict, tasks: list, drop_keys: list = ()) -> tuple:
+    """ブラウザ内のワーカープールで tasks = [(id, [url, ...]), ...] を取得する。
+
+    id ごとに url を順に試し、最初にデータが返った JSON を採用する。最大 PREFETCH_CONCURRENCY 件を
+    同時に取得し、429 は Retry-After（なければ指数バックオフ + ジッター）だけ待って再試行する。
+    いずれかの url が 2xx を返した id だけを ([(id, data), ...], 429 の回数) で返す
+    （データが空なら data は {}）。
+    """
+    tasks_js = json.dumps([{"id": tid, "urls": urls} for tid, urls in tasks])
+    result = page.evaluate(f"""
+        async () => {{
+            const tasks = {tasks_js};
+            const dropKeys = {json.dumps(list(drop_keys))};
+            const headers = {json.dumps(spa_headers)};
+            const concurrency = {PREFETCH_CONCURRENCY};
+            const maxRetries = {PREFETCH_MAX_RETRIES};
+            const backoffMs = {PREFETCH_BACKOFF_MS};
+            const sleep = (ms) => new Promise(r => setTimeout(r, ms));
+            let throttled = 0;
+
+            const get = async (url) => {{
+                for (let attempt = 0; ; attempt++) {{
+                    const r = await fetch(url, {{credentials:'include', headers}});
+                    if (r.status !== 429 || attempt >= maxRetries) return r;
+                    throttled++;
+                    const retryAfter = parseFloat(r.headers.get('Retry-After'));
+                    const wait = isNaN(retryAfter) ? backoffMs * 2 ** attempt : retryAfter * 1000;
+                    await sleep(wait + Math.random() * 500);
+                }}
+            }};
+
+            const out = [];
+            let next = 0;
+            const worker = async () => {{
+                while (next < tasks.length) {{
+                    const task = tasks[next++];
+                    try {{
+                        // 先頭の URL を優先し、データが無ければ次を試す
+                        let data = null;
+                        let answered = false;
+                        for (const url of task.urls) {{
+                            const r = await get(url);
+                            if (!r.ok) continue;
+                            answered = true;
+                            const text = await r.text();
+                            const d = text ? JSON.parse(text) : null;
+                            if (d) {{ data = d; break; }}
+                        }}
+                        if (data && typeof data === 'object' && !Array.isArray(data)) {{
+                            for (const k of dropKeys) delete data[k];
+                        }}
+                        if (answered) out.push({{id: task.id, data: data || {{}}}});
+                    }} catch(e) {{}}
+                }}
+            }};
+            await Promise.all(Array.from({{length: Math.min(concurrency, tasks.length)}}, worker));
+            return {{out, throttled}};
+        }}
+    """) or {}
+    return [(item["id"], item["data"]) for item in result.get("out", [])], result.get("throttled", 0)
+
+
+def _prefetch_activity_endpoint(page, spa_headers: dict, activity_ids: list, endpoints: list,
+                                label: str, cache_file: str, store: PrefetchWriter, kind: str,
+                                drop_keys: list = (), window_ids: list = None) -> int:
+    """activityId ごとに endpoints を順に試し、最初に返った JSON をプリフェッチストアの kind に追記する。
+
+    取得は _browser_fetch_json（ブラウザ内ワーカープール + 429 の再試行）で行う。
+    cache_file にある ID は fetch せず、新しく取得した分はキャッシュに追加する。
+    空のレスポンス（室内ランの天気など）も {} として保存し、次回は再取得しない。
+    キャッシュは最後に1回だけ、window_ids（省略時は activity_ids）の分に絞って書き直す
+    （対象期間から外れた活動は消える）。
+    ストアにはチャンクごとに書くので、途中で落ちてもそこまでの分は残る。
+    ストアに書いた（空でない）件数を返す。
+    """
+    cache = load_json(cache_file, {})
+    cached_ids = [aid for aid in activity_ids if aid in cache]
+    pending_ids = [aid for aid in activity_ids if aid not in cache]
+    # 空の結果はキャッシュ用の印なのでストアには書かない
+    stored = store.append(kind, ((aid, cache[aid]) for aid in cached_ids if cache[aid]))
+    print(f"  → {label}: 対象 {len(activity_ids)} 件 (キャッシュ {len(cached_ids)} 件, "
+          f"取得 {len(pending_ids)} 件, 同時 {PREFETCH_CONCURRENCY})...")
+
+    # 進捗表示のため CHUNK_SIZE 件ごとに evaluate を分ける
+    CHUNK_SIZE = 50
+    throttled = 0
+    try:
+        for chunk_start in range(0, len(pending_ids), CHUNK_SIZE):
+            chunk_ids = pending_ids[chunk_start:chunk_start + CHUNK_SIZE]
+            tasks = [
+                (aid, [f"/gc-api/activity-service/activity/{aid}{ep}" for ep in endpoints])
+                for aid in chunk_ids
+            ]
+            try:
+                items, chunk_throttled = _browser_fetch_json(page, spa_headers, tasks, drop_keys)
+                throttled += chunk_throttled
+                for aid, data in items:
+                    cache[aid] = data
+                stored += store.append(kind, ((aid, data) for aid, data in items if data))
+                print(f"  ✓ {label} {min(chunk_start + CHUNK_SIZE, len(pending_ids))}/{len(pending_ids)} 件処理")
+            except Exception as e:
+                print(f"  ⚠ {label}取得エラー (start={chunk_start}): {e}")
+    finally:
+        keep = set(activity_ids if window_ids is None else window_ids)
+        try:
+            save_json(cache_file, {aid: data for aid, data in cache.items() if aid in keep})
+        except Exception as e:
+            print(f"  ⚠ {label}キャッシュ保存失敗: {e}")
+    if throttled:
+        print(f"  ⚠ {label}取得で 429 を {throttled} 回受信（待機して再試行済み）")
+    return stored
+
+
+def _health_prefetch_dates() -> list:
+    """本体スクリプトがこの実行で取得するヘルスの日付（表示期間 + バックフィル）を古い順で返す。
+
+    本体と同じ ~/.garmin_cache/health.json と GARMIN_HEALTH_DAYS から同じ規則で求める。
+    """
+    today = datetime.now(timezone(timedelta(hours=9))).date()
+    health_days = int(os.environ.get("GARMIN_HEALTH_DAYS", "7"))
+    return HealthStore().prefetch_dates(today, health_days)
+
+
+def prefetch_health_data(page, spa_headers: dict, store: PrefetchWriter) -> int:
+    """ヘルス指標（11指標 × 対象日 + レース予測）を取得してストアの health に書く。書いた件数を返す。
+
+    応答のあった指標は空でも {} として書く（GarminPreloadedClient は「取得済みで空」と
+    「取得していない」を区別し、後者は取得失敗として扱う）。
+    """
+    dates = _health_prefetch_dates()
+    print(f"  → ヘルスデータ: {len(dates)} 日分"
+          + (f" ({dates[0]} 〜 {dates[-1]})" if dates else ""))
+
+    display_name = ""
+    try:
+        items, _ = _browser_fetch_json(
+            page, spa_headers, [("profile", ["/gc-api" + SOCIAL_PROFILE])],
+        )
+        if items:
+            display_name = items[0][1].get("displayName") or ""
+    except Exception as e:
+        print(f"  ⚠ displayName 取得エラー: {e}")
+    if display_name:
+        store.append("health", [(health_key("profile"), {"displayName": display_name})])
+    else:
+        print("  ⚠ displayName 未取得のため RHR・睡眠・レース予測をスキップ")
+
+    def _url(path: str, **params) -> str:
+        return "/gc-api" + path.format(display_name=display_name, **params)
+
+    tasks = []
+    for date in dates:
+        for metric, path in HEALTH_DAILY_ENDPOINTS.items():
+            if "{display_name}" in path and not display_name:
+                continue
+            tasks.append((health_key(metric, date.isoformat()), [_url(path, date=date.isoformat())]))
+    # 期間 API は連続した日付を最大 28 日ずつ（飛んでいる日は別の区間）
+    for metric, (path, _date_key) in HEALTH_RANGE_ENDPOINTS.items():
+        for chunk in range_chunks(dates):
+            start, end = chunk[0].isoformat(), chunk[-1].isoformat()
+            tasks.append((f"{metric}:{start}:{end}", [_url(path, start=start, end=end)]))
+    if display_name:
+        tasks.append((health_key("race_predictions"), [_url(HEALTH_RACE_PREDICTIONS)]))
+
+    stored = 0
+    throttled = 0
+    CHUNK_SIZE = 50
+    for chunk_start in range(0, len(tasks), CHUNK_SIZE):
+        try:
+            items, chunk_throttled = _browser_fetch_json(
+                page, spa_headers, tasks[chunk_start:chunk_start + CHUNK_SIZE],
+            )
+        except Exception as e:
+            print(f"  ⚠ ヘルスデータ取得エラー (start={chunk_start}): {e}")
+            continue
+        throttled += chunk_throttled
+        records = []
+        for task_id, data in items:
+            metric, _, span = task_id.partition(":")
+            if metric in HEALTH_RANGE_ENDPOINTS and span.count(":") == 1:
+                # 期間の結果は日付キーで日ごとに分ける（応答のあった期間の日は空でも書く）
+                start, end = span.split(":")
+                chunk = [d for d in dates if start <= d.isoformat() <= end]
+                by_date = split_range_by_date(data, HEALTH_RANGE_ENDPOINTS[metric][1], chunk)
+                records.extend((health_key(metric, date_str), entry) for date_str, entry in by_date.items())
+            else:
+                records.append((task_id, data))
+        stored += store.append("health", records)
+        print(f"  ✓ ヘルスデータ {min(chunk_start + CHUNK_SIZE, len(tasks))}/{len(tasks)} リクエスト処理")
+    if throttled:
+        print(f"  ⚠ ヘルスデータ取得で 429 を {throttled} 回受信（待機して再試行済み）")
+    return stored
+
+
 def prefetch_garmin_data(page, activities_limit: int = None) -> bool:
     if activities_limit is None:
         activities_limit = int(os.environ.get("GARMIN_ACTIVITIES_FETCH_LIMIT", "200"))
     """
     Playwright のブラウザコンテキストから活動データを事前取得して
-    /tmp/garmin_prefetch.json に保存する。
+    プリフェッチストア（/tmp/garmin_prefetch.db）に取得したそばから書き込む。
 
     SPA が自然に行う最初の API コールをインターセプトし、
     そのリクエストヘッダーをキャプチャして後続のページネーションに使用する。
     """
     print("\n[データ事前取得] SPA API コールをインターセプト中...")
 
-    intercepted_activities: list = []
-    intercepted_splits: dict = {}
+    try:
+        store = PrefetchWriter()
+    except Exception as e:
+        print(f"  ✗ プリフェッチストア作成失敗 ({PREFETCH_DB}): {e}")
+        return False
+
+    intercepted_activities: list = []   # ページネーション位置と対象 ID の決定に使う
+    intercepted_split_ids: set = set()
     spa_request_headers: dict = {}  # SPA が使うリクエストヘッダー（後続 fetch に再利用）
 
+    def _add_activities(data: list) -> None:
+        # 取得件数の上限を超えた分はストアに書かない
+        room = max(activities_limit - len(intercepted_activities), 0)
+        store.append("activities", ((a.get("activityId"), a) for a in data[:room]))
+        intercepted_activities.extend(data)
+
     def _capture_response(response):
         try:
             url = response.url
@@ -561,7 +787,7 @@ def prefetch_garmin_data(page, activities_limit: int = None) -> bool:
                 try:
                     data = response.json()
                     if isinstance(data, list):
-                        intercepted_activities.extend(data)
+                        _add_activities(data)
                         print(f"  ✓ intercepted: +{len(data)} (total {len(intercepted_activities)})")
                 except Exception:
                     pass
@@ -570,7 +796,8 @@ def prefetch_garmin_data(page, activities_limit: int = None) -> bool:
                     aid = path.split("/activity/")[1].split("/")[0]
                     data = response.json()
                     if data:
-                        intercepted_splits[aid] = data
+                        store.append("splits", [(aid, data)])
+                        intercepted_split_ids.add(aid)
                 except Exception:
                     pass
         except Exception:
@@ -617,7 +844,7 @@ def prefetch_garmin_data(page, activities_limit: int = None) -> bool:
                     break
                 if not isinstance(result, list) or len(result) == 0:
                     break
-                intercepted_activities.extend(result)
+                _add_activities(result)
                 print(f"  ✓ ページネーション: +{len(result)} (total {len(intercepted_activities)})")
                 if len(result) < 50:
                     break
@@ -638,7 +865,7 @@ def prefetch_garmin_data(page, activities_limit: int = None) -> bool:
             except Exception:
                 break
 
-    # ── ランニング活動のスプリット（ラップ）を取得 ───────────────────────────────
+    # ── スプリット（ラップ）・詳細・天気を取得 ───────────────────────────────
     # GarminPreloadedClient はラップが必須。ブラウザの SPA ヘッダーで直接 fetch する。
     if spa_request_headers and intercepted_activities:
         running_ids = [
@@ -647,69 +874,43 @@ def prefetch_garmin_data(page, activities_limit: int = None) -> bool:
             if a.get("activityId") and isinstance(a.get("activityType"), dict) and
             "run" in (a["activityType"].get("typeKey") or "").lower()
         ]
-        print(f"  → ランニング {len(running_ids)} 件のスプリット(ラップ)を取得中...")
-        headers_js_splits = json.dumps(spa_request_headers)
-
-        # 20件ずつバッチ処理（サーバー負荷を抑えつつ高速化）
-        # /splits → /typedsplits の順に試す（新旧APIどちらかが返せばOK）
-        BATCH_SIZE = 20
-        for batch_start in range(0, len(running_ids), BATCH_SIZE):
-            batch_ids = running_ids[batch_start:batch_start + BATCH_SIZE]
-            ids_js = json.dumps(batch_ids)
-            try:
-                batch_results = page.evaluate(f"""
-                    async () => {{
-                        const ids = {ids_js};
-                        const headers = {headers_js_splits};
-                        const out = [];
-                        for (const id of ids) {{
-                            try {{
-                                // /splits を優先し、失敗時は /typedsplits を試す
-                                let data = null;
-                                for (const ep of ['/splits', '/typedsplits']) {{
-                                    const r = await fetch(
-                                        `/gc-api/activity-service/activity/${{id}}${{ep}}`,
-                                        {{credentials:'include', headers}}
-                                    );
-                                    if (r.ok) {{
-                                        const d = await r.json();
-                                        if (d) {{ data = d; break; }}
-                                    }}
-                                }}
-                                if (data) out.push({{id, data}});
-                            }} catch(e) {{}}
-                        }}
-                        return out;
-                    }}
-                """)
-                for item in (batch_results or []):
-                    if item.get("data"):
-                        intercepted_splits[item["id"]] = item["data"]
-            except Exception as e:
-                print(f"  ⚠ スプリットバッチ取得エラー (start={batch_start}): {e}")
-        print(f"  ✓ {len(intercepted_splits)} 件のスプリット取得完了")
+        split_count = len(intercepted_split_ids) + _prefetch_activity_endpoint(
+            page, spa_request_headers, [aid for aid in running_ids if aid not in intercepted_split_ids],
+            ["/splits", "/typedsplits"], "スプリット(ラップ)", PREFETCH_SPLITS_CACHE, store, "splits",
+            window_ids=running_ids,
+        )
+        print(f"  ✓ {split_count} 件のスプリット取得完了")
+
+        # 詳細（GAP・ダイナミクス等）と天気は全活動分。enrich 時に Python から再取得しなくて済むようにする
+        all_ids = [str(a.get("activityId")) for a in intercepted_activities[:activities_limit] if a.get("activityId")]
+        _prefetch_activity_endpoint(
+            page, spa_request_headers, all_ids,
+            ["/details?maxChartSize=2000&maxPolylineSize=4000"], "詳細", PREFETCH_DETAILS_CACHE,
+            store, "details", drop_keys=list(DETAIL_DROP_KEYS),
+        )
+        _prefetch_activity_endpoint(
+            page, spa_request_headers, all_ids, ["/weather"], "天気", PREFETCH_WEATHER_CACHE,
+            store, "weather",
+        )
+        # ヘルスデータ（本体の fetch_health_window が使う指標と日付）
+        try:
+            prefetch_health_data(page, spa_request_headers, store)
+        except Exception as e:
+            print(f"  ⚠ ヘルスデータ事前取得エラー: {e}")
     else:
-        print("  ⚠ SPA ヘッダー未取得のためスプリットをスキップ")
+        print("  ⚠ SPA ヘッダー未取得のためスプリット・詳細・天気・ヘルスをスキップ")
 
-    print(f"  → 合計: {len(intercepted_activities)} activities, {len(intercepted_splits)} splits")
+    print(f"  → 合計: {len(intercepted_activities)} activities, {store.counts['splits']} splits, "
+          f"{store.counts['details']} details, {store.counts['weather']} weather, "
+          f"{store.counts['health']} health")
 
+    store.close()
     if not intercepted_activities:
         print("  ✗ アクティビティデータが取得できませんでした")
         return False
 
-    prefetch = {
-        "activities": intercepted_activities[:activities_limit],
-        "splits": intercepted_splits,
-        "details": {},
-    }
-    try:
-        with open("/tmp/garmin_prefetch.json", "w") as pf:
-            json.dump(prefetch, pf)
-        print(f"  ✓ /tmp/garmin_prefetch.json に保存 ({len(prefetch['activities'])} activities)")
-        return True
-    except Exception as e:
-        print(f"  ✗ 保存失敗: {e}")
-        return False
+    print(f"  ✓ {PREFETCH_DB} に保存済み ({store.counts['activities']} activities)")
+    return True
 
 
 def test_cookies(cookies: dict) -> bool:
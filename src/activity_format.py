@@ -0,0 +1,112 @@
+"""
+アクティビティの表示用フォーマッター（種目の日本語化・トレーニング効果・ペース・タイム）。
+
+activity_record.ActivityRecord の構築と、ラップ整形（fetch_and_format_laps）から使う。
+変換表はモジュール読み込み時に1回だけ作り、種目・トレーニング効果の判定結果は lru_cache で再利用する。
+"""
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Tuple
+
+
+# Garmin の種目名（タイトル形式）→ 集計用の種目
+ACTIVITY_TYPE_MAP = MappingProxyType({
+    "Barre": "Strength", "Indoor Cardio": "Cardio", "Indoor Cycling": "Cycling",
+    "Indoor Rowing": "Rowing", "Speed Walking": "Walking", "Strength Training": "Strength",
+    "Treadmill Running": "Running", "Rowing V2": "Rowing",
+    "Yoga": "Yoga/Pilates", "Pilates": "Yoga/Pilates",
+})
+
+ACTIVITY_TYPE_JP = MappingProxyType({
+    "Running": "ランニング", "Cycling": "サイクリング", "Walking": "ウォーキング",
+    "Strength": "筋トレ", "Yoga/Pilates": "ヨガ/ピラティス", "Stretching": "ストレッチ",
+    "Meditation": "瞑想", "Swimming": "スイミング", "Rowing": "ローイング",
+    "Hiking": "ハイキング", "Cardio": "有酸素運動", "Treadmill Running": "トレッドミル",
+    "Indoor Cycling": "室内サイクリング", "Yoga": "ヨガ", "Pilates": "ピラティス", "Barre": "バー"
+})
+
+# アクティビティ名に含まれていれば種目より優先する語（先に一致したものを使う）
+_NAME_OVERRIDES = (
+    ("meditation", ("瞑想", "瞑想")),
+    ("barre", ("筋トレ", "バー")),
+    ("stretch", ("ストレッチ", "ストレッチ")),
+)
+
+TRAINING_MESSAGE_JP = (
+    ('NO_', '効果なし'), ('MINOR_', 'わずかな効果'), ('RECOVERY_', 'リカバリー'),
+    ('MAINTAINING_', '維持'), ('IMPROVING_', '向上'), ('IMPACTING_', '影響あり'),
+    ('HIGHLY_', '高い影響'), ('OVERREACHING_', 'オーバーリーチ'),
+)
+
+# 画像にあるオプションをすべて網羅
+TRAINING_EFFECT_JP = MappingProxyType({
+    "Recovery": "リカバリー",
+    "Aerobic Base": "ベース",
+    "Base": "ベース",
+    "Tempo": "テンポ",
+    "Lactate Threshold": "乳酸閾値",
+    "Threshold": "閾値",
+    "Speed": "スピード",
+    "Anaerobic": "無酸素",
+    "Sprint": "スプリント",
+    "Vo2 Max": "VO2max",  # VO2maxはそのまま
+    "Maintaining": "維持",
+    "Improving": "向上",
+    "Impacting": "影響あり",
+    "Highly Impacting": "高い影響",
+    "Overreaching": "オーバーリーチ",
+    "No Benefit": "効果なし",
+    "Unknown": "不明"
+})
+
+
+def _name_flag(activity_name) -> int:
+    """_NAME_OVERRIDES のうち名前に含まれる最初の語の番号（なければ -1）。"""
+    if activity_name:
+        lowered = activity_name.lower()
+        for i, (word, _) in enumerate(_NAME_OVERRIDES):
+            if word in lowered:
+                return i
+    return -1
+
+
+@lru_cache(maxsize=512)
+def _classify(type_key, name_flag: int) -> Tuple[str, str]:
+    if name_flag >= 0:
+        return _NAME_OVERRIDES[name_flag][1]
+    formatted_type = type_key.replace('_', ' ').title() if type_key else "Unknown"
+    activity_type = ACTIVITY_TYPE_MAP.get(formatted_type, formatted_type)
+    return (ACTIVITY_TYPE_JP.get(activity_type, activity_type),
+            ACTIVITY_TYPE_JP.get(formatted_type, formatted_type))
+
+
+def format_activity_type(activity_type: str, activity_name: str = "") -> Tuple[str, str]:
+    """(種目, 詳細種目) を日本語で返す。結果は (typeKey, 名前の判定) ごとにキャッシュする。"""
+    return _classify(activity_type, _name_flag(activity_name))
+
+
+def format_training_message(message: str) -> str:
+    for key, value in TRAINING_MESSAGE_JP:
+        if message.startswith(key): return value
+    return message
+
+
+@lru_cache(maxsize=128)
+def format_training_effect(training_effect_label: str) -> str:
+    # _ を半角スペースにしてタイトル形式にする（例: AEROBIC_BASE -> Aerobic Base）
+    formatted = training_effect_label.replace('_', ' ').title()
+    return TRAINING_EFFECT_JP.get(formatted, formatted)
+
+
+def format_pace(average_speed: float) -> str:
+    if average_speed > 0:
+        pace_min_km = 1000 / (average_speed * 60)
+        minutes = int(pace_min_km)
+        seconds = int((pace_min_km - minutes) * 60)
+        return f"{minutes}:{seconds:02d} /km"
+    return ""
+
+
+def format_duration(seconds: float) -> str:
+    m, s = divmod(int(seconds), 60)
+    return f"{m}:{s:02d}"
@@ -0,0 +1,103 @@
+"""
+1回の実行で共有する、解析済みのアクティビティレコード。
+
+各 sync 関数がアクティビティごとに繰り返していた
+  - startTimeGMT の strptime → JST 変換・週の開始日の計算
+  - format_activity_type による種目の日本語化
+  - 距離・時間・心拍などの単位変換
+を、活動1件につき1回だけ行う。元の dict は raw として保持し、詳細取得（enrich_activities）が
+dict を更新したあとは refresh_metrics() で数値だけを作り直す（日時・種目は変わらない）。
+"""
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional
+
+import pytz
+
+from activity_format import format_activity_type, format_duration, format_pace, format_training_effect
+
+
+local_tz = pytz.timezone('Asia/Tokyo')
+
+RUNNING_TYPE = 'ランニング'
+
+
+def _parse_start(start_gmt) -> Optional[datetime]:
+    try:
+        return datetime.strptime(start_gmt, '%Y-%m-%d %H:%M:%S').replace(tzinfo=pytz.UTC).astimezone(local_tz)
+    except (TypeError, ValueError):
+        return None
+
+
+class ActivityRecord:
+    """Garmin のアクティビティ dict を解析済みの属性として持つ軽量レコード。"""
+
+    __slots__ = (
+        'raw', 'activity_id', 'name', 'start_gmt', 'start_local', 'week_start',
+        'type_jp', 'subtype_jp',
+        # 単位変換済みの数値（表示時の丸めは各 sync 関数で行う）
+        'distance_km', 'duration_s', 'duration_min', 'calories',
+        'avg_speed', 'gap_speed', 'avg_hr', 'max_hr',
+        'cadence_spm', 'stride_m', 'gct_ms', 'vo_cm', 'balance_left',
+        'aerobic_te', 'anaerobic_te',
+        # 表示用文字列
+        'avg_pace', 'gap_pace', 'time_str', 'te_label',
+    )
+
+    def __init__(self, activity: dict):
+        self.raw = activity
+        self.activity_id = activity.get('activityId')
+        self.name = activity.get('activityName', '無題')
+        self.start_gmt = activity.get('startTimeGMT') or ''
+        self.start_local = _parse_start(activity.get('startTimeGMT'))
+        self.week_start: Optional[date] = (
+            (self.start_local - timedelta(days=self.start_local.weekday())).date()
+            if self.start_local else None
+        )
+        self.type_jp, self.subtype_jp = format_activity_type(
+            (activity.get('activityType') or {}).get('typeKey', ''), self.name
+        )
+        self.refresh_metrics()
+
+    def refresh_metrics(self) -> None:
+        """raw から数値・表示用文字列を作り直す。"""
+        a = self.raw
+        self.distance_km = (a.get('distance') or 0) / 1000
+        self.duration_s = a.get('duration') or 0
+        self.duration_min = self.duration_s / 60
+        self.calories = a.get('calories') or 0
+        self.avg_speed = a.get('averageSpeed') or 0
+        self.gap_speed = a.get('avgGradeAdjustedSpeed') or None
+        self.avg_hr = a.get('averageHR') or None
+        self.max_hr = a.get('maxHR') or None
+        self.cadence_spm = a.get('averageRunningCadenceInStepsPerMinute') or None
+        stride_cm = a.get('averageStrideLength')
+        self.stride_m = stride_cm / 100 if stride_cm else None
+        self.gct_ms = a.get('avgGroundContactTime') or None
+        vo_mm = a.get('avgVerticalOscillation')
+        self.vo_cm = vo_mm / 10 if vo_mm else None
+        balance = a.get('avgGroundContactBalance')
+        self.balance_left = balance / 100 if balance else None
+        self.aerobic_te = a.get('aerobicTrainingEffect') or 0
+        self.anaerobic_te = a.get('anaerobicTrainingEffect') or 0
+
+        self.avg_pace = format_pace(self.avg_speed)
+        self.gap_pace = format_pace(self.gap_speed) if self.gap_speed else None
+        self.time_str = format_duration(self.duration_s)
+        self.te_label = format_training_effect(a.get('trainingEffectLabel') or 'Unknown')
+
+    @property
+    def is_running(self) -> bool:
+        return self.type_jp == RUNNING_TYPE
+
+    @property
+    def laps_text(self) -> str:
+        # ラップはステップ2・6で raw に追加されるため、毎回 raw から読む
+        return self.raw.get('laps_text') or ''
+
+    def __repr__(self) -> str:
+        return f"ActivityRecord({self.activity_id}, {self.start_gmt}, {self.type_jp})"
+
+
+def build_activity_records(activities: Iterable) -> List[ActivityRecord]:
+    """dict のリストをレコードに変換する（すでにレコードのものはそのまま使う）。"""
+    return [a if isinstance(a, ActivityRecord) else ActivityRecord(a) for a in activities]
@@ -0,0 +1,118 @@
+"""
+アクティビティ概要のローカル永続ストア。
+
+activityId をキーに活動一覧 API の概要 dict を保存し、startTimeGMT の
+最大値をハイウォーターマークとして記録する。get_all_activities は
+既知の活動だけで構成されたページに到達した時点でページネーションを止め、
+残りはこのストアから補う。毎日の実行は一覧 API 1〜2 回で済む。
+
+ただし直近 GARMIN_ACTIVITY_REFRESH_DAYS 日分は毎回取り直し、取得した範囲については
+Garmin 側で編集された活動を上書きし、削除された活動をストアからも消す（prune_missing）。
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+
+from local_cache import cache_path, load_json, save_json
+
+
+ACTIVITY_STORE_FILE = cache_path("activities.json")
+_STORE_VERSION = 1
+REFRESH_DAYS = int(os.getenv("GARMIN_ACTIVITY_REFRESH_DAYS", "14"))
+
+
+def refresh_cutoff_gmt(days: int = REFRESH_DAYS) -> str:
+    """これより新しい活動は既知でも取り直す境界（startTimeGMT と同じ書式）。"""
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class ActivityStore:
+    """activityId → 概要 dict の永続ストア。"""
+
+    def __init__(self, path: str = ACTIVITY_STORE_FILE):
+        self.path = path
+        data = load_json(path, {})
+        if data.get("version") != _STORE_VERSION:
+            data = {}
+        self._activities: dict = data.get("activities", {})
+        self.high_water_mark: str = data.get("high_water_mark", "")
+        if self._activities:
+            print(f"  ℹ アクティビティストア: {len(self._activities)} 件 "
+                  f"(最新 startTimeGMT: {self.high_water_mark or '不明'})")
+
+    def __len__(self) -> int:
+        return len(self._activities)
+
+    def __contains__(self, activity_id) -> bool:
+        return str(activity_id) in self._activities
+
+    def is_known(self, activity: dict) -> bool:
+        """同じ activityId が保存済みかどうか。"""
+        aid = activity.get('activityId')
+        return aid is not None and str(aid) in self._activities
+
+    def upsert(self, activities: Iterable[dict]) -> int:
+        """活動を追加・上書きし、新規に追加された件数を返す。"""
+        added = 0
+        for act in activities:
+            aid = act.get('activityId')
+            if aid is None:
+                continue
+            key = str(aid)
+            if key not in self._activities:
+                added += 1
+            self._activities[key] = act
+            start = act.get('startTimeGMT') or ''
+            if start > self.high_water_mark:
+                self.high_water_mark = start
+        return added
+
+    def prune_missing(self, fetched: Iterable[dict], newer_than_gmt: str) -> int:
+        """startTimeGMT が newer_than_gmt より新しいのに fetched にない活動を削除し、件数を返す。
+
+        fetched は一覧の先頭から途切れずに取得した活動（その範囲では Garmin の一覧と一致するはず）。
+        境界と同じ時刻の活動は次のページにあるかもしれないので残す。
+        """
+        fetched_ids = {str(a.get('activityId')) for a in fetched if a.get('activityId') is not None}
+        stale = [
+            key for key, act in self._activities.items()
+            if (act.get('startTimeGMT') or '') > newer_than_gmt and key not in fetched_ids
+        ]
+        for key in stale:
+            del self._activities[key]
+        return len(stale)
+
+    def prune_missing_on_dates(self, fetched: Iterable[dict], first_date: str, last_date: str) -> int:
+        """startTimeLocal の日付が first_date〜last_date（両端含む）なのに fetched にない活動を削除し、件数を返す。
+
+        fetched はその日付範囲を日付指定で取得した結果（activity_window の区間ごと）。
+        """
+        fetched_ids = {str(a.get('activityId')) for a in fetched if a.get('activityId') is not None}
+        stale = [
+            key for key, act in self._activities.items()
+            if first_date <= (act.get('startTimeLocal') or '')[:10] <= last_date and key not in fetched_ids
+        ]
+        for key in stale:
+            del self._activities[key]
+        return len(stale)
+
+    def recent(self, since_gmt: str = "", limit: Optional[int] = None) -> List[dict]:
+        """startTimeGMT が since_gmt 以降の活動を新しい順で返す（呼び出し側が変更できるようコピー）。"""
+        acts = [
+            a for a in self._activities.values()
+            if (a.get('startTimeGMT') or '') >= since_gmt
+        ]
+        acts.sort(key=lambda a: a.get('startTimeGMT') or '', reverse=True)
+        if limit is not None:
+            acts = acts[:limit]
+        return [dict(a) for a in acts]
+
+    def save(self) -> None:
+        try:
+            save_json(self.path, {
+                "version": _STORE_VERSION,
+                "high_water_mark": self.high_water_mark,
+                "activities": self._activities,
+            })
+        except Exception as e:
+            print(f"  ⚠ アクティビティストア保存失敗: {e}")
@@ -0,0 +1,153 @@
+"""
+日付ウィンドウ単位の活動一覧取得（GARMIN_FETCH_MODE=date）。
+
+対象期間を暦に固定した GARMIN_DATE_CHUNK_DAYS 日ごとの区間に分け、
+get_activities_by_date を GARMIN_DATE_WINDOW_WORKERS 並列で呼ぶ。
+結果は activityId で重複を除いてアクティビティストアへ区間ごとに保存し、取得した区間に
+ストアにしかない活動（Garmin 側で削除）があればストアからも消す。
+確定した区間（SETTLE_DAYS より古い区間）は進捗ファイルに記録する。
+ジョブが途中で止まっても、次回は未完了の区間だけを取り直す（1年分・全履歴の取り込みも再開可能）。
+
+取得後はインデックス指定の一覧（最新 1 ページ）と件数・ID を照合し、
+日付指定で漏れた活動があれば警告してストアに補う。
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from activity_store import ActivityStore
+from local_cache import cache_path, load_json, save_json
+
+
+DATE_CHUNK_DAYS = int(os.getenv("GARMIN_DATE_CHUNK_DAYS", "7"))
+DATE_WINDOW_WORKERS = int(os.getenv("GARMIN_DATE_WINDOW_WORKERS", "4"))
+SETTLE_DAYS = 2  # これより新しい日を含む区間は毎回取り直す（同期遅れ・編集に備える）
+CROSS_CHECK_PAGE_SIZE = 50
+DATE_WINDOW_PROGRESS_FILE = cache_path("date_window_progress.json")
+_PROGRESS_VERSION = 1
+
+Chunk = Tuple[date, date]
+
+
+def date_chunks(start: date, end: date, chunk_days: int = DATE_CHUNK_DAYS) -> List[Chunk]:
+    """start〜end（両端含む）を覆う chunk_days 日の区間を新しい順に返す。
+
+    区間の開始日は暦に固定する（start を含む区間の先頭まで広げ、実行日によってずれない）ので、
+    確定した区間の進捗ファイルのキーは実行をまたいで一致する。end を含む最新の区間だけは end で切る
+    （この区間は SETTLE_DAYS 内の日を含むので、どのみち毎回取り直す）。
+    """
+    chunk_days = max(1, chunk_days)
+    chunks = []
+    first = start.toordinal() - start.toordinal() % chunk_days
+    for ordinal in range(first, end.toordinal() + 1, chunk_days):
+        lo = date.fromordinal(ordinal)
+        hi = lo + timedelta(days=chunk_days - 1)
+        chunks.append((lo, min(hi, end)))
+    return chunks[::-1]
+
+
+class DateWindowProgress:
+    """取得済みで確定した区間（"開始日:終了日" → 件数）の永続記録。"""
+
+    def __init__(self, path: str = DATE_WINDOW_PROGRESS_FILE, chunk_days: int = DATE_CHUNK_DAYS):
+        self.path = path
+        data = load_json(path, {})
+        same_layout = (data.get("version") == _PROGRESS_VERSION
+                       and data.get("chunk_days") == chunk_days)
+        self.chunk_days = chunk_days
+        self._done: Dict[str, int] = data.get("done", {}) if same_layout else {}
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+    @staticmethod
+    def _key(chunk: Chunk) -> str:
+        return f"{chunk[0].isoformat()}:{chunk[1].isoformat()}"
+
+    def is_done(self, chunk: Chunk) -> bool:
+        return self._key(chunk) in self._done
+
+    def mark_done(self, chunk: Chunk, count: int) -> None:
+        self._done[self._key(chunk)] = count
+
+    def save(self) -> None:
+        save_json(self.path, {
+            "version": _PROGRESS_VERSION,
+            "chunk_days": self.chunk_days,
+            "done": self._done,
+        })
+
+
+def fetch_date_window(garmin_client, start: date, end: date, store: ActivityStore,
+                      progress: Optional[DateWindowProgress] = None,
+                      workers: int = DATE_WINDOW_WORKERS) -> Dict[str, dict]:
+    """start〜end の活動を日付区間ごとに並行取得してストアに保存し、activityId → 概要 dict を返す。
+
+    進捗に記録済みの区間は取得しない（その活動はストアにある）。失敗した区間は記録せず、次回取り直す。
+    取得した区間については、結果にない活動をストアから削除する（prune_missing_on_dates）。
+    ストアと進捗はメインスレッドで区間ごとに保存する。
+    """
+    if progress is None:
+        progress = DateWindowProgress()
+    chunks = date_chunks(start, end, progress.chunk_days)
+    pending = [c for c in chunks if not progress.is_done(c)]
+    settled_before = end - timedelta(days=SETTLE_DAYS)
+    print(f"Fetching activities by date window {start} – {end}: "
+          f"{len(pending)}/{len(chunks)} chunks of {progress.chunk_days} days "
+          f"({len(chunks) - len(pending)} already done), {workers} workers...")
+
+    fetched: Dict[str, dict] = {}
+    failed = removed = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(garmin_client.get_activities_by_date, lo.isoformat(), hi.isoformat()): (lo, hi)
+            for lo, hi in pending
+        }
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                activities = [a for a in (future.result() or []) if a.get("activityId") is not None]
+            except Exception as e:
+                failed += 1
+                print(f"  ⚠ {chunk[0]} – {chunk[1]} の取得に失敗（次回再取得）: {e}")
+                continue
+            for activity in activities:
+                fetched[str(activity["activityId"])] = activity
+            store.upsert(activities)
+            removed += store.prune_missing_on_dates(activities, chunk[0].isoformat(), chunk[1].isoformat())
+            if chunk[1] < settled_before:
+                progress.mark_done(chunk, len(activities))
+            store.save()
+            progress.save()
+
+    print(f"  ✓ {len(pending) - failed} chunks fetched ({failed} failed): {len(fetched)} unique activities"
+          + (f", {removed} removed from the store" if removed else ""))
+    return fetched
+
+
+def cross_check_index(garmin_client, store: ActivityStore, since_gmt: str,
+                      page_size: int = CROSS_CHECK_PAGE_SIZE) -> List[dict]:
+    """インデックス指定の最新ページとストアを照合し、日付指定で漏れていた活動を返す（ストアにも追加する）。
+
+    ページの最古の活動以降について、ページの件数とストアの件数も比べて表示する。
+    """
+    page = garmin_client.get_activities(0, page_size) or []
+    page = [a for a in page if a.get("activityId") is not None]
+    if not page:
+        return []
+    missing = [a for a in page
+               if (a.get("startTimeGMT") or "") >= since_gmt and not store.is_known(a)]
+    if missing:
+        store.upsert(missing)
+        store.save()
+        print(f"  ⚠ 照合: インデックス一覧にあり日付指定で取れなかった活動 {len(missing)} 件をストアに補いました")
+
+    oldest_gmt = min(a.get("startTimeGMT") or "" for a in page)
+    if len(page) == page_size and oldest_gmt >= since_gmt:
+        in_store = len(store.recent(oldest_gmt))
+        mark = "✓" if in_store == len(page) else "⚠"
+        print(f"  {mark} 照合: {oldest_gmt} 以降 インデックス {len(page)} 件 / ストア {in_store} 件")
+    elif not missing:
+        print(f"  ✓ 照合: インデックス一覧の最新 {len(page)} 件はすべて取得済み")
+    return missing
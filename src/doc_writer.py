@@ -0,0 +1,126 @@
+"""
+セクション単位の Google Doc 差分書き込み。
+
+ドキュメントを (キー, テキスト) のセクション列として描画し、前回書き込んだセクション列を
+~/.garmin_cache/doc_sections.json に保存しておく。次回は
+  1. documents.get で現在の本文テキストを取得し、前回の内容と一致するか確認
+  2. 一致すればキーで新旧セクションを突き合わせ（difflib.SequenceMatcher）、
+     テキストが変わったセクションだけ deleteContentRange / insertText を発行
+  3. 一致しない（初回・手動編集など）場合は従来通り全削除→全挿入
+とする。変更のない過去のセクションは再送しない。
+
+Docs API のインデックスは UTF-16 コード単位なので、長さは _doc_len で数える。
+"""
+from difflib import SequenceMatcher
+from typing import List, Tuple
+
+from local_cache import cache_path, load_json, save_json
+
+
+DOC_SECTIONS_FILE = cache_path("doc_sections.json")
+
+
+def _doc_len(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+class SectionBuilder:
+    """キー付きセクションを順に組み立てる。section() が返すリストに行を追加していく。"""
+
+    def __init__(self):
+        self._sections: List[Tuple[str, list]] = []
+
+    def section(self, key: str) -> list:
+        lines: list = []
+        self._sections.append((key, lines))
+        return lines
+
+    def sections(self) -> List[Tuple[str, str]]:
+        return [(key, "".join(lines)) for key, lines in self._sections if lines]
+
+
+def doc_body_text(doc: dict) -> str:
+    """documents.get の結果から本文のプレーンテキストを組み立てる。"""
+    parts = []
+    for element in doc.get("body", {}).get("content", []):
+        for pe in (element.get("paragraph") or {}).get("elements", []):
+            parts.append((pe.get("textRun") or {}).get("content", ""))
+    return "".join(parts)
+
+
+def _body_end_index(doc: dict) -> int:
+    end_index = 1
+    for element in doc.get("body", {}).get("content", []):
+        if "endIndex" in element:
+            end_index = element["endIndex"]
+    return end_index
+
+
+def _full_rewrite_requests(doc: dict, full_text: str) -> list:
+    requests = []
+    end_index = _body_end_index(doc)
+    if end_index > 2:
+        requests.append({"deleteContentRange": {"range": {"startIndex": 1, "endIndex": end_index - 1}}})
+    requests.append({"insertText": {"location": {"index": 1}, "text": full_text}})
+    return requests
+
+
+def _patch_requests(old_sections: List[Tuple[str, str]], new_sections: List[Tuple[str, str]]) -> list:
+    """新旧セクション列の差分から、下から順に適用する batchUpdate リクエストを作る。"""
+    # 旧セクション i の開始インデックス（本文は index 1 から始まる）
+    starts = [1]
+    for _key, text in old_sections:
+        starts.append(starts[-1] + _doc_len(text))
+
+    def _replace(i1, i2, new_text):
+        reqs = []
+        if starts[i2] > starts[i1]:
+            reqs.append({"deleteContentRange": {"range": {"startIndex": starts[i1], "endIndex": starts[i2]}}})
+        if new_text:
+            reqs.append({"insertText": {"location": {"index": starts[i1]}, "text": new_text}})
+        return reqs
+
+    requests = []
+    matcher = SequenceMatcher(None, [k for k, _ in old_sections], [k for k, _ in new_sections], autojunk=False)
+    for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+        if tag == "equal":
+            for k in reversed(range(i2 - i1)):
+                if old_sections[i1 + k][1] != new_sections[j1 + k][1]:
+                    requests.extend(_replace(i1 + k, i1 + k + 1, new_sections[j1 + k][1]))
+        else:
+            requests.extend(_replace(i1, i2, "".join(t for _, t in new_sections[j1:j2])))
+    return requests
+
+
+def write_doc_sections(docs_service, document_id: str, sections: List[Tuple[str, str]],
+                       manifest_path: str = DOC_SECTIONS_FILE) -> dict:
+    """セクション列をドキュメントに書き込み、{mode, requests, chars} を返す。"""
+    manifest = load_json(manifest_path, {})
+    old_sections = [tuple(s) for s in manifest.get(document_id, [])]
+    full_text = "".join(text for _, text in sections)
+
+    doc = docs_service.documents().get(documentId=document_id).execute()
+    current_text = doc_body_text(doc)
+    # ドキュメント末尾には削除できない改行が1つ残る
+    expected_text = "".join(text for _, text in old_sections) + "\n"
+
+    if old_sections and current_text == expected_text:
+        mode = "patch"
+        requests = _patch_requests(old_sections, sections)
+    else:
+        mode = "full"
+        requests = _full_rewrite_requests(doc, full_text)
+
+    if requests:
+        docs_service.documents().batchUpdate(
+            documentId=document_id, body={"requests": requests}
+        ).execute()
+
+    manifest[document_id] = [list(s) for s in sections]
+    try:
+        save_json(manifest_path, manifest)
+    except Exception as e:
+        print(f"  ⚠ ドキュメントのセクション情報保存失敗: {e}")
+
+    sent = sum(_doc_len(r["insertText"]["text"]) for r in requests if "insertText" in r)
+    return {"mode": mode, "requests": len(requests), "chars": sent}
@@ -0,0 +1,87 @@
+"""
+GarminCookieClient のエンドポイント解決キャッシュとサーキットブレーカー。
+
+API パスを「テンプレート」（activityId 等の数値・日付を {id} / {date} に置き換えたもの）に正規化し、
+  - routes:  テンプレート → 最後に JSON を返した候補（gc-api / direct / proxy / connectapi 等）
+  - breaker: "テンプレート 候補" → 再試行してよい時刻（401 / 403 / HTML を返した候補）
+を ~/.garmin_cache/endpoint_routes.json に保存する。次回以降は覚えた候補を最初に試し、
+遮断中の候補はクールダウン（GARMIN_ENDPOINT_COOLDOWN 秒）が明けるまで飛ばす。
+"""
+import os
+import re
+import threading
+import time
+from typing import List, Optional
+
+from local_cache import cache_path, load_json, save_json
+
+
+ENDPOINT_ROUTES_FILE = cache_path("endpoint_routes.json")
+_STORE_VERSION = 1
+
+BREAKER_COOLDOWN_SECONDS = int(os.getenv("GARMIN_ENDPOINT_COOLDOWN", "900"))
+
+_DATE_SEGMENT = re.compile(r"/\d{4}-\d{2}-\d{2}(?=/|$)")
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def path_template(path: str) -> str:
+    """'/activity-service/activity/123/splits' → '/activity-service/activity/{id}/splits'"""
+    path = path.split("?", 1)[0]
+    return _ID_SEGMENT.sub("/{id}", _DATE_SEGMENT.sub("/{date}", path))
+
+
+class EndpointRoutes:
+    """テンプレートごとの成功候補と、候補ごとの遮断期限の永続ストア。
+
+    clock はテストで時計を差し替えるためのもの（既定は time.time。遮断期限は実行をまたぐので壁時計）。
+    """
+
+    def __init__(self, path: str = ENDPOINT_ROUTES_FILE, cooldown: int = BREAKER_COOLDOWN_SECONDS,
+                 clock=time.time):
+        self.path = path
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        data = load_json(path, {})
+        if data.get("version") != _STORE_VERSION:
+            data = {}
+        self._routes: dict = data.get("routes", {})
+        now = clock()
+        self._breaker: dict = {k: until for k, until in data.get("breaker", {}).items() if until > now}
+        if self._routes:
+            print(f"  ℹ エンドポイント解決キャッシュ: {len(self._routes)} 件"
+                  + (f" (遮断中 {len(self._breaker)} 件)" if self._breaker else ""))
+
+    def order(self, template: str, kinds: List[str]) -> List[str]:
+        """試す順の候補。覚えた候補を先頭にし、遮断中の候補は除く。"""
+        now = self._clock()
+        with self._lock:
+            preferred = self._routes.get(template)
+            ordered = ([preferred] if preferred in kinds else []) + [k for k in kinds if k != preferred]
+            return [k for k in ordered if self._breaker.get(f"{template} {k}", 0) <= now]
+
+    def resolved(self, template: str) -> Optional[str]:
+        return self._routes.get(template)
+
+    def record_success(self, template: str, kind: str) -> None:
+        with self._lock:
+            self._breaker.pop(f"{template} {kind}", None)
+            if self._routes.get(template) == kind:
+                return
+            self._routes[template] = kind
+            self._save()
+
+    def record_blocked(self, template: str, kind: str) -> None:
+        """401 / 403 / HTML を返した候補をクールダウンの間だけ遮断する。"""
+        with self._lock:
+            self._breaker[f"{template} {kind}"] = self._clock() + self.cooldown
+            if self._routes.get(template) == kind:
+                del self._routes[template]
+            self._save()
+
+    def _save(self) -> None:
+        try:
+            save_json(self.path, {"version": _STORE_VERSION, "routes": self._routes, "breaker": self._breaker})
+        except Exception as e:
+            print(f"  ⚠ エンドポイント解決キャッシュ保存失敗: {e}")
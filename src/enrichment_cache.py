@@ -0,0 +1,88 @@
+"""
+アクティビティ詳細（details / splits / weather）の永続キャッシュ。
+
+完了した活動の詳細は変化しないため、activityId と概要 dict の
+フィンガープリント（SHA-1）をキーに結果を保存し、次回以降は API を呼ばない。
+概要が変わった（名前の変更・再計算など）場合はフィンガープリントが一致せず、
+そのエントリは破棄されて再取得される。
+"""
+import hashlib
+import json
+from typing import Optional
+
+from local_cache import cache_path, load_json, save_json
+from prefetch_store import DETAIL_DROP_KEYS
+
+
+ENRICHMENT_CACHE_FILE = cache_path("enrichment.json")
+_CACHE_VERSION = 1
+
+# 取得後にこちらで付与するキー（フィンガープリントから除外）
+_DERIVED_KEYS = frozenset({"laps_text", "weather"})
+
+
+def summary_fingerprint(activity: dict) -> str:
+    """活動概要の内容ハッシュ。取得後に付与したキーは無視する。"""
+    summary = {k: v for k, v in activity.items() if k not in _DERIVED_KEYS}
+    raw = json.dumps(summary, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class EnrichmentCache:
+    """activityId → {fingerprint, details, laps_text, weather} の永続キャッシュ。"""
+
+    def __init__(self, path: str = ENRICHMENT_CACHE_FILE):
+        self.path = path
+        data = load_json(path, {})
+        if data.get("version") != _CACHE_VERSION:
+            data = {}
+        self._entries: dict = data.get("entries", {})
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, activity: dict) -> Optional[dict]:
+        """フィンガープリントが一致するエントリを返す。不一致なら破棄して None。"""
+        key = str(activity.get('activityId'))
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.get("fingerprint") != summary_fingerprint(activity):
+            del self._entries[key]
+            self.invalidated += 1
+            return None
+        return entry
+
+    def apply(self, activity: dict) -> bool:
+        """キャッシュ済みの詳細を activity に反映する。ヒットしたら True。"""
+        entry = self.get(activity)
+        if entry is None:
+            self.misses += 1
+            return False
+        # garmin_enhance_activity と同じく、分類用の activityType は概要のものを残す
+        saved_type = activity.get('activityType')
+        activity.update(entry.get("details") or {})
+        if saved_type is not None:
+            activity['activityType'] = saved_type
+        activity['laps_text'] = entry.get("laps_text", "")
+        if entry.get("weather"):
+            activity['weather'] = entry["weather"]
+        self.hits += 1
+        return True
+
+    def put(self, activity_id, fingerprint: str, details: dict, laps_text: str, weather) -> None:
+        self._entries[str(activity_id)] = {
+            "fingerprint": fingerprint,
+            "details": {k: v for k, v in (details or {}).items() if k not in DETAIL_DROP_KEYS},
+            "laps_text": laps_text or "",
+            "weather": weather or {},
+        }
+
+    def save(self) -> None:
+        try:
+            save_json(self.path, {"version": _CACHE_VERSION, "entries": self._entries})
+        except Exception as e:
+            print(f"  ⚠ 詳細キャッシュ保存失敗: {e}")
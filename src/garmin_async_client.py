@@ -0,0 +1,300 @@
+"""
+asyncio 版の Cookie ベース Garmin クライアントと、1回の実行分を並行取得するパイプライン。
+
+AsyncGarminCookieClient は GarminCookieClient と同じ認証（ブラウザセッションの Cookie / JWT_WEB）・
+同じエンドポイント候補と解決キャッシュ（endpoint_routes）を使い、同じメソッド
+（get_activities, get_activity_splits / details / weather, ヘルス系 12 メソッド）を
+コルーチンとして提供する。HTTP は httpx.AsyncClient 1つ（1つの接続プール）で行い、
+レートは同期版と同じ TokenBucket、再試行は同じ RetryPolicy（パステンプレートごとの予算）で制御する。
+
+prefetch_run_async() は、ステップ1〜4で必要になる Garmin データ（活動一覧・詳細・
+スプリット・天気・ヘルス・レース予測）を1つのイベントループで並行に取得して
+プリフェッチストア（prefetch_store）に書く。活動一覧のページが届くたびに、その活動の詳細取得を
+始めるので、一覧の取得と詳細の取得が重なる。以降のステップは GarminPreloadedClient で
+ストアから読むので、main() の同期処理はそのまま使える。
+
+httpx は任意の依存（pip install httpx）。入っていない環境では HAS_HTTPX が False になり、
+呼び出し側は同期クライアントを使う。
+"""
+import asyncio
+import os
+from datetime import date
+from typing import List, Optional
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from activity_store import refresh_cutoff_gmt
+from endpoint_routes import EndpointRoutes, path_template
+from garmin_cookie_client import _HEADERS, build_candidates, load_dynamic_paths
+from garmin_endpoints import (
+    ACTIVITY_DETAILS, ACTIVITY_LIST, ACTIVITY_SPLITS, ACTIVITY_WEATHER,
+    HEALTH_DAILY_ENDPOINTS, HEALTH_RACE_PREDICTIONS, HEALTH_RANGE_ENDPOINTS, SOCIAL_PROFILE,
+    range_chunks, split_range_by_date,
+)
+from http_transport import HTTP_POOL_SIZE, NOT_JSON, parse_json
+from prefetch_store import DETAIL_DROP_KEYS, PrefetchWriter, health_key
+from rate_limiter import TokenBucket
+from retry_policy import RateLimitError, RetryPolicy, parse_retry_after
+
+
+HAS_HTTPX = httpx is not None
+
+ASYNC_CONCURRENCY = int(os.getenv("GARMIN_ASYNC_CONCURRENCY", "16"))
+ACTIVITY_PAGE_SIZE = 50
+
+
+class AsyncGarminCookieClient:
+    """Cookie ベースの Garmin Connect クライアント（asyncio 版）。async with で使う。
+
+    transport / routes はテストで httpx の送信先と解決キャッシュを差し替えるためのもの。
+    """
+
+    def __init__(self, cookies: dict, limiter: Optional[TokenBucket] = None,
+                 policy: Optional[RetryPolicy] = None, pool_size: int = HTTP_POOL_SIZE,
+                 transport=None, routes: Optional[EndpointRoutes] = None):
+        if httpx is None:
+            raise RuntimeError("AsyncGarminCookieClient requires httpx")
+        # Accept-Encoding は httpx が展開できる形式を自動で付ける
+        headers = {k: v for k, v in _HEADERS.items() if k != "Accept-Encoding"}
+        self._http = httpx.AsyncClient(
+            cookies=cookies, headers=headers, timeout=30, follow_redirects=True,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            transport=transport,
+        )
+        self.jwt_web = cookies.get("JWT_WEB", "")
+        self.limiter = limiter or TokenBucket()
+        self.policy = policy or RetryPolicy()
+        self._dynamic_paths = load_dynamic_paths()
+        self._routes = routes or EndpointRoutes()
+        self.display_name: Optional[str] = None
+        self.full_name: Optional[str] = None
+
+    async def __aenter__(self):
+        await self.get_full_name()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._http.aclose()
+
+    async def _send(self, url: str, params: dict = None, extra_headers: dict = None) -> tuple:
+        """(JSON または NOT_JSON, 認証で拒否されたか) を返す。429 は RateLimitError を raise する。"""
+        try:
+            r = await self._http.get(url, params=params, headers=extra_headers or None)
+        except httpx.HTTPError:
+            return NOT_JSON, False
+        if r.status_code == 429:
+            raise RateLimitError(f"429 Too Many Requests: '{url[:80]}'",
+                                 parse_retry_after(r.headers.get("Retry-After")))
+        if r.status_code in (401, 403):
+            return NOT_JSON, True
+        if r.status_code != 200:
+            return NOT_JSON, False
+        data = parse_json(r)
+        return data, data is NOT_JSON and "text/html" in r.headers.get("Content-Type", "")
+
+    async def _get(self, path: str, params: dict = None):
+        """GarminCookieClient._get と同じ候補順・解決キャッシュで JSON を取得する（429 等は再試行）。"""
+        return await self.policy.call_async(path_template(path), self._get_once, path, params)
+
+    async def _get_once(self, path: str, params: dict = None):
+        await self.limiter.acquire_async()
+        template = path_template(path)
+        candidates = build_candidates(path, self._dynamic_paths, self.jwt_web)
+        kinds = self._routes.order(template, list(candidates))
+        for kind in kinds:
+            url, extra_headers = candidates[kind]
+            try:
+                data, blocked = await self._send(url, params=params, extra_headers=extra_headers)
+            except RateLimitError as e:
+                self.limiter.on_rate_limited(e.retry_after)
+                raise
+            if data is not NOT_JSON:
+                self._routes.record_success(template, kind)
+                self.limiter.on_success()
+                return data
+            if blocked:
+                self._routes.record_blocked(template, kind)
+        skipped = len(candidates) - len(kinds)
+        raise ValueError(
+            f"Cookie クライアント(async): '{path}' の全 API 候補で JSON 取得に失敗"
+            + (f"（遮断中の {skipped} 候補はスキップ）" if skipped else "")
+        )
+
+    # --- 活動 ---
+    async def get_full_name(self) -> str:
+        """認証テスト兼フルネーム取得（display_name もここで設定する）。"""
+        data = await self._get(SOCIAL_PROFILE)
+        self.display_name = data.get("displayName") or data.get("userName", "")
+        self.full_name = data.get("fullName") or self.display_name
+        return self.full_name
+
+    async def get_activities(self, start: int, limit: int):
+        return await self._get(ACTIVITY_LIST, params={"start": str(start), "limit": str(limit)})
+
+    async def get_activity_splits(self, activity_id):
+        return await self._get(ACTIVITY_SPLITS.format(activity_id=activity_id))
+
+    async def get_activity_details(self, activity_id, maxchart=2000, maxpoly=4000):
+        return await self._get(
+            ACTIVITY_DETAILS.format(activity_id=activity_id),
+            params={"maxChartSize": str(maxchart), "maxPolylineSize": str(maxpoly)},
+        )
+
+    async def get_activity_weather(self, activity_id):
+        return await self._get(ACTIVITY_WEATHER.format(activity_id=activity_id))
+
+    # --- 日次ヘルス ---
+    async def _daily(self, metric: str, date_str: str):
+        path = HEALTH_DAILY_ENDPOINTS[metric]
+        return await self._get(path.format(date=date_str, display_name=self.display_name or ""))
+
+    async def _range(self, metric: str, start: str, end: str):
+        path = HEALTH_RANGE_ENDPOINTS[metric][0]
+        return await self._get(path.format(start=start, end=end or start))
+
+    async def get_hrv_data(self, date_str: str) -> dict: return await self._daily("hrv", date_str)
+    async def get_rhr_day(self, date_str: str) -> dict: return await self._daily("rhr", date_str)
+    async def get_sleep_data(self, date_str: str) -> dict: return await self._daily("sleep", date_str)
+    async def get_daily_steps(self, start: str, end: str) -> list: return await self._range("steps", start, end)
+    async def get_body_battery(self, start: str, end: str = None) -> list: return await self._range("body_battery", start, end)
+    async def get_stress_data(self, date_str: str) -> dict: return await self._daily("stress", date_str)
+    async def get_training_readiness(self, date_str: str) -> dict: return await self._daily("training_readiness", date_str)
+    async def get_max_metrics(self, date_str: str) -> dict: return await self._daily("max_metrics", date_str)
+    async def get_training_status(self, date_str: str) -> dict: return await self._daily("training_status", date_str)
+    async def get_spo2_data(self, date_str: str) -> dict: return await self._daily("spo2", date_str)
+    async def get_respiration_data(self, date_str: str) -> dict: return await self._daily("respiration", date_str)
+
+    async def get_race_predictions(self) -> dict:
+        return await self._get(HEALTH_RACE_PREDICTIONS.format(display_name=self.display_name or ""))
+
+
+async def prefetch_run_async(client: AsyncGarminCookieClient, store: PrefetchWriter, *,
+                             activities_limit: int, cutoff_gmt: str, activity_store=None,
+                             enrichment_cache=None, health_dates: List[date] = (),
+                             concurrency: int = ASYNC_CONCURRENCY) -> dict:
+    """1回の実行で使う Garmin データを並行取得してストアに書く。種類ごとの件数を返す。
+
+    活動一覧は get_all_activities と同じ条件（空ページ・取り直し期間より古い既知の活動だけのページ・cutoff_gmt より古い・
+    activities_limit 件）で止める。詳細は、一覧で届いた活動とローカルストアの対象期間の活動のうち、
+    enrichment_cache にないものだけ取得する。失敗した呼び出しはストアに書かない
+    （GarminPreloadedClient 側で未取得として扱われる）。
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    failures = {"count": 0}
+
+    async def _call(coro_fn, *args):
+        async with semaphore:
+            try:
+                return await coro_fn(*args)
+            except Exception as e:
+                failures["count"] += 1
+                if failures["count"] <= 5:
+                    print(f"    ⚠ {getattr(coro_fn, '__name__', coro_fn)}{args}: {e}")
+                return None
+
+    async def _enrich(activity: dict) -> None:
+        aid = activity.get("activityId")
+        details, splits, weather = await asyncio.gather(
+            _call(client.get_activity_details, aid),
+            _call(client.get_activity_splits, aid),
+            _call(client.get_activity_weather, aid),
+        )
+        if isinstance(details, dict):
+            for key in DETAIL_DROP_KEYS:
+                details.pop(key, None)
+        for kind, data in (("details", details), ("splits", splits), ("weather", weather)):
+            if data:
+                store.append(kind, [(aid, data)])
+
+    enrich_tasks = []
+    seen_ids = set()
+
+    def _schedule(activities) -> None:
+        for activity in activities:
+            aid = activity.get("activityId")
+            if aid is None or aid in seen_ids or (activity.get("startTimeGMT") or "") < cutoff_gmt:
+                continue
+            seen_ids.add(aid)
+            if enrichment_cache is not None and enrichment_cache.get(activity) is not None:
+                continue
+            enrich_tasks.append(asyncio.ensure_future(_enrich(activity)))
+
+    # ヘルス・レース予測は一覧と並行して始める
+    health_task = asyncio.ensure_future(_prefetch_health(client, store, list(health_dates), _call))
+
+    # 対象期間のうちストアにだけある活動も main() は詳細を取得するので、先に始めておく
+    if activity_store is not None:
+        _schedule(activity_store.recent(cutoff_gmt, activities_limit))
+
+    fetched = 0
+    refresh_gmt = refresh_cutoff_gmt()
+    while fetched < activities_limit:
+        page = await _call(client.get_activities, fetched, ACTIVITY_PAGE_SIZE)
+        if not page:
+            break
+        room = max(activities_limit - fetched, 0)
+        store.append("activities", ((a.get("activityId"), a) for a in page[:room]))
+        _schedule(page[:room])
+        fetched += len(page)
+        if (activity_store is not None and len(activity_store) and all(activity_store.is_known(a) for a in page)
+                and (page[-1].get("startTimeGMT") or "") < refresh_gmt):
+            break
+        if (page[-1].get("startTimeGMT") or "") < cutoff_gmt or len(page) < ACTIVITY_PAGE_SIZE:
+            break
+
+    await asyncio.gather(health_task, *enrich_tasks)
+    counts = dict(store.counts)
+    counts["failed_calls"] = failures["count"]
+    return counts
+
+
+async def _prefetch_health(client: AsyncGarminCookieClient, store: PrefetchWriter,
+                           dates: List[date], call) -> None:
+    """ヘルス指標を Playwright の事前取得と同じキーでストアの health に書く。"""
+    if client.display_name:
+        store.append("health", [(health_key("profile"), {"displayName": client.display_name})])
+
+    async def _daily(metric: str, date_str: str) -> None:
+        data = await call(client._daily, metric, date_str)
+        if data is not None:
+            store.append("health", [(health_key(metric, date_str), data)])
+
+    async def _range(metric: str, chunk: List[date]) -> None:
+        data = await call(client._range, metric, chunk[0].isoformat(), chunk[-1].isoformat())
+        if data is not None:
+            by_date = split_range_by_date(data, HEALTH_RANGE_ENDPOINTS[metric][1], chunk)
+            store.append("health", ((health_key(metric, d), entry) for d, entry in by_date.items()))
+
+    async def _race_predictions() -> None:
+        data = await call(client.get_race_predictions)
+        if data is not None:
+            store.append("health", [(health_key("race_predictions"), data)])
+
+    tasks = [
+        _daily(metric, d.isoformat())
+        for d in dates for metric, path in HEALTH_DAILY_ENDPOINTS.items()
+        if client.display_name or "{display_name}" not in path
+    ]
+    # 期間 API は連続した日付の区間（最大 28 日）ごと。backfill の日は今日と離れているので別の区間になる
+    date_runs = range_chunks(dates)
+    tasks += [_range(metric, chunk) for metric in HEALTH_RANGE_ENDPOINTS for chunk in date_runs]
+    if client.display_name:
+        tasks.append(_race_predictions())
+    await asyncio.gather(*tasks)
+
+
+def run_async_prefetch(cookies: dict, path: str, limiter: Optional[TokenBucket] = None,
+                       policy: Optional[RetryPolicy] = None, **kwargs) -> dict:
+    """新しいイベントループで prefetch_run_async を実行し、path のストアに書く。"""
+    async def _run():
+        store = PrefetchWriter(path)
+        try:
+            async with AsyncGarminCookieClient(cookies, limiter=limiter, policy=policy) as client:
+                return await prefetch_run_async(client, store, **kwargs)
+        finally:
+            store.close()
+
+    return asyncio.run(_run())
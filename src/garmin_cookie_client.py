@@ -9,11 +9,18 @@ garth / OAuth を使わず、ブラウザセッションの Cookie で直接 API
   2. connect.garmin.com/{path}             旧直接パス
   3. connect.garmin.com/modern/proxy/{path} 旧プロキシ
   4. connectapi.garmin.com/{path}           JWT_WEB を Bearer として使用（最終手段）
+
+成功した候補はパステンプレートごとに覚えて次回から最初に試し、401 / 403 / HTML を返した候補は
+クールダウンまで飛ばす（endpoint_routes。~/.garmin_cache に保存）。
 """
 import json
 import os
 import requests
 
+from endpoint_routes import EndpointRoutes, path_template
+from http_transport import NOT_JSON, JsonResponse, configure_session, parse_json
+from retry_policy import RateLimitError, parse_retry_after
+
 
 CONNECTAPI = "https://connectapi.garmin.com"
 CONNECT = "https://connect.garmin.com"
@@ -26,7 +33,6 @@ _HEADERS = {
     ),
     "Accept": "application/json, text/javascript, */*; q=0.01",
     "Accept-Language": "en-US,en;q=0.9",
-    "Accept-Encoding": "gzip, deflate, br",
     "NK": "NT",
     "X-Requested-With": "XMLHttpRequest",
     "Origin": "https://connect.garmin.com",
@@ -55,16 +61,45 @@ def parse_cookie_string(cookie_str: str) -> dict:
     return cookies
 
 
-def _is_json_response(r) -> bool:
-    """レスポンスが JSON として解析できるか確認。"""
-    ct = r.headers.get("Content-Type", "")
-    if "text/html" in ct:
-        return False
+def load_dynamic_paths() -> dict:
+    """Playwright が記録した動的 API パス {path: url} を読み込む（なければ空）。"""
+    if not os.path.exists(_API_CONFIG_FILE):
+        return {}
     try:
-        r.json()
-        return True
+        with open(_API_CONFIG_FILE) as f:
+            paths = json.load(f)
+        print(f"  ℹ Playwright 発見パス: {len(paths)} 件読み込み")
+        return paths
     except Exception:
-        return False
+        return {}
+
+
+def build_candidates(path: str, dynamic_paths: dict, jwt_web: str) -> dict:
+    """
+    試行する候補を {候補名: (url, extra_headers)} で既定の試行順に返す。
+    """
+    candidates = {}
+
+    # Playwright が発見したパスを最優先
+    if path in dynamic_paths:
+        candidates["dynamic"] = (dynamic_paths[path], {})
+
+    # 新アプリ BFF: /gc-api/ プレフィックス（JWT_WEB Cookie で認証）
+    candidates["gc-api"] = (f"{CONNECT}/gc-api{path}", {})
+
+    # 旧直接パス
+    candidates["direct"] = (f"{CONNECT}{path}", {})
+    # 旧プロキシ
+    candidates["proxy"] = (f"{CONNECT}/modern/proxy{path}", {})
+
+    # JWT_WEB を Bearer として connectapi に試みる（最終手段）
+    if jwt_web:
+        candidates["connectapi"] = (
+            f"{CONNECTAPI}{path}",
+            {"Authorization": f"Bearer {jwt_web}"},
+        )
+
+    return candidates
 
 
 class _DummyGarth:
@@ -87,23 +122,29 @@ class GarminCookieClient:
             self.session = requests.Session()
         self.session.cookies.update(cookies)
         self.session.headers.update(_HEADERS)
+        # 並列取得に合わせた接続プールと keep-alive（Accept-Encoding もここで決める）
+        configure_session(self.session)
         self.garth = _DummyGarth()
         # JWT_WEB を Bearer token として利用（connectapi への最終手段）
         self.jwt_web = cookies.get("JWT_WEB", "")
         # Playwright が記録した動的 API パスを読み込む
-        self._dynamic_paths: dict = {}
-        if os.path.exists(_API_CONFIG_FILE):
-            try:
-                with open(_API_CONFIG_FILE) as f:
-                    self._dynamic_paths = json.load(f)
-                print(f"  ℹ Playwright 発見パス: {len(self._dynamic_paths)} 件読み込み")
-            except Exception:
-                pass
+        self._dynamic_paths: dict = load_dynamic_paths()
+        self._routes = EndpointRoutes()
         self.display_name = self._fetch_display_name()
 
     def _request(self, url: str, params: dict = None, extra_headers: dict = None,
                  timeout: int = 30, debug: bool = False):
-        """単一 URL にリクエストを送り、200 + JSON なら Response を返す。失敗は None。"""
+        """単一 URL にリクエストを送り、200 + JSON なら JsonResponse を返す。失敗は None。"""
+        return self._send(url, params=params, extra_headers=extra_headers,
+                          timeout=timeout, debug=debug)[0]
+
+    def _send(self, url: str, params: dict = None, extra_headers: dict = None,
+              timeout: int = 30, debug: bool = False) -> tuple:
+        """(200 + JSON なら JsonResponse・それ以外は None, 認証で拒否されたか) を返す。
+
+        401 / 403 と、JSON の代わりに HTML（ログイン画面など）が返った場合を「拒否」とする。
+        429 は他の候補を試さず RateLimitError を raise する（再試行は RetryPolicy が行う）。
+        """
         try:
             r = self.session.get(
                 url, params=params, timeout=timeout,
@@ -114,61 +155,50 @@ class GarminCookieClient:
             if debug:
                 body_hint = r.text[:80].replace('\n', ' ') if r.status_code >= 400 else ""
                 print(f"    [{r.status_code}] {url[:80]} ct={ct[:30]} {body_hint}")
+            if r.status_code == 429:
+                raise RateLimitError(f"429 Too Many Requests: '{url[:80]}'",
+                                     parse_retry_after(r.headers.get("Retry-After")))
             if r.status_code in (401, 403):
-                return None
-            if r.status_code == 200 and _is_json_response(r):
-                return r
+                return None, True
+            if r.status_code == 200:
+                data = parse_json(r)
+                if data is not NOT_JSON:
+                    return JsonResponse(r, data), False
+                return None, "text/html" in ct
+        except RateLimitError:
+            raise
         except Exception as e:
             if debug:
                 print(f"    [ERR] {url[:80]}: {e}")
-        return None
-
-    def _build_candidates(self, path: str) -> list:
-        """
-        試行する (url, extra_headers) のリストを返す。
-        """
-        candidates = []
+        return None, False
 
-        # Playwright が発見したパスを最優先
-        if path in self._dynamic_paths:
-            candidates.append((self._dynamic_paths[path], {}))
-
-        # 新アプリ BFF: /gc-api/ プレフィックス（JWT_WEB Cookie で認証）
-        candidates.append((f"{CONNECT}/gc-api{path}", {}))
-
-        # 旧直接パス
-        candidates.append((f"{CONNECT}{path}", {}))
-        # 旧プロキシ
-        candidates.append((f"{CONNECT}/modern/proxy{path}", {}))
-
-        # JWT_WEB を Bearer として connectapi に試みる（最終手段）
-        if self.jwt_web:
-            candidates.append((
-                f"{CONNECTAPI}{path}",
-                {"Authorization": f"Bearer {self.jwt_web}"},
-            ))
-
-        return candidates
+    def _build_candidates(self, path: str) -> dict:
+        return build_candidates(path, self._dynamic_paths, self.jwt_web)
 
     def _get(self, path: str, params: dict = None, timeout: int = 30):
         """
         複数エンドポイントを順番に試し、JSON レスポンスが得られた最初の結果を返す。
+        同じパステンプレートで前回成功した候補を最初に試し、遮断中の候補は飛ばす。
         全て失敗したら ValueError を raise する。
         """
+        template = path_template(path)
         candidates = self._build_candidates(path)
+        kinds = self._routes.order(template, list(candidates))
 
-        for url, extra_headers in candidates:
-            r = self._request(url, params=params, extra_headers=extra_headers,
-                              timeout=timeout)
+        for kind in kinds:
+            url, extra_headers = candidates[kind]
+            r, blocked = self._send(url, params=params, extra_headers=extra_headers,
+                                    timeout=timeout)
             if r is not None:
-                # 成功したパスを記録（次回のために動的パスへ追加）
-                normalized = url.replace("https://connect.garmin.com/gc-api", "")
-                if path != normalized:
-                    self._dynamic_paths[path] = url
+                self._routes.record_success(template, kind)
                 return r
+            if blocked:
+                self._routes.record_blocked(template, kind)
 
+        skipped = len(candidates) - len(kinds)
         raise ValueError(
             f"Cookie クライアント: '{path}' の全 API 候補で JSON 取得に失敗"
+            + (f"（遮断中の {skipped} 候補はスキップ）" if skipped else "")
         )
 
     def _fetch_display_name(self) -> str:
@@ -223,6 +253,23 @@ class GarminCookieClient:
         )
         return r.json()
 
+    def get_activities_by_date(self, startdate: str, enddate: str = None, activitytype: str = None):
+        """startdate〜enddate（YYYY-MM-DD, 両端含む）の活動を全件返す（garminconnect と同じ引数）。"""
+        params = {"startDate": startdate, "endDate": enddate or startdate, "limit": "50"}
+        if activitytype:
+            params["activityType"] = activitytype
+        activities, start = [], 0
+        while True:
+            r = self._get(
+                "/activitylist-service/activities/search/activities",
+                params={**params, "start": str(start)},
+            )
+            page = r.json() or []
+            activities.extend(page)
+            if len(page) < 50:
+                return activities
+            start += len(page)
+
     def get_activity_splits(self, activity_id):
         r = self._get(f"/activity-service/activity/{activity_id}/splits")
         return r.json()
@@ -0,0 +1,61 @@
+"""
+Garmin Connect API のパス（/gc-api や connectapi のプレフィックスを除いた部分）。
+
+Playwright の事前取得（scripts/refresh_garmin_cookies_playwright.py）・
+非同期クライアント（garmin_async_client）・同期のヘルス取得（fetch_health_window）が同じパス・同じ日付分割で取得するための共通定義。
+パスは garminconnect と同じ。{date} / {display_name} / {start} / {end} を埋めて使う。
+"""
+from datetime import date, timedelta
+from typing import Dict, List
+
+
+ACTIVITY_LIST = "/activitylist-service/activities/search/activities"
+ACTIVITY_SPLITS = "/activity-service/activity/{activity_id}/splits"
+ACTIVITY_DETAILS = "/activity-service/activity/{activity_id}/details"
+ACTIVITY_WEATHER = "/activity-service/activity/{activity_id}/weather"
+SOCIAL_PROFILE = "/userprofile-service/socialProfile"
+
+# 日次ヘルス指標（prefetch_store.health_key の指標名 → パス）
+HEALTH_DAILY_ENDPOINTS = {
+    "hrv": "/hrv-service/hrv/{date}",
+    "rhr": "/userstats-service/wellness/daily/{display_name}?fromDate={date}&untilDate={date}&metricId=60",
+    "sleep": "/wellness-service/wellness/dailySleepData/{display_name}?date={date}&nonSleepBufferMinutes=60",
+    "stress": "/wellness-service/wellness/dailyStress/{date}",
+    "training_readiness": "/metrics-service/metrics/trainingreadiness/{date}",
+    "max_metrics": "/metrics-service/metrics/maxmet/daily/{date}/{date}",
+    "training_status": "/metrics-service/metrics/trainingstatus/aggregated/{date}",
+    "spo2": "/wellness-service/wellness/daily/spo2/{date}",
+    "respiration": "/wellness-service/wellness/daily/respiration/{date}",
+}
+# 期間 API（最大 HEALTH_RANGE_MAX_DAYS 日）: 指標 → (パス, 結果の日付キー)
+HEALTH_RANGE_ENDPOINTS = {
+    "steps": ("/usersummary-service/stats/steps/daily/{start}/{end}", "calendarDate"),
+    "body_battery": ("/wellness-service/wellness/bodyBattery/reports/daily?startDate={start}&endDate={end}", "date"),
+}
+HEALTH_RANGE_MAX_DAYS = 28
+HEALTH_RACE_PREDICTIONS = "/metrics-service/metrics/racepredictions/latest/{display_name}"
+
+
+def range_chunks(dates: List[date], max_days: int = HEALTH_RANGE_MAX_DAYS) -> List[List[date]]:
+    """日付を古い順の連続した区間（最大 max_days 日）に分ける。
+
+    日付が飛んでいるところでは区間を分ける（先頭〜末尾で期間 API を呼ぶので、
+    間の日を含めると max_days を超えることがある）。
+    """
+    chunks: List[List[date]] = []
+    for day in sorted(set(dates)):
+        if chunks and day - chunks[-1][-1] == timedelta(days=1) and len(chunks[-1]) < max_days:
+            chunks[-1].append(day)
+        else:
+            chunks.append([day])
+    return chunks
+
+
+def split_range_by_date(entries, date_key: str, dates: List[date]) -> Dict[str, object]:
+    """期間 API の結果を {日付文字列: その日のエントリ} に分ける（dates の日は結果がなければ {}）。"""
+    by_date = {
+        entry.get(date_key): entry
+        for entry in (entries if isinstance(entries, list) else [])
+        if isinstance(entry, dict) and entry.get(date_key)
+    }
+    return {d.isoformat(): by_date.get(d.isoformat(), {}) for d in dates}
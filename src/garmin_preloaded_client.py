@@ -5,22 +5,22 @@ Playwright が事前取得したデータを使う Garmin クライアント。
 （Garmin の connect-csrf-token 要求 / DPoP 保護）でも、
 Playwright のブラウザが事前に取得した JSON データを使うことで動作する。
 
-データは /tmp/garmin_prefetch.json に保存される。
+データは /tmp/garmin_prefetch.db（SQLite、prefetch_store）に保存される。
+起動時にファイル全体は読まず、要求されたレコードだけを ID の索引で読む。
 """
-import json
-import os
-import time
+from datetime import date, timedelta
+
+from prefetch_store import PREFETCH_DB, PrefetchReader, health_key
 
 
-PREFETCH_FILE = "/tmp/garmin_prefetch.json"
 MAX_AGE_SECONDS = 7200  # 2時間以上古いファイルは警告
 
 
-def is_available() -> bool:
-    if not os.path.exists(PREFETCH_FILE):
-        return False
-    age = time.time() - os.path.getmtime(PREFETCH_FILE)
-    return age < MAX_AGE_SECONDS
+def is_available(path: str = PREFETCH_DB) -> bool:
+    """プリフェッチデータが使えるか（存在し、MAX_AGE_SECONDS より新しく、活動が1件以上ある）。"""
+    reader = PrefetchReader(path)
+    return (reader.exists() and reader.age_seconds() < MAX_AGE_SECONDS
+            and reader.count("activities") > 0)
 
 
 class _DummyGarth:
@@ -31,65 +31,81 @@ class _DummyGarth:
 class GarminPreloadedClient:
     """Playwright が事前取得したデータを提供するクライアント。"""
 
-    def __init__(self):
+    def __init__(self, path: str = PREFETCH_DB):
         self.garth = _DummyGarth()
-        if not os.path.exists(PREFETCH_FILE):
-            raise FileNotFoundError(f"プリフェッチファイルが存在しません: {PREFETCH_FILE}")
+        self._store = PrefetchReader(path)
+        self._has_health = None
+        if not self._store.exists():
+            raise FileNotFoundError(f"プリフェッチデータが存在しません: {path}")
 
-        age = time.time() - os.path.getmtime(PREFETCH_FILE)
+        age = self._store.age_seconds()
         if age > MAX_AGE_SECONDS:
             raise ValueError(
-                f"プリフェッチファイルが古すぎます ({age/3600:.1f}時間)。"
+                f"プリフェッチデータが古すぎます ({age/3600:.1f}時間)。"
                 "Playwright ステップを再実行してください。"
             )
 
-        with open(PREFETCH_FILE) as f:
-            data = json.load(f)
-
-        self._activities: list = data.get("activities", [])
-        self._splits: dict = data.get("splits", {})
-        self._details: dict = data.get("details", {})
-
-        if len(self._activities) == 0:
-            raise ValueError("プリフェッチファイルにアクティビティデータがありません")
+        activity_count = self._store.count("activities")
+        if activity_count == 0:
+            raise ValueError("プリフェッチデータにアクティビティがありません")
 
-        print(f"  ℹ プリロード: {len(self._activities)} アクティビティ, "
-              f"{len(self._splits)} splits, {len(self._details)} details "
-              f"(ファイル更新: {age:.0f}秒前)")
+        print(f"  ℹ プリロード: {activity_count} アクティビティ (ファイル更新: {age:.0f}秒前)")
 
     def get_full_name(self) -> str:
         return "Garmin User (preloaded)"
 
     def get_activities(self, start: int, limit: int) -> list:
-        return self._activities[start:start + limit]
+        return self._store.slice("activities", start, limit)
 
     def get_activity_splits(self, activity_id):
-        aid = str(activity_id)
-        if aid in self._splits:
-            return self._splits[aid]
-        return []
+        return self._store.get("splits", activity_id, [])
 
     def get_activity_details(self, activity_id, maxchart=2000, maxpoly=4000):
-        aid = str(activity_id)
-        if aid in self._details:
-            return self._details[aid]
-        return {}
+        return self._store.get("details", activity_id, {})
 
     def get_activity_weather(self, activity_id):
-        return {}
-
-    # --- 日次健康データ API スタブ ---
-    # Playwright プリロードクライアントは /gc-api/ 経由の活動データのみ保持する。
-    # 日次健康データは garth 認証が必要なため、ここでは空を返してスキップさせる。
-    def get_hrv_data(self, date_str: str) -> dict: return {}
-    def get_rhr_day(self, date_str: str) -> dict: return {}
-    def get_sleep_data(self, date_str: str) -> dict: return {}
-    def get_daily_steps(self, start: str, end: str) -> list: return []
-    def get_body_battery(self, start: str, end: str = None) -> list: return []
-    def get_stress_data(self, date_str: str) -> dict: return {}
-    def get_training_readiness(self, date_str: str) -> dict: return {}
-    def get_max_metrics(self, date_str: str) -> dict: return {}
-    def get_training_status(self, date_str: str) -> dict: return {}
-    def get_race_predictions(self) -> dict: return {}
-    def get_spo2_data(self, date_str: str) -> dict: return {}
-    def get_respiration_data(self, date_str: str) -> dict: return {}
+        return self._store.get("weather", activity_id, {})
+
+    # --- 日次健康データ API ---
+    # Playwright ステップが本体と同じ日付・指標を health に事前取得している。
+    # 取得済みで空の指標は空を返し、ストアにない指標は例外にして取得失敗として記録させる
+    # （ヘルスストアがその日を「不完全」として次回再取得する）。
+    # ヘルスを1件も事前取得していないストア（ヘルス取得前に落ちた等）では全指標を空で返す。
+    def _health(self, metric: str, date_str: str = ""):
+        if self._has_health is None:
+            self._has_health = self._store.count("health") > 0
+        if not self._has_health:
+            return {}
+        data = self._store.get("health", health_key(metric, date_str))
+        if data is None:
+            raise LookupError(f"プリフェッチされていません: {health_key(metric, date_str)}")
+        return data
+
+    def _health_range(self, metric: str, start: str, end: str = None) -> list:
+        first = date.fromisoformat(start)
+        last = date.fromisoformat(end or start)
+        entries = []
+        for offset in range((last - first).days + 1):
+            entry = self._health(metric, (first + timedelta(days=offset)).isoformat())
+            if entry:
+                entries.append(entry)
+        return entries
+
+    @property
+    def display_name(self):
+        # RHR 等で本体が参照する。socialProfile の displayName を事前取得している
+        profile = self._store.get("health", health_key("profile"), {})
+        return profile.get("displayName")
+
+    def get_hrv_data(self, date_str: str) -> dict: return self._health("hrv", date_str)
+    def get_rhr_day(self, date_str: str) -> dict: return self._health("rhr", date_str)
+    def get_sleep_data(self, date_str: str) -> dict: return self._health("sleep", date_str)
+    def get_daily_steps(self, start: str, end: str) -> list: return self._health_range("steps", start, end)
+    def get_body_battery(self, start: str, end: str = None) -> list: return self._health_range("body_battery", start, end)
+    def get_stress_data(self, date_str: str) -> dict: return self._health("stress", date_str)
+    def get_training_readiness(self, date_str: str) -> dict: return self._health("training_readiness", date_str)
+    def get_max_metrics(self, date_str: str) -> dict: return self._health("max_metrics", date_str)
+    def get_training_status(self, date_str: str) -> dict: return self._health("training_status", date_str)
+    def get_race_predictions(self) -> dict: return self._health("race_predictions")
+    def get_spo2_data(self, date_str: str) -> dict: return self._health("spo2", date_str)
+    def get_respiration_data(self, date_str: str) -> dict: return self._health("respiration", date_str)
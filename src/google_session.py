@@ -0,0 +1,162 @@
+"""
+1回の実行で共有する Google API セッション。
+
+各 sync 関数が毎回行っていた
+  - サービスアカウント認証情報の読み込み
+  - build('drive' / 'sheets' / 'docs')（ディスカバリードキュメントの取得）
+  - Drive の files().list による "Garmin Running Log" 等の検索
+  - spreadsheets().get によるタブ一覧の取得
+を1回にまとめる。解決したスプレッドシート・タブ・ドキュメントの ID は
+~/.garmin_cache/google_ids.json に保存し、次回の実行でも検索を省略する。
+ファイルが削除・移動された場合（404 等）は forget_ids() で破棄して次回再検索する。
+"""
+import json
+
+from google.oauth2.service_account import Credentials
+from googleapiclient.discovery import build
+
+from local_cache import cache_path, load_json, save_json
+
+
+GOOGLE_ID_CACHE_FILE = cache_path("google_ids.json")
+
+SCOPES = [
+    'https://www.googleapis.com/auth/drive',
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/documents',
+]
+
+SPREADSHEET_MIME = 'application/vnd.google-apps.spreadsheet'
+DOCUMENT_MIME = 'application/vnd.google-apps.document'
+
+
+def load_google_credentials(service_account_json_str):
+    try:
+        info = json.loads(service_account_json_str)
+        return Credentials.from_service_account_info(info, scopes=SCOPES)
+    except Exception as e:
+        print(f"Error loading Google Service Account: {e}")
+        return None
+
+
+class GoogleSession:
+    """認証情報・サービスオブジェクト・解決済み ID をキャッシュする Google API セッション。"""
+
+    def __init__(self, service_account_json: str, folder_id: str, id_cache_path: str = GOOGLE_ID_CACHE_FILE):
+        self.service_account_json = service_account_json
+        self.folder_id = folder_id
+        self.id_cache_path = id_cache_path
+        self._creds = None
+        self._creds_loaded = False
+        self._services: dict = {}
+        # 実行間で保持する ID: {"<folder_id>": {"files": {key: id}, "tabs": {spreadsheet_id: {title: sheetId}}}}
+        # tabs はスプレッドシート上の並び順で保持する（先頭が最初のタブ）
+        self._ids: dict = load_json(id_cache_path, {}).get(folder_id, {"files": {}, "tabs": {}})
+        self._ids.setdefault("files", {})
+        self._ids.setdefault("tabs", {})
+
+    @property
+    def credentials(self):
+        if not self._creds_loaded:
+            self._creds = load_google_credentials(self.service_account_json)
+            self._creds_loaded = True
+        return self._creds
+
+    def service(self, name: str, version: str):
+        """build() 済みのサービスを返す（1回の実行で1回だけ build する）。"""
+        key = (name, version)
+        if key not in self._services:
+            self._services[key] = build(name, version, credentials=self.credentials, cache_discovery=False)
+        return self._services[key]
+
+    @property
+    def drive(self):
+        return self.service('drive', 'v3')
+
+    @property
+    def sheets(self):
+        return self.service('sheets', 'v4')
+
+    @property
+    def docs(self):
+        return self.service('docs', 'v1')
+
+    def _find_file(self, name: str, mime_type: str, create: bool = False, all_drives: bool = False):
+        key = f"{mime_type}:{name}"
+        cached = self._ids["files"].get(key)
+        if cached:
+            return cached
+
+        query = (
+            f"name = '{name}' and '{self.folder_id}' in parents "
+            f"and mimeType = '{mime_type}' and trashed = false"
+        )
+        kwargs = {"q": query, "spaces": 'drive', "fields": 'files(id, name)'}
+        if all_drives:
+            kwargs.update(supportsAllDrives=True, includeItemsFromAllDrives=True)
+        files = self.drive.files().list(**kwargs).execute().get('files', [])
+        if files:
+            file_id = files[0]['id']
+        elif create:
+            metadata = {'name': name, 'parents': [self.folder_id], 'mimeType': mime_type}
+            file_id = self.drive.files().create(body=metadata, fields='id').execute().get('id')
+        else:
+            return None
+        self._ids["files"][key] = file_id
+        self._save_ids()
+        return file_id
+
+    def find_spreadsheet(self, name: str, create: bool = False):
+        return self._find_file(name, SPREADSHEET_MIME, create=create)
+
+    def find_document(self, name: str):
+        return self._find_file(name, DOCUMENT_MIME, all_drives=True)
+
+    def _load_tabs(self, spreadsheet_id: str) -> None:
+        meta = self.sheets.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
+        props = [s['properties'] for s in meta.get('sheets', [])]
+        self._ids["tabs"][spreadsheet_id] = {p['title']: p.get('sheetId') for p in props}
+        self._save_ids()
+
+    def first_tab_title(self, spreadsheet_id: str) -> str:
+        if spreadsheet_id not in self._ids["tabs"]:
+            self._load_tabs(spreadsheet_id)
+        titles = list(self._ids["tabs"][spreadsheet_id])
+        return titles[0] if titles else 'Sheet1'
+
+    def ensure_tab(self, spreadsheet_id: str, title: str):
+        """タブが無ければ作成し、その sheetId を返す。"""
+        tabs = self._ids["tabs"].get(spreadsheet_id)
+        if tabs is None or title not in tabs:
+            self._load_tabs(spreadsheet_id)
+            tabs = self._ids["tabs"][spreadsheet_id]
+        if title in tabs:
+            return tabs[title]
+        reply = self.sheets.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={'requests': [{'addSheet': {'properties': {'title': title}}}]}
+        ).execute()
+        sheet_id = reply['replies'][0]['addSheet']['properties'].get('sheetId')
+        tabs[title] = sheet_id
+        self._save_ids()
+        print(f"  Created '{title}' tab.")
+        return sheet_id
+
+    def forget_ids(self) -> None:
+        """保存済み ID を破棄する（ファイル削除・権限変更などで 404 になった場合）。"""
+        self._ids = {"files": {}, "tabs": {}}
+        self._save_ids()
+
+    def _save_ids(self) -> None:
+        try:
+            data = load_json(self.id_cache_path, {})
+            data[self.folder_id] = self._ids
+            save_json(self.id_cache_path, data)
+        except Exception as e:
+            print(f"  ⚠ Google ID キャッシュ保存失敗: {e}")
+
+
+def is_stale_id_error(err) -> bool:
+    """保存済み ID が無効になったことを示す HttpError か（404 / 範囲解析エラー）。"""
+    status = getattr(getattr(err, 'resp', None), 'status', None)
+    return status in (400, 404)
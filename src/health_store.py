@@ -0,0 +1,110 @@
+"""
+日次ヘルスデータのローカル永続ストア。
+
+日付ごとに fetch_health_window の結果を保存し、次回以降は次の日だけを取得する:
+  - 直近 REFRESH_DAYS 日（今日・昨日。睡眠や HRV は遅れて確定するため毎回取り直す）
+  - 直近の表示期間のうち、未取得または不完全（失敗した指標がある・データが空）の日
+  - バックフィル: 保存期間内の未取得日を、1回の実行あたり BACKFILL_DAYS_PER_RUN 日ずつ
+
+不完全な日は MAX_ATTEMPTS 回まで再取得し、それ以降は（時計を着けていない日など）諦める。
+"""
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from local_cache import cache_path, load_json, save_json
+
+
+HEALTH_STORE_FILE = cache_path("health.json")
+_STORE_VERSION = 1
+
+REFRESH_DAYS = 2
+MAX_ATTEMPTS = 4
+HISTORY_DAYS = int(os.getenv("GARMIN_HEALTH_HISTORY_DAYS", "365"))
+BACKFILL_DAYS_PER_RUN = int(os.getenv("GARMIN_HEALTH_BACKFILL_PER_RUN", "14"))
+
+
+class HealthStore:
+    """date_str → {data, complete, attempts, fetched_at} の永続ストア。"""
+
+    def __init__(self, path: str = HEALTH_STORE_FILE):
+        self.path = path
+        data = load_json(path, {})
+        if data.get("version") != _STORE_VERSION:
+            data = {}
+        self._days: dict = data.get("days", {})
+        if self._days:
+            print(f"  ℹ ヘルスストア: {len(self._days)} 日分 "
+                  f"({min(self._days)} 〜 {max(self._days)})")
+
+    def __len__(self) -> int:
+        return len(self._days)
+
+    def _needs_fetch(self, date_str: str) -> bool:
+        entry = self._days.get(date_str)
+        if entry is None:
+            return True
+        return not entry.get("complete") and entry.get("attempts", 0) < MAX_ATTEMPTS
+
+    def days_to_fetch(self, today: date, recent_days: int) -> List[date]:
+        """直近 recent_days 日のうち今回取得すべき日（新しい順）。"""
+        out = []
+        for days_ago in range(recent_days):
+            d = today - timedelta(days=days_ago)
+            if days_ago < REFRESH_DAYS or self._needs_fetch(d.isoformat()):
+                out.append(d)
+        return out
+
+    def backfill_dates(self, today: date, recent_days: int,
+                       history_days: int = HISTORY_DAYS,
+                       budget: int = BACKFILL_DAYS_PER_RUN) -> List[date]:
+        """表示期間より古い未取得日を新しい順に最大 budget 日返す。"""
+        out = []
+        for days_ago in range(recent_days, history_days):
+            if len(out) >= budget:
+                break
+            d = today - timedelta(days=days_ago)
+            if self._needs_fetch(d.isoformat()):
+                out.append(d)
+        return out
+
+    def prefetch_dates(self, today: date, recent_days: int) -> List[date]:
+        """この実行で取得する日（days_to_fetch + backfill_dates）を古い順で返す。事前取得用。"""
+        return sorted(set(self.days_to_fetch(today, recent_days) + self.backfill_dates(today, recent_days)))
+
+    def update(self, health_data_list: List[dict], failures: Optional[Dict[str, dict]] = None) -> None:
+        """fetch_health_window の結果を保存する。"""
+        failures = failures or {}
+        now = datetime.now().isoformat(timespec="seconds")
+        for day in health_data_list:
+            date_str = day.get("date")
+            if not date_str:
+                continue
+            prev = self._days.get(date_str, {})
+            failed = sorted(failures.get(date_str, {}))
+            # 再取得で失敗・欠損した指標は前回の値を残す
+            merged = dict(prev.get("data") or {})
+            merged.update({k: v for k, v in day.items() if v is not None})
+            has_data = any(k != "date" and v not in (None, "") for k, v in merged.items())
+            self._days[date_str] = {
+                "data": merged,
+                "complete": has_data and not failed,
+                "failed": failed,
+                "attempts": prev.get("attempts", 0) + 1,
+                "fetched_at": now,
+            }
+
+    def days(self, since: Optional[date] = None) -> List[dict]:
+        """保存済みの日次データを新しい順で返す。"""
+        since_str = since.isoformat() if since else ""
+        return [
+            dict(self._days[d]["data"])
+            for d in sorted(self._days, reverse=True)
+            if d >= since_str
+        ]
+
+    def save(self) -> None:
+        try:
+            save_json(self.path, {"version": _STORE_VERSION, "days": self._days})
+        except Exception as e:
+            print(f"  ⚠ ヘルスストア保存失敗: {e}")
@@ -0,0 +1,67 @@
+"""
+GarminCookieClient の HTTP トランスポート設定。
+
+  - 接続プール: 並列 enrich / ヘルス取得のスレッド数に合わせた大きさにし、
+    ホストごとの接続を使い回す（既定の 10 接続を超えると毎回接続し直しになるため）
+  - 接続エラーだけをアダプターで再試行する（HTTP ステータスの再試行は呼び出し側で行う）
+  - Accept-Encoding: urllib3 が実際に展開できる形式だけを送る
+    （brotli / brotlicffi が入っていない環境で br を受け取って JSON 解析に失敗しないように）
+  - JsonResponse: 本文の JSON を1回だけ解析して保持するレスポンス
+"""
+import json
+import os
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+
+HTTP_POOL_SIZE = int(os.getenv("GARMIN_HTTP_POOL_SIZE", "16"))
+HTTP_POOL_HOSTS = 4           # connect / connectapi / sso などホスト単位のプール数
+HTTP_CONNECT_RETRIES = 2
+
+NOT_JSON = object()
+
+
+def configure_session(session, pool_size: int = HTTP_POOL_SIZE) -> None:
+    """session にマウント済みのアダプター（cloudscraper の TLS アダプターを含む）のプールを設定する。
+
+    アダプターは差し替えず設定だけ変えるので、cloudscraper の TLS フィンガープリントは保たれる。
+    最初のリクエストより前に呼ぶこと。
+    """
+    retries = Retry(total=HTTP_CONNECT_RETRIES, connect=HTTP_CONNECT_RETRIES, read=False,
+                    status=0, other=0, backoff_factor=0.5)
+    for prefix in ("https://", "http://"):
+        adapter = session.adapters.get(prefix)
+        if not isinstance(adapter, HTTPAdapter):
+            adapter = HTTPAdapter()
+            session.mount(prefix, adapter)
+        adapter.max_retries = retries
+        adapter.init_poolmanager(HTTP_POOL_HOSTS, pool_size, block=False)
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+    session.headers["Connection"] = "keep-alive"
+
+
+def parse_json(response):
+    """JSON の本文を解析して返す。HTML や JSON でない本文は NOT_JSON。"""
+    if "text/html" in response.headers.get("Content-Type", ""):
+        return NOT_JSON
+    try:
+        return json.loads(response.content)
+    except ValueError:
+        return NOT_JSON
+
+
+class JsonResponse:
+    """解析済み JSON を持つレスポンス。json() は再解析せず同じオブジェクトを返す。"""
+
+    __slots__ = ("status_code", "headers", "url", "_data")
+
+    def __init__(self, response, data):
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = response.url
+        self._data = data
+
+    def json(self):
+        return self._data
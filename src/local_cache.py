@@ -0,0 +1,38 @@
+"""
+ローカル永続キャッシュの共通ユーティリティ。
+
+GitHub Actions では ~/.garmin_cache を actions/cache で実行間に引き継ぐ。
+ファイルは一時ファイルへ書いてから os.replace で置き換えるため、
+途中でジョブが落ちても壊れた JSON が残らない。
+"""
+import json
+import os
+
+
+CACHE_DIR = os.path.expanduser(os.getenv("GARMIN_CACHE_DIR", "~/.garmin_cache"))
+
+
+def cache_path(name: str) -> str:
+    """キャッシュディレクトリ配下のファイルパスを返す。"""
+    return os.path.join(CACHE_DIR, name)
+
+
+def load_json(path: str, default):
+    """JSON ファイルを読み込む。存在しない・壊れている場合は default を返す。"""
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"  ⚠ キャッシュ読み込み失敗（空として扱います）: {path}: {e}")
+        return default
+
+
+def save_json(path: str, data) -> None:
+    """JSON ファイルをアトミックに書き込む。"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
@@ -0,0 +1,132 @@
+"""
+Playwright の事前取得データを置く追記型ストア（SQLite 1ファイル）。
+
+/tmp/garmin_prefetch.db の records テーブルに
+  kind（activities / splits / details / weather / health）, id, seq（kind ごとの取得順）, data（JSON）
+を1レコード1行で、取得したそばから書き込む（書き込みごとにコミット）。
+Playwright ステップが途中で落ちても、それまでにコミットした分は残る。
+
+読み込み側（GarminPreloadedClient）は (kind, id) の主キーと (kind, seq) の索引で
+要求されたレコードだけを取り出して JSON を解析する。開くときにファイル全体は読まないので、
+データが数百 MB になっても起動は一定時間で、メモリは実際に読んだ分しか使わない。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+
+
+PREFETCH_DB = "/tmp/garmin_prefetch.db"
+KINDS = ("activities", "splits", "details", "weather", "health")
+_MMAP_SIZE = 1 << 30
+# 詳細のうち下流（enrich・同期）で使わない巨大なキー（プリフェッチストア・詳細キャッシュに書く前に削る）
+DETAIL_DROP_KEYS = ("activityDetailMetrics", "metricDescriptors", "geoPolylineDTO", "heartRateDTOs")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    kind TEXT NOT NULL,
+    id   TEXT NOT NULL,
+    seq  INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (kind, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS records_seq ON records (kind, seq);
+"""
+
+
+class PrefetchWriter:
+    """records テーブルにレコードを書き込む。同じ (kind, id) は内容だけ上書きし、順番は最初のまま。
+
+    seq は kind ごとに 0 から隙間なく振るので、seq の範囲がそのまま取得順の位置になる。
+    """
+
+    def __init__(self, path: str = PREFETCH_DB, reset: bool = True):
+        self.path = path
+        self._lock = threading.Lock()
+        if reset:
+            # 前回の実行の残りは使わない（このストアは1回のジョブ内だけで使う）
+            for suffix in ("", "-wal", "-shm", "-journal"):
+                try:
+                    os.remove(path + suffix)
+                except FileNotFoundError:
+                    pass
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self.counts: Dict[str, int] = {kind: 0 for kind in KINDS}
+        for kind, next_seq in self._conn.execute("SELECT kind, MAX(seq) + 1 FROM records GROUP BY kind"):
+            self.counts[kind] = next_seq
+
+    def append(self, kind: str, records: Iterable[Tuple[str, object]]) -> int:
+        """(id, data) を書き込んでコミットする。書いた件数を返す。"""
+        rows = [(str(rid), json.dumps(data, ensure_ascii=False)) for rid, data in records]
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            next_seq = self.counts.get(kind, 0)
+            for rid, data in rows:
+                updated = self._conn.execute(
+                    "UPDATE records SET data = ? WHERE kind = ? AND id = ?", (data, kind, rid)
+                ).rowcount
+                if not updated:
+                    self._conn.execute(
+                        "INSERT INTO records (kind, id, seq, data) VALUES (?, ?, ?, ?)",
+                        (kind, rid, next_seq, data),
+                    )
+                    next_seq += 1
+            self.counts[kind] = next_seq
+        return len(rows)
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class PrefetchReader:
+    """PrefetchWriter が書いたストアを必要な分だけ読む。"""
+
+    def __init__(self, path: str = PREFETCH_DB):
+        self.path = path
+        self._local = threading.local()   # sqlite3 の接続はスレッドごとに持つ
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path)
+            # ページはメモリマップで読む（OS のページキャッシュを共有し、読んだ分だけ載る）
+            conn.execute(f"PRAGMA mmap_size={_MMAP_SIZE}")
+        return conn
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def age_seconds(self) -> float:
+        # WAL モードの書き込みは -wal に入るので、新しいほうの更新時刻を使う
+        mtimes = [os.path.getmtime(p) for p in (self.path, self.path + "-wal") if os.path.exists(p)]
+        return time.time() - max(mtimes)
+
+    def count(self, kind: str) -> int:
+        """kind の件数（seq の索引から求めるので全件は走査しない）。"""
+        row = self._conn().execute("SELECT MAX(seq) FROM records WHERE kind = ?", (kind,)).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def get(self, kind: str, record_id, default=None):
+        row = self._conn().execute(
+            "SELECT data FROM records WHERE kind = ? AND id = ?", (kind, str(record_id))
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def slice(self, kind: str, start: int, limit: int) -> list:
+        """取得順で start 件目から limit 件を返す。"""
+        rows = self._conn().execute(
+            "SELECT data FROM records WHERE kind = ? AND seq >= ? AND seq < ? ORDER BY seq",
+            (kind, start, start + limit),
+        )
+        return [json.loads(data) for (data,) in rows]
+
+
+def health_key(metric: str, date_str: str = "") -> str:
+    """health の id。日付ごとの指標は "<指標>:<日付>"、日付のないもの（レース予測等）は指標名だけ。"""
+    return f"{metric}:{date_str}" if date_str else metric
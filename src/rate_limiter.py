@@ -0,0 +1,136 @@
+"""
+Garmin API 呼び出し全体で共有するトークンバケット型レートリミッター。
+
+各所に散らばっていた time.sleep による待機の代わりに、すべての Garmin 呼び出しを
+RateLimitedClient 経由にして 1 つのバケットからトークンを取得させる。
+並列スレッドから呼ばれても合計レートは GARMIN_RATE_LIMIT（リクエスト/秒）を超えない。
+
+429 を検出すると現在のレートを半減させ（乗算的減少）、成功が続くと
+設定値まで少しずつ戻す（加算的増加）。Retry-After が分かれば、その間はバケット全体を止める。
+RateLimitedClient は各呼び出しを retry_policy.RetryPolicy で包み、429 などを共通の方針で再試行する。
+"""
+import asyncio
+import os
+import threading
+import time
+
+from retry_policy import RetryPolicy, is_rate_limit_error, retry_after_seconds
+
+
+DEFAULT_RATE = float(os.getenv("GARMIN_RATE_LIMIT", "2.0"))  # リクエスト/秒
+DEFAULT_BURST = int(os.getenv("GARMIN_RATE_BURST", "4"))
+MIN_RATE = 0.1
+
+
+class TokenBucket:
+    """スレッドセーフなトークンバケット（AIMD でレートを自動調整）。
+
+    clock / sleep はテストで時計を差し替えるためのもの（既定は time.monotonic / time.sleep）。
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.target_rate = max(rate, MIN_RATE)
+        self.rate = self.target_rate
+        self.capacity = max(burst, 1)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+        self.throttled = 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """トークンがあれば 1 つ取って 0 を、なければ補充までの秒数を返す（待たない）。"""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            wait = (1 - self._tokens) / self.rate
+            self.waited += wait
+        return wait
+
+    def acquire(self) -> None:
+        """トークンを 1 つ取得する。足りなければ補充まで待つ。"""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            self._sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """acquire の asyncio 版（イベントループを止めずに待つ）。"""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def on_rate_limited(self, retry_after: float = None) -> None:
+        """429 を受けたらレートを半減し、溜まったトークンを捨てる。
+
+        retry_after（秒）があれば、その間は全スレッドがトークンを取れないようにする。
+        """
+        with self._lock:
+            self.rate = max(MIN_RATE, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0, -(retry_after or 0.0) * self.rate)
+            self._updated = self._clock()
+            self.throttled += 1
+        print(f"  ⚠ 429 検出: レートを {self.rate:.2f} req/s に下げます")
+
+    def on_success(self) -> None:
+        """成功ごとに設定レートへ向けて少しずつ戻す。"""
+        if self.rate >= self.target_rate:
+            return
+        with self._lock:
+            self.rate = min(self.target_rate, self.rate + self.target_rate * 0.05)
+
+
+class RateLimitedClient:
+    """Garmin クライアントをラップし、すべてのメソッド呼び出しにレート制限とリトライをかける。
+
+    再試行は policy（メソッド名をエンドポイントとして予算を数える）に任せ、
+    試行ごとにトークンを取得する。
+    属性の読み書き（display_name, garth 等）はそのまま元のクライアントへ委譲する。
+    """
+
+    def __init__(self, client, limiter: TokenBucket = None, policy: RetryPolicy = None):
+        object.__setattr__(self, "_client", client)
+        object.__setattr__(self, "limiter", limiter or TokenBucket())
+        object.__setattr__(self, "policy", policy or RetryPolicy())
+
+    @property
+    def wrapped(self):
+        return self._client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        limiter = self.limiter
+
+        def _attempt(*args, **kwargs):
+            limiter.acquire()
+            try:
+                result = attr(*args, **kwargs)
+            except Exception as e:
+                if is_rate_limit_error(e):
+                    limiter.on_rate_limited(retry_after_seconds(e))
+                raise
+            limiter.on_success()
+            return result
+
+        def _call(*args, **kwargs):
+            return self.policy.call(name, _attempt, *args, **kwargs)
+
+        return _call
+
+    def __setattr__(self, name, value):
+        setattr(self._client, name, value)
@@ -0,0 +1,213 @@
+"""
+Garmin API 呼び出しの共通リトライポリシー。
+
+認証・活動一覧・詳細・ヘルスのすべての呼び出しを RetryPolicy.call（asyncio 版は call_async）で包み、
+429 と一時的なエラー（5xx・接続エラー）だけを再試行する。
+
+  - 待機時間: Retry-After があればそれに従い（少しのジッターを足す）、なければ
+    指数バックオフ + フルジッター（最大 RETRY_MAX_WAIT 秒）。認証は auth_policy() の
+    長めの待機（60s → 120s に少しのジッター）を使う
+  - エンドポイントごとの予算: 1回の実行で再試行できる回数（GARMIN_RETRY_BUDGET）。
+    使い切ったエンドポイントは即座に失敗させ、他の呼び出しの時間を奪わない
+  - 全体の期限: プロセス開始から GARMIN_RETRY_DEADLINE 秒。待機が期限を越えるなら再試行しない
+    （ワークフローの timeout-minutes: 30 から Playwright ステップの最大 15 分と
+    Google への同期の時間を引いた値を既定にしている）
+"""
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Optional
+
+from requests import RequestException
+
+
+RETRY_DEADLINE = float(os.getenv("GARMIN_RETRY_DEADLINE", "720"))  # 秒
+RETRY_ENDPOINT_BUDGET = int(os.getenv("GARMIN_RETRY_BUDGET", "10"))
+RETRY_MAX_ATTEMPTS = 4
+RETRY_BASE_WAIT = 2.0
+RETRY_MAX_WAIT = 120.0
+# 認証: ログイン・トークン更新の 429 は API 呼び出しより長く続くので、待機を長めにとる
+AUTH_MAX_ATTEMPTS = 3
+AUTH_BASE_WAIT = 30.0   # 60s → 120s
+AUTH_MAX_WAIT = 240.0
+TRANSIENT_STATUSES = (500, 502, 503, 504)
+
+
+class RateLimitError(ValueError):
+    """429 を受けたことを示す例外。retry_after は Retry-After ヘッダーの秒数（なければ None）。"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# "429 Client Error" / "429 Too Many Requests" / "status 429" のようなステータス表記だけに一致させる
+# （URL・活動 ID・日付に含まれる 429 では一致しない）
+_STATUS_429 = re.compile(
+    r"\b429\s+(?:client error|too many requests)|\b(?:status|http|code)[\s:=_-]*429\b|too many requests",
+    re.IGNORECASE,
+)
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """例外（またはその原因）が 429 / Too Many Requests を示しているか。
+
+    RateLimitError・レスポンスのステータスコード・ステータス表記のメッセージで判定する。
+    """
+    for e in _error_chain(exc):
+        if isinstance(e, RateLimitError):
+            return True
+        response = getattr(e, "response", None)
+        if getattr(response, "status_code", None) == 429:
+            return True
+        if _STATUS_429.search(str(e)):
+            return True
+    return False
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """Retry-After ヘッダーの値（秒数または HTTP 日付）を秒数にする。解釈できなければ None。"""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        when = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def _error_chain(exc: BaseException):
+    """exc と、その原因になった例外（garth の .error・__cause__・__context__）を順にたどる。"""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        cause = getattr(exc, "error", None)
+        if not isinstance(cause, BaseException):
+            cause = exc.__cause__ or exc.__context__
+        exc = cause
+
+
+def _response(exc: BaseException):
+    for e in _error_chain(exc):
+        response = getattr(e, "response", None)
+        if response is not None and hasattr(response, "status_code"):
+            return response
+    return None
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """例外（またはその原因）に付いている Retry-After を秒数で返す。"""
+    for e in _error_chain(exc):
+        if getattr(e, "retry_after", None) is not None:
+            return e.retry_after
+    response = _response(exc)
+    if response is None:
+        return None
+    return parse_retry_after((getattr(response, "headers", None) or {}).get("Retry-After"))
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """再試行で解決する見込みのあるエラー（429・5xx・接続エラー）か。"""
+    if is_rate_limit_error(exc):
+        return True
+    response = _response(exc)
+    if response is not None:
+        return response.status_code in TRANSIENT_STATUSES
+    return any(isinstance(e, (RequestException, ConnectionError, TimeoutError)) for e in _error_chain(exc))
+
+
+class RetryPolicy:
+    """1回の実行で共有するリトライポリシー（スレッドセーフ）。
+
+    clock / sleep はテストで時計を差し替えるためのもの（既定は time.monotonic / time.sleep）。
+    """
+
+    def __init__(self, deadline: float = RETRY_DEADLINE, budget: int = RETRY_ENDPOINT_BUDGET,
+                 max_attempts: int = RETRY_MAX_ATTEMPTS, base_wait: float = RETRY_BASE_WAIT,
+                 max_wait: float = RETRY_MAX_WAIT, full_jitter: bool = True,
+                 clock=time.monotonic, sleep=time.sleep):
+        self._clock = clock
+        self._sleep = sleep
+        self.deadline_at = clock() + deadline
+        self.budget = budget
+        self.max_attempts = max(1, max_attempts)
+        self.base_wait = base_wait
+        self.max_wait = max_wait
+        # False のときはバックオフの値に最大 20% のジッターを足すだけ（待機が短くなりすぎない）
+        self.full_jitter = full_jitter
+        self._spent = {}
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.waited = 0.0
+
+    def remaining(self) -> float:
+        """全体の期限までの残り秒数。"""
+        return self.deadline_at - self._clock()
+
+    def next_wait(self, endpoint: str, exc: BaseException, attempt: int) -> Optional[float]:
+        """attempt 回目の失敗後に待つ秒数。再試行しない場合は None（予算はここで消費する）。"""
+        if attempt >= self.max_attempts or not is_retryable(exc):
+            return None
+        retry_after = retry_after_seconds(exc)
+        if retry_after is not None:
+            wait = retry_after + random.uniform(0, min(retry_after * 0.1, 5.0) + 0.5)
+        else:
+            backoff = min(self.max_wait, self.base_wait * 2 ** attempt)
+            wait = random.uniform(0, backoff) if self.full_jitter else backoff + random.uniform(0, backoff * 0.2)
+        with self._lock:
+            if wait > self.remaining() or self._spent.get(endpoint, 0) >= self.budget:
+                return None
+            self._spent[endpoint] = self._spent.get(endpoint, 0) + 1
+            self.retries += 1
+            self.waited += wait
+        return wait
+
+    def _log(self, endpoint: str, exc: BaseException, attempt: int, wait: float) -> None:
+        reason = "429" if is_rate_limit_error(exc) else type(exc).__name__
+        print(f"    ↻ {endpoint}: {reason} → {wait:.1f}s 後に再試行 ({attempt}/{self.max_attempts - 1})")
+
+    def call(self, endpoint: str, fn, *args, **kwargs):
+        """fn(*args, **kwargs) を実行し、一時的なエラーなら待って再試行する。"""
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                wait = self.next_wait(endpoint, e, attempt)
+                if wait is None:
+                    raise
+                self._log(endpoint, e, attempt, wait)
+                self._sleep(wait)
+
+    async def call_async(self, endpoint: str, coro_fn, *args, **kwargs):
+        """call の asyncio 版（待機中もイベントループを止めない）。"""
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await coro_fn(*args, **kwargs)
+            except Exception as e:
+                wait = self.next_wait(endpoint, e, attempt)
+                if wait is None:
+                    raise
+                self._log(endpoint, e, attempt, wait)
+                await asyncio.sleep(wait)
+
+
+def auth_policy(deadline: float = RETRY_DEADLINE) -> RetryPolicy:
+    """認証用のリトライポリシー（60s → 120s、フルジッターなし）。"""
+    return RetryPolicy(deadline=deadline, max_attempts=AUTH_MAX_ATTEMPTS, base_wait=AUTH_BASE_WAIT,
+                       max_wait=AUTH_MAX_WAIT, full_jitter=False)
@@ -0,0 +1,139 @@
+"""
+差分ベースの Google Sheets 書き込み。
+
+タブ全体を clear → 全行 update する代わりに、
+  1. 現在のタブの値を1回だけ読み込み
+  2. キー列（日付・アクティビティ等）で既存行と新しい行を突き合わせ（difflib.SequenceMatcher）
+  3. 行の挿入・削除は spreadsheets.batchUpdate（insertDimension / deleteDimension）1回、
+     変更・追加された行の値は values.batchUpdate 1回
+で書き込む。送信量は変更行数に比例し、書き込み中にシートが空になる瞬間もない。
+"""
+import re
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import List, Sequence
+
+# シートから読み戻した日時文字列を正規化するための書式
+_DATETIME_FORMATS = (
+    '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d',
+    '%Y/%m/%d %H:%M:%S', '%Y/%m/%d %H:%M', '%Y/%m/%d',
+)
+# USER_ENTERED で書いた "19:30" / "1:05:30" は時刻・時間として解釈され、"19:30:00" のように読み戻る
+_DURATION_RE = re.compile(r'^(\d{1,3}):([0-5]\d)(?::([0-5]\d(?:\.\d+)?))?$')
+
+
+def _normalize_cell(value):
+    """書き込んだ値とシートから読み戻した値を比較できる形にそろえる。"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return str(value).upper()
+    if isinstance(value, (int, float)):
+        return round(float(value), 6)
+    text = str(value).strip()
+    match = _DURATION_RE.match(text)
+    if match:
+        # Sheets と同じく H:MM / H:MM:SS と解釈して秒数にそろえる
+        hours, minutes, seconds = match.groups()
+        return ('duration', round(int(hours) * 3600 + int(minutes) * 60 + float(seconds or 0), 6))
+    for fmt in _DATETIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).isoformat()
+        except ValueError:
+            pass
+    try:
+        return round(float(text.replace(',', '')), 6)
+    except ValueError:
+        return text
+
+
+def _rows_equal(old: Sequence, new: Sequence) -> bool:
+    width = max(len(old), len(new))
+    old = list(old) + [""] * (width - len(old))
+    new = list(new) + [""] * (width - len(new))
+    return all(_normalize_cell(a) == _normalize_cell(b) for a, b in zip(old, new))
+
+
+def _row_key(row: Sequence, key_columns: Sequence[int]) -> tuple:
+    return tuple(_normalize_cell(row[c]) if c < len(row) else "" for c in key_columns)
+
+
+def write_rows_diff(session, spreadsheet_id: str, title: str, header: List, rows: List[List],
+                    key_columns: Sequence[int] = (0,)) -> dict:
+    """header + rows をタブ title に差分書き込みし、件数の内訳を返す。"""
+    sheets = session.sheets
+    sheet_id = session.ensure_tab(spreadsheet_id, title)
+
+    current = sheets.spreadsheets().values().get(
+        spreadsheetId=spreadsheet_id, range=f"'{title}'!A:Z",
+        valueRenderOption='UNFORMATTED_VALUE', dateTimeRenderOption='FORMATTED_STRING',
+    ).execute().get('values', [])
+    old_header = current[0] if current else []
+    old_rows = current[1:]
+
+    structural = []   # spreadsheets.batchUpdate（下から順に適用するので行番号がずれない）
+    writes = {}       # 最終的な行番号（1始まり）→ 書き込む行
+    stats = {"inserted": 0, "deleted": 0, "updated": 0, "unchanged": 0}
+
+    if not old_header or not _rows_equal(old_header, header):
+        writes[1] = list(header) + [""] * max(0, len(old_header) - len(header))
+
+    def _dimension(start, end):
+        return {'sheetId': sheet_id, 'dimension': 'ROWS', 'startIndex': start, 'endIndex': end}
+
+    old_keys = [_row_key(r, key_columns) for r in old_rows]
+    new_keys = [_row_key(r, key_columns) for r in rows]
+    opcodes = SequenceMatcher(None, old_keys, new_keys, autojunk=False).get_opcodes()
+
+    # データ行 i（0始まり）はグリッド上の行インデックス i + 1（ヘッダーが 0）
+    for tag, i1, i2, j1, j2 in reversed(opcodes):
+        if tag == 'equal':
+            for k in range(i2 - i1):
+                old, new = old_rows[i1 + k], rows[j1 + k]
+                if _rows_equal(old, new):
+                    stats["unchanged"] += 1
+                else:
+                    writes[j1 + k + 2] = list(new) + [""] * max(0, len(old) - len(new))
+                    stats["updated"] += 1
+            continue
+
+        n_old, n_new = i2 - i1, j2 - j1
+        overlap = min(n_old, n_new)
+        for k in range(n_new):
+            new = rows[j1 + k]
+            pad = len(old_rows[i1 + k]) - len(new) if k < overlap else 0
+            writes[j1 + k + 2] = list(new) + [""] * max(0, pad)
+        stats["updated"] += overlap
+        if n_new > n_old:
+            structural.append({'insertDimension': {
+                'range': _dimension(i1 + overlap + 1, i1 + n_new + 1),
+                'inheritFromBefore': True,
+            }})
+            stats["inserted"] += n_new - n_old
+        elif n_old > n_new:
+            structural.append({'deleteDimension': {'range': _dimension(i1 + n_new + 1, i2 + 1)}})
+            stats["deleted"] += n_old - n_new
+
+    if structural:
+        sheets.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id, body={'requests': structural}
+        ).execute()
+
+    if writes:
+        # 連続する行はまとめて1つの範囲にする
+        data = []
+        for row_no in sorted(writes):
+            if data and data[-1]['_end'] == row_no - 1:
+                data[-1]['values'].append(writes[row_no])
+                data[-1]['_end'] = row_no
+            else:
+                data.append({'range': f"'{title}'!A{row_no}", 'values': [writes[row_no]], '_end': row_no})
+        for d in data:
+            del d['_end']
+        sheets.spreadsheets().values().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={'valueInputOption': 'USER_ENTERED', 'data': data},
+        ).execute()
+
+    stats["rows_written"] = len(writes)
+    return stats
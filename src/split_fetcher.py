@@ -0,0 +1,33 @@
+"""
+get_activity_splits の1回の実行内メモ化。
+
+ステップ2（ランニングのラップ）とステップ6（全活動の詳細取得）で共有し、
+同じ活動のスプリットを2回取得しないようにする。
+"""
+import threading
+
+
+class SplitFetcher:
+    """1回の実行内で get_activity_splits の結果を activityId ごとにメモ化する。
+
+    失敗した呼び出しはメモ化しない（例外はそのまま呼び出し側へ）。
+    """
+
+    def __init__(self, garmin_client):
+        self._client = garmin_client
+        self._results: dict = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.saved_calls = 0
+
+    def get_activity_splits(self, activity_id):
+        key = str(activity_id)
+        with self._lock:
+            if key in self._results:
+                self.saved_calls += 1
+                return self._results[key]
+        result = self._client.get_activity_splits(activity_id)
+        with self._lock:
+            self.calls += 1
+            self._results[key] = result
+        return result
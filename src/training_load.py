@@ -0,0 +1,169 @@
+"""
+日次トレーニング負荷モデル（ATL / CTL / TSB / ACWR）の増分計算。
+
+活動ごとの負荷を日付に足し込み、日ごとに指数加重移動平均を1ステップ進める:
+  - ATL（急性負荷）: 時定数 ATL_DAYS 日
+  - CTL（慢性負荷）: 時定数 CTL_DAYS 日
+  - TSB = CTL - ATL（プラスほど疲労が抜けている）
+  - ACWR = ATL / CTL（急性:慢性負荷比。0.8〜1.3 が目安）
+
+状態は ~/.garmin_cache/training_load.json に保存する。次回の実行では
+  - 反映済みの活動（activityId と負荷が同じもの）は O(1) でスキップ
+  - 新しい活動は当日の負荷に足すだけ
+  - 日付は前回の最終日から今日まで進めるだけ（履歴全体は再計算しない）
+とする。反映済みの日付より前の活動が後から見つかった場合と、反映済みの活動が
+アクティビティストアから消えた場合（Garmin 側で削除）だけ、その日から再計算する。
+
+負荷の尺度は Garmin の activityTrainingLoad（EPOC ベースのトレーニング負荷）にそろえる。
+  - activityTrainingLoad があればそのまま使う
+  - ない活動（古い活動・他サービスから取り込んだ活動）は 時間 × 有酸素TE × _EPOC_PER_TE_HOUR で
+    同じ尺度に換算する（有酸素TE 3.0 で1時間 ≒ 105。Garmin の負荷の典型値に合わせた近似）
+TSS（trainingStressScore）は尺度が違う（1時間の閾値走 = 100）ので使わない。
+"""
+import math
+from datetime import date, timedelta
+from typing import Container, Iterable, List, Optional
+
+from activity_record import ActivityRecord
+from local_cache import cache_path, load_json, save_json
+
+
+TRAINING_LOAD_FILE = cache_path("training_load.json")
+_STORE_VERSION = 2  # 2: 負荷の尺度を activityTrainingLoad に統一（旧形式は作り直す）
+
+ATL_DAYS = 7
+CTL_DAYS = 42
+_ATL_K = 1 - math.exp(-1 / ATL_DAYS)
+_CTL_K = 1 - math.exp(-1 / CTL_DAYS)
+
+# activityTrainingLoad がない活動の換算係数（有酸素TE 1.0・1時間あたりの EPOC 負荷）
+_EPOC_PER_TE_HOUR = 35
+
+
+def activity_load(rec: ActivityRecord) -> float:
+    """活動1件の負荷（activityTrainingLoad の尺度）。ない場合は 時間 × 有酸素TE から換算する。"""
+    value = rec.raw.get('activityTrainingLoad')
+    if value:
+        return round(float(value), 1)
+    return round(rec.duration_s / 3600 * rec.aerobic_te * _EPOC_PER_TE_HOUR, 1)
+
+
+class TrainingLoad:
+    """日次の負荷と ATL / CTL の永続ストア。"""
+
+    def __init__(self, path: str = TRAINING_LOAD_FILE):
+        self.path = path
+        data = load_json(path, {})
+        if data.get("version") != _STORE_VERSION:
+            data = {}
+        self._applied: dict = data.get("applied", {})    # activityId → [日付, 負荷]
+        self._loads: dict = data.get("loads", {})        # 日付 → その日の負荷合計
+        self._daily: dict = data.get("daily", {})        # 日付 → {"atl", "ctl"}
+        self._last: str = data.get("last", "")           # ATL / CTL を計算済みの最終日
+        self._dirty_from: Optional[str] = None           # 再計算が必要な最初の日
+
+    def __len__(self) -> int:
+        return len(self._applied)
+
+    def _mark_dirty(self, date_str: str) -> None:
+        if self._last and date_str <= self._last:
+            if self._dirty_from is None or date_str < self._dirty_from:
+                self._dirty_from = date_str
+
+    def add_activities(self, records: Iterable[ActivityRecord]) -> int:
+        """活動の負荷を反映し、新規・変更された件数を返す。"""
+        changed = 0
+        for rec in records:
+            if rec.activity_id is None or rec.start_local is None:
+                continue
+            key = str(rec.activity_id)
+            entry = [rec.start_local.date().isoformat(), activity_load(rec)]
+            prev = self._applied.get(key)
+            if prev == entry:
+                continue
+            if prev is not None:
+                self._loads[prev[0]] = round(self._loads.get(prev[0], 0) - prev[1], 1)
+                self._mark_dirty(prev[0])
+            self._loads[entry[0]] = round(self._loads.get(entry[0], 0) + entry[1], 1)
+            self._mark_dirty(entry[0])
+            self._applied[key] = entry
+            changed += 1
+        return changed
+
+    def retain(self, activity_ids: Container[str]) -> int:
+        """activity_ids（ActivityStore など）にない反映済みの活動の負荷を取り消し、件数を返す。
+
+        Garmin 側で削除された活動（ActivityStore.prune_missing で消えたもの）が
+        ATL / CTL に残らないよう、その日を再計算の対象にする。
+        """
+        removed = [key for key in self._applied if key not in activity_ids]
+        for key in removed:
+            date_str, load = self._applied.pop(key)
+            self._loads[date_str] = round(self._loads.get(date_str, 0) - load, 1)
+            self._mark_dirty(date_str)
+        return len(removed)
+
+    def advance_to(self, today: date) -> int:
+        """今日まで ATL / CTL を進め、計算した日数を返す。"""
+        if self._dirty_from is not None:
+            start = date.fromisoformat(self._dirty_from)
+        elif self._last:
+            start = date.fromisoformat(self._last) + timedelta(days=1)
+        elif self._loads:
+            start = date.fromisoformat(min(self._loads))
+        else:
+            return 0
+
+        prev = self._daily.get((start - timedelta(days=1)).isoformat(), {})
+        atl = prev.get("atl", 0.0)
+        ctl = prev.get("ctl", 0.0)
+        steps = 0
+        day = start
+        while day <= today:
+            date_str = day.isoformat()
+            load = self._loads.get(date_str, 0.0)
+            atl += (load - atl) * _ATL_K
+            ctl += (load - ctl) * _CTL_K
+            # 次回の計算の起点になるので丸めずに保存する（丸めは days() で行う）
+            self._daily[date_str] = {"atl": atl, "ctl": ctl}
+            day += timedelta(days=1)
+            steps += 1
+        if today.isoformat() > self._last:
+            self._last = today.isoformat()
+        self._dirty_from = None
+        return steps
+
+    def days(self, since: Optional[date] = None) -> List[dict]:
+        """日ごとの {date, load, atl, ctl, tsb, acwr} を新しい順で返す。"""
+        since_str = since.isoformat() if since else ""
+        out = []
+        for date_str in sorted(self._daily, reverse=True):
+            if date_str < since_str:
+                break
+            state = self._daily[date_str]
+            atl, ctl = state["atl"], state["ctl"]
+            out.append({
+                "date": date_str,
+                "load": self._loads.get(date_str, 0.0),
+                "atl": round(atl, 1),
+                "ctl": round(ctl, 1),
+                "tsb": round(ctl - atl, 1),
+                "acwr": round(atl / ctl, 2) if ctl > 0 else None,
+            })
+        return out
+
+    def latest(self) -> Optional[dict]:
+        days = self.days(since=date.fromisoformat(self._last)) if self._last else []
+        return days[0] if days else None
+
+    def save(self) -> None:
+        try:
+            save_json(self.path, {
+                "version": _STORE_VERSION,
+                "last": self._last,
+                "applied": self._applied,
+                "loads": self._loads,
+                "daily": self._daily,
+            })
+        except Exception as e:
+            print(f"  ⚠ トレーニング負荷の保存失敗: {e}")
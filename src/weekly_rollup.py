@@ -0,0 +1,166 @@
+"""
+ランニングの週次・日次ロールアップ（1パス集計）。
+
+Weekly Summary シートと Google Doc の「過去のランニング（週次サマリー）」は、
+ここで作った WeekRollup を読んで描画する。週ごとの合計・平均の計算はこのモジュールだけにあり、
+2つの出力で数字がずれることはない。
+
+活動レコードと日次ヘルスデータをそれぞれ1回ずつ走査して、日付・週の dict に足し込む
+（週ごとに日付を1日ずつ辿る走査はしない）。計算量は履歴の長さに対して O(n)。
+"""
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from activity_format import format_pace
+from activity_record import ActivityRecord
+
+
+# 週平均を出す日次ヘルス指標
+HEALTH_KEYS = (
+    'sleep_score', 'hrv_last_night', 'hrv_weekly_avg', 'rhr',
+    'body_battery_high', 'stress_avg', 'training_readiness',
+)
+
+
+class _Mean:
+    __slots__ = ('total', 'n')
+
+    def __init__(self):
+        self.total = 0.0
+        self.n = 0
+
+    def add(self, value) -> None:
+        self.total += value
+        self.n += 1
+
+    def value(self, digits: Optional[int] = 1):
+        if not self.n:
+            return None
+        return round(self.total / self.n, digits) if digits is not None else round(self.total / self.n)
+
+
+class DayRollup:
+    """1日分のランニング合計と、その日のヘルスデータ。"""
+
+    __slots__ = ('day', 'count', 'distance_km', 'duration_s', 'health')
+
+    def __init__(self, day: date):
+        self.day = day
+        self.count = 0
+        self.distance_km = 0.0
+        self.duration_s = 0.0
+        self.health: Optional[dict] = None
+
+
+class WeekRollup:
+    """月曜始まり1週間分のランニング合計・平均とヘルス指標の平均。"""
+
+    __slots__ = ('week_start', 'count', 'distance_km', 'duration_s', 'calories',
+                 '_hr', '_aerobic', '_anaerobic', '_health', '_hrv_night_seen')
+
+    def __init__(self, week_start: date):
+        self.week_start = week_start
+        self.count = 0
+        self.distance_km = 0.0
+        self.duration_s = 0.0
+        self.calories = 0.0
+        self._hr = _Mean()
+        self._aerobic = _Mean()
+        self._anaerobic = _Mean()
+        self._health = {key: _Mean() for key in HEALTH_KEYS}
+        self._hrv_night_seen = False
+
+    @property
+    def week_end(self) -> date:
+        return self.week_start + timedelta(days=6)
+
+    def add_activity(self, rec: ActivityRecord) -> None:
+        self.count += 1
+        self.distance_km += rec.distance_km
+        self.duration_s += rec.duration_s
+        self.calories += rec.calories
+        if rec.avg_hr:
+            self._hr.add(rec.avg_hr)
+        if rec.aerobic_te:
+            self._aerobic.add(rec.aerobic_te)
+        if rec.anaerobic_te:
+            self._anaerobic.add(rec.anaerobic_te)
+
+    def add_health(self, day: dict) -> None:
+        for key, mean in self._health.items():
+            value = day.get(key)
+            if value is not None:
+                mean.add(value)
+        if day.get('hrv_last_night'):
+            self._hrv_night_seen = True
+
+    @property
+    def avg_pace(self) -> str:
+        if self.duration_s and self.distance_km:
+            return format_pace(self.distance_km * 1000 / self.duration_s)
+        return ''
+
+    @property
+    def avg_hr(self) -> Optional[int]:
+        return self._hr.value(None)
+
+    @property
+    def avg_aerobic_te(self) -> Optional[float]:
+        return self._aerobic.value()
+
+    @property
+    def avg_anaerobic_te(self) -> Optional[float]:
+        return self._anaerobic.value()
+
+    def health_avg(self, key: str) -> Optional[float]:
+        if key == 'hrv':
+            # 前夜の HRV があればそれを、なければ週平均 HRV を使う
+            key = 'hrv_last_night' if self._hrv_night_seen else 'hrv_weekly_avg'
+        return self._health[key].value()
+
+
+class Rollups:
+    """build_rollups の結果。weeks / days は週の開始日・日付をキーにした dict。"""
+
+    def __init__(self):
+        self.weeks: Dict[date, WeekRollup] = {}
+        self.days: Dict[date, DayRollup] = {}
+
+    def _week(self, week_start: date) -> WeekRollup:
+        week = self.weeks.get(week_start)
+        if week is None:
+            week = self.weeks[week_start] = WeekRollup(week_start)
+        return week
+
+    def _day(self, day: date) -> DayRollup:
+        rollup = self.days.get(day)
+        if rollup is None:
+            rollup = self.days[day] = DayRollup(day)
+        return rollup
+
+    def running_weeks(self) -> List[WeekRollup]:
+        """ランニングのあった週を新しい順で返す。"""
+        return sorted((w for w in self.weeks.values() if w.count),
+                      key=lambda w: w.week_start, reverse=True)
+
+
+def build_rollups(records: Iterable[ActivityRecord], health_data_list: Iterable[dict] = ()) -> Rollups:
+    """ランニングのレコードと日次ヘルスデータを1パスずつ走査して週次・日次ロールアップを作る。"""
+    rollups = Rollups()
+    for rec in records:
+        if rec.week_start is None:
+            continue
+        rollups._week(rec.week_start).add_activity(rec)
+        day = rollups._day(rec.start_local.date())
+        day.count += 1
+        day.distance_km += rec.distance_km
+        day.duration_s += rec.duration_s
+
+    for health in health_data_list or ():
+        try:
+            day = date.fromisoformat(health['date'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        rollups._day(day).health = health
+        rollups._week(day - timedelta(days=day.weekday())).add_health(health)
+    return rollups
@@ -1,21 +1,39 @@
 import os
-import json
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List
+from typing import List, Optional
 
 import pytz
 from dotenv import load_dotenv
 from garminconnect import Garmin as GarminClient
 
 # Google API Imports
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from activity_format import format_duration, format_pace, format_training_message
+from activity_record import ActivityRecord, build_activity_records
+from activity_store import ActivityStore, refresh_cutoff_gmt
+from doc_writer import SectionBuilder, write_doc_sections
+from enrichment_cache import EnrichmentCache, summary_fingerprint
+from garmin_endpoints import range_chunks
+from google_session import GoogleSession, is_stale_id_error, load_google_credentials
+from health_store import HealthStore
+from rate_limiter import RateLimitedClient, TokenBucket
+from retry_policy import RetryPolicy, auth_policy, is_retryable
+from sheet_writer import write_rows_diff
+from split_fetcher import SplitFetcher
+from training_load import TrainingLoad
+from weekly_rollup import build_rollups
+
 # タイムゾーンの設定
 local_tz = pytz.timezone('Asia/Tokyo')
 
+# Google Drive 上の出力ファイル名
+SPREADSHEET_NAME = "Garmin Running Log"
+DOCUMENT_NAME = "Garmin Running Log (Document)"
+
 # アイコン設定（日本語キー）
 ACTIVITY_ICONS = {
     "バー": "https://img.icons8.com/?size=100&id=66924&format=png&color=000000",
@@ -39,8 +57,20 @@ ACTIVITY_ICONS = {
     "ヨガ/ピラティス": "https://img.icons8.com/?size=100&id=9783&format=png&color=000000",
 }
 
-_RATE_LIMIT_MAX_RETRIES = 4
-_RATE_LIMIT_BASE_WAIT = 60  # 60s → 120s → 240s → 480s
+# 詳細取得の並列数（API レート自体は rate_limiter.TokenBucket が全体で制御する）
+ENRICH_MAX_WORKERS = int(os.getenv("GARMIN_ENRICH_WORKERS", "4"))
+
+# 活動一覧をどこまで遡るか
+TARGET_HISTORY_DAYS = 90
+
+# 活動一覧の取得方法: "index"（ページネーション）または "date"（日付区間の並行取得、activity_window）。
+# date モードでは GARMIN_HISTORY_DAYS 日分をストアに取り込む（1年分・全履歴の取り込み用。既定は TARGET_HISTORY_DAYS）
+ACTIVITY_FETCH_MODE = os.getenv("GARMIN_FETCH_MODE", "index").lower()
+HISTORY_DAYS = int(os.getenv("GARMIN_HISTORY_DAYS", str(TARGET_HISTORY_DAYS)))
+
+# 非同期パイプライン（Cookie 認証時、httpx があれば使える）と、その取得結果を書くストア
+ASYNC_FETCH = os.getenv("GARMIN_ASYNC", "0") == "1"
+ASYNC_PREFETCH_DB = "/tmp/garmin_async_prefetch.db"
 
 
 class _NonRetriableError(BaseException):
@@ -48,24 +78,26 @@ class _NonRetriableError(BaseException):
     pass
 
 
-def get_all_activities(garmin_client: GarminClient, max_limit: int = 2000) -> List[dict]:
-    # 日付指定が不安定なため、確実な「インデックス指定（ページネーション）」で過去データを総ざらいする
+def get_all_activities(garmin_client: GarminClient, max_limit: int = 2000,
+                       store: Optional[ActivityStore] = None) -> List[dict]:
+    # 既定の取得方法: 「インデックス指定（ページネーション）」で過去データを総ざらいする
+    # （日付区間の並行取得は GARMIN_FETCH_MODE=date → get_activities_by_date_window）
+    # store を渡すと、既知の活動だけのページに到達した時点で打ち切り、残りはストアから補う
+    # （直近 REFRESH_DAYS 日分は既知でも取り直し、編集・削除をストアに反映する）
     all_activities = []
     batch_size = 50 # 安全のため少し小さめに
     start_index = 0
-    rate_limit_retries = 0
 
     # どこまで遡るか（例: 90日前）
-    target_history_days = 90
-    cutoff_date = datetime.now(local_tz) - timedelta(days=target_history_days)
+    cutoff_date = datetime.now(local_tz) - timedelta(days=TARGET_HISTORY_DAYS)
+    refresh_gmt = refresh_cutoff_gmt()
 
-    print(f"Fetching activities via Pagination (Target: Last {target_history_days} days)...")
+    print(f"Fetching activities via Pagination (Target: Last {TARGET_HISTORY_DAYS} days)...")
 
     while True:
         try:
             print(f"  Fetching index {start_index} to {start_index + batch_size}...", end=" ", flush=True)
             activities = garmin_client.get_activities(start_index, batch_size)
-            rate_limit_retries = 0  # 成功したらリセット
 
             if not activities:
                 print("No more activities found.")
@@ -74,6 +106,12 @@ def get_all_activities(garmin_client: GarminClient, max_limit: int = 2000) -> Li
             all_activities.extend(activities)
             print(f"Fetched {len(activities)} items.")
 
+            # 既知の活動だけのページ（取り直し期間より古い） → これより古い活動はストアに揃っている
+            if (store is not None and len(store) and all(store.is_known(a) for a in activities)
+                    and (activities[-1].get('startTimeGMT') or '') < refresh_gmt):
+                print("    Page contains only known activities. stopping.")
+                break
+
             # 日付チェック：一番古いデータがカットオフより古ければ終了
             last_activity = activities[-1]
             last_date_str = last_activity.get('startTimeGMT')
@@ -90,109 +128,61 @@ def get_all_activities(garmin_client: GarminClient, max_limit: int = 2000) -> Li
                 break
 
             start_index += batch_size
-            # レートリミット回避: バッチ間に短い待機
-            time.sleep(0.5)
 
         except Exception as e:
-            if '429' in str(e) and rate_limit_retries < _RATE_LIMIT_MAX_RETRIES:
-                rate_limit_retries += 1
-                wait = _RATE_LIMIT_BASE_WAIT * (2 ** (rate_limit_retries - 1))
-                print(f"\n    Rate limited (429). Waiting {wait}s before retry {rate_limit_retries}/{_RATE_LIMIT_MAX_RETRIES}...")
-                time.sleep(wait)
-                # start_index はそのまま（同じバッチをリトライ）
-            else:
-                print(f"Error in pagination at index {start_index}: {e}")
-                # エラーが出ても、そこまで取れた分は返す
-                break
+            # 429 などの再試行は RateLimitedClient（RetryPolicy）で済んでいる
+            print(f"Error in pagination at index {start_index}: {e}")
+            # エラーが出ても、そこまで取れた分は返す
+            break
 
     print(f"Total fetched: {len(all_activities)}")
+
+    if store is not None:
+        added = store.upsert(all_activities)
+        # 先頭から途切れずに取得した範囲で、一覧から消えた活動（Garmin 側で削除）をストアからも消す
+        removed = 0
+        if all_activities:
+            removed = store.prune_missing(all_activities, min(a.get('startTimeGMT') or '' for a in all_activities))
+        store.save()
+        since_gmt = cutoff_date.astimezone(pytz.UTC).strftime('%Y-%m-%d %H:%M:%S')
+        all_activities = store.recent(since_gmt, max_limit)
+        print(f"  Activity store: +{added} new, -{removed} removed, {len(store)} stored, "
+              f"{len(all_activities)} within target window.")
+
     return all_activities
 
-def format_activity_type(activity_type: str, activity_name: str = "") -> tuple[str, str]:
-    formatted_type = activity_type.replace('_', ' ').title() if activity_type else "Unknown"
-    activity_subtype = formatted_type
-    activity_type = formatted_type
-
-    activity_mapping = {
-        "Barre": "Strength", "Indoor Cardio": "Cardio", "Indoor Cycling": "Cycling",
-        "Indoor Rowing": "Rowing", "Speed Walking": "Walking", "Strength Training": "Strength",
-        "Treadmill Running": "Running"
-    }
-
-    if formatted_type == "Rowing V2":
-        activity_type = "Rowing"
-    elif formatted_type in ["Yoga", "Pilates"]:
-        activity_type = "Yoga/Pilates"
-        activity_subtype = formatted_type
-
-    if formatted_type in activity_mapping:
-        activity_type = activity_mapping[formatted_type]
-        activity_subtype = formatted_type
-
-    japanese_map = {
-        "Running": "ランニング", "Cycling": "サイクリング", "Walking": "ウォーキング",
-        "Strength": "筋トレ", "Yoga/Pilates": "ヨガ/ピラティス", "Stretching": "ストレッチ",
-        "Meditation": "瞑想", "Swimming": "スイミング", "Rowing": "ローイング",
-        "Hiking": "ハイキング", "Cardio": "有酸素運動", "Treadmill Running": "トレッドミル",
-        "Indoor Cycling": "室内サイクリング", "Yoga": "ヨガ", "Pilates": "ピラティス", "Barre": "バー"
-    }
-
-    if activity_name and "meditation" in activity_name.lower(): return "瞑想", "瞑想"
-    if activity_name and "barre" in activity_name.lower(): return "筋トレ", "バー"
-    if activity_name and "stretch" in activity_name.lower(): return "ストレッチ", "ストレッチ"
-
-    return japanese_map.get(activity_type, activity_type), japanese_map.get(activity_subtype, activity_subtype)
-
-def format_training_message(message: str) -> str:
-    messages = {
-        'NO_': '効果なし', 'MINOR_': 'わずかな効果', 'RECOVERY_': 'リカバリー',
-        'MAINTAINING_': '維持', 'IMPROVING_': '向上', 'IMPACTING_': '影響あり',
-        'HIGHLY_': '高い影響', 'OVERREACHING_': 'オーバーリーチ'
-    }
-    for key, value in messages.items():
-        if message.startswith(key): return value
-    return message
-
-def format_training_effect(training_effect_label: str) -> str:
-    # 画像にあるオプションをすべて網羅
-    label_map = {
-        "Recovery": "リカバリー",
-        "Aerobic Base": "ベース",
-        "Base": "ベース",
-        "Tempo": "テンポ",
-        "Lactate Threshold": "乳酸閾値",
-        "Threshold": "閾値",
-        "Speed": "スピード",
-        "Anaerobic": "無酸素",
-        "Sprint": "スプリント",
-        "Vo2 Max": "VO2max",  # VO2maxはそのまま
-        "Maintaining": "維持",
-        "Improving": "向上",
-        "Impacting": "影響あり",
-        "Highly Impacting": "高い影響",
-        "Overreaching": "オーバーリーチ",
-        "No Benefit": "効果なし",
-        "Unknown": "不明"
-    }
-    # _ を半角スペースにしてタイトル形式にする（例: AEROBIC_BASE -> Aerobic Base）
-    formatted = training_effect_label.replace('_', ' ').title()
-    return label_map.get(formatted, formatted)
-
-def format_pace(average_speed: float) -> str:
-    if average_speed > 0:
-        pace_min_km = 1000 / (average_speed * 60)
-        minutes = int(pace_min_km)
-        seconds = int((pace_min_km - minutes) * 60)
-        return f"{minutes}:{seconds:02d} /km"
-    return ""
-
-
-
-def fetch_and_format_laps(garmin_client: GarminClient, activity_id: str) -> str:
+
+def get_activities_by_date_window(garmin_client: GarminClient, max_limit: int,
+                                  store: ActivityStore, history_days: int = HISTORY_DAYS) -> List[dict]:
+    """GARMIN_FETCH_MODE=date: 日付区間ごとに並行取得し、get_all_activities と同じ対象期間の活動を返す。
+
+    history_days 日分をストアへ取り込み（確定した区間は次回以降スキップ）、
+    インデックス指定の最新ページと照合してから、ストアの直近 TARGET_HISTORY_DAYS 日分を返す。
+    """
+    from activity_window import cross_check_index, fetch_date_window
+
+    today = datetime.now(local_tz).date()
+    window_days = max(history_days, TARGET_HISTORY_DAYS)
+    fetch_date_window(garmin_client, today - timedelta(days=window_days), today, store)
+
+    cutoff_date = datetime.now(local_tz) - timedelta(days=TARGET_HISTORY_DAYS)
+    since_gmt = cutoff_date.astimezone(pytz.UTC).strftime('%Y-%m-%d %H:%M:%S')
+    try:
+        cross_check_index(garmin_client, store, since_gmt)
+    except Exception as e:
+        print(f"  ⚠ インデックス一覧との照合に失敗: {e}")
+
+    all_activities = store.recent(since_gmt, max_limit)
+    print(f"  Activity store: {len(store)} stored, {len(all_activities)} within target window.")
+    return all_activities
+
+
+def fetch_and_format_laps(garmin_client: GarminClient, activity_id: str,
+                          splits_fetcher: Optional[SplitFetcher] = None) -> str:
     laps_text = ""
     splits = []
     try:
-        detailed_splits = garmin_client.get_activity_splits(activity_id)
+        detailed_splits = (splits_fetcher or garmin_client).get_activity_splits(activity_id)
         if isinstance(detailed_splits, list):
             splits = detailed_splits
         elif isinstance(detailed_splits, dict):
@@ -240,9 +230,19 @@ def fetch_and_format_laps(garmin_client: GarminClient, activity_id: str) -> str:
             
     return laps_text[:2000] # Notion limit check
 
-def garmin_enhance_activity(garmin_client: GarminClient, activity: dict) -> dict:
-    """Fetch additional details for an activity using its activity_id."""
+def garmin_enhance_activity(garmin_client: GarminClient, activity: dict,
+                            cache: Optional[EnrichmentCache] = None,
+                            splits_fetcher: Optional[SplitFetcher] = None) -> dict:
+    """Fetch additional details for an activity using its activity_id.
+
+    cache を渡すと、3種類すべて取得できた場合に結果を保存する（次回以降は再取得しない）。
+    """
     activity_id = activity.get('activityId')
+    fingerprint = summary_fingerprint(activity) if cache is not None else None
+    full_activity = None
+    laps_text = ""
+    weather = None
+    complete = True
 
     try:
         # 1. Fetch Full Details if possible
@@ -257,13 +257,15 @@ def garmin_enhance_activity(garmin_client: GarminClient, activity: dict) -> dict
                 if _saved_type is not None:
                     activity['activityType'] = _saved_type
         except Exception as e:
+            complete = False
             print(f"Warning: Could not fetch details for {activity_id}: {e}")
             
         # 2. Fetch Laps
         try:
-            laps_text = fetch_and_format_laps(garmin_client, activity_id)
+            laps_text = fetch_and_format_laps(garmin_client, activity_id, splits_fetcher)
             activity['laps_text'] = laps_text
         except Exception as e:
+            complete = False
             print(f"Warning: Could not fetch laps for {activity_id}: {e}")
         
         # 3. Fetch Weather
@@ -272,16 +274,37 @@ def garmin_enhance_activity(garmin_client: GarminClient, activity: dict) -> dict
             if weather:
                 activity['weather'] = weather
         except Exception as e:
+            complete = False
             print(f"Warning: Could not fetch weather for {activity_id}: {e}")
             
     except Exception as e:
+        complete = False
         print(f"    Warning: Enrichment failed for {activity_id}: {e}")
-        
+
+    # details が空（プリロードクライアント等）の場合はキャッシュせず、次回の取得に任せる
+    if cache is not None and complete and full_activity:
+        cache.put(activity_id, fingerprint, full_activity, laps_text, weather)
+
     return activity
 
-def format_duration(seconds: float) -> str:
-    m, s = divmod(int(seconds), 60)
-    return f"{m}:{s:02d}"
+
+def enrich_activities(garmin_client: GarminClient, activities: List[dict],
+                      cache: Optional[EnrichmentCache] = None,
+                      max_workers: int = ENRICH_MAX_WORKERS,
+                      splits_fetcher: Optional[SplitFetcher] = None) -> List[dict]:
+    """キャッシュ未ヒットの活動をスレッドプールで並列に詳細取得する（入力順を保持）。
+
+    待機は garmin_client 側のレートリミッターに任せ、固定 sleep は入れない。
+    """
+    pending = [act for act in activities if cache is None or not cache.apply(act)]
+    if pending:
+        print(f"  Enriching {len(pending)} activities with {max_workers} workers...")
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            list(pool.map(
+                lambda a: garmin_enhance_activity(garmin_client, a, cache=cache, splits_fetcher=splits_fetcher),
+                pending,
+            ))
+    return list(activities)
 
 
 def sec_to_time_str(seconds) -> str:
@@ -321,126 +344,246 @@ def _ensure_display_name(garmin_client) -> None:
         print(f"  ⚠ display_name 取得失敗（RHR等の一部APIはスキップ）: {e}")
 
 
-def fetch_daily_health_data(garmin_client: GarminClient, target_date) -> dict:
-    """指定日のデイリーヘルスデータを取得する。各APIの失敗は個別にスキップ。"""
-    date_str = target_date.isoformat() if hasattr(target_date, 'isoformat') else str(target_date)
-    data = {"date": date_str}
+# ── 日次ヘルス指標 ────────────────────────────────────────────────────────
+# 各指標は (garmin_client, date_str) -> dict の関数。API 呼び出しは1指標につき1回。
+# 例外はそのまま送出し、呼び出し側で「どの日のどの指標が失敗したか」を記録する。
 
-    # HRV
-    try:
-        hrv = garmin_client.get_hrv_data(date_str)
-        if hrv and 'hrvSummary' in hrv:
-            data['hrv_weekly_avg'] = hrv['hrvSummary'].get('weeklyAvg')
-            data['hrv_last_night'] = hrv['hrvSummary'].get('lastNightAvg')
-    except Exception as e:
-        print(f"    HRV取得失敗: {e}")
+def _health_hrv(garmin_client, date_str: str) -> dict:
+    hrv = garmin_client.get_hrv_data(date_str)
+    if hrv and 'hrvSummary' in hrv:
+        return {
+            'hrv_weekly_avg': hrv['hrvSummary'].get('weeklyAvg'),
+            'hrv_last_night': hrv['hrvSummary'].get('lastNightAvg'),
+        }
+    return {}
 
-    # Resting Heart Rate
-    try:
-        rhr = garmin_client.get_rhr_day(date_str)
-        if rhr and 'allMetrics' in rhr and 'metricsMap' in rhr.get('allMetrics', {}):
-            metrics = rhr['allMetrics']['metricsMap']
-            if 'WELLNESS_RESTING_HEART_RATE' in metrics and metrics['WELLNESS_RESTING_HEART_RATE']:
-                data['rhr'] = metrics['WELLNESS_RESTING_HEART_RATE'][0].get('value')
-    except Exception as e:
-        print(f"    RHR取得失敗: {e}")
 
-    # Sleep (詳細)
-    try:
-        sleep = garmin_client.get_sleep_data(date_str)
-        if sleep and 'dailySleepDTO' in sleep:
-            dto = sleep['dailySleepDTO']
-            data['sleep_score'] = (dto.get('sleepScores') or {}).get('overall', {}).get('value')
-            data['sleep_total_min'] = round(dto['sleepTimeSeconds'] / 60) if dto.get('sleepTimeSeconds') else None
-            data['sleep_deep_min'] = round(dto['deepSleepSeconds'] / 60) if dto.get('deepSleepSeconds') else None
-            data['sleep_rem_min'] = round(dto['remSleepSeconds'] / 60) if dto.get('remSleepSeconds') else None
-            data['sleep_light_min'] = round(dto['lightSleepSeconds'] / 60) if dto.get('lightSleepSeconds') else None
-            data['sleep_awake_min'] = round(dto['awakeSleepSeconds'] / 60) if dto.get('awakeSleepSeconds') else None
-    except Exception as e:
-        print(f"    睡眠データ取得失敗: {e}")
+def _health_rhr(garmin_client, date_str: str) -> dict:
+    rhr = garmin_client.get_rhr_day(date_str)
+    if rhr and 'allMetrics' in rhr and 'metricsMap' in rhr.get('allMetrics', {}):
+        metrics = rhr['allMetrics']['metricsMap']
+        if 'WELLNESS_RESTING_HEART_RATE' in metrics and metrics['WELLNESS_RESTING_HEART_RATE']:
+            return {'rhr': metrics['WELLNESS_RESTING_HEART_RATE'][0].get('value')}
+    return {}
 
-    # Steps
-    try:
-        steps_list = garmin_client.get_daily_steps(date_str, date_str)
-        if steps_list:
-            data['steps'] = steps_list[0].get('totalSteps')
-    except Exception as e:
-        print(f"    歩数取得失敗: {e}")
 
-    # Body Battery — bodyBatteryValuesArray: [[timestamp_ms, level], ...]
-    try:
-        battery_list = garmin_client.get_body_battery(date_str)
-        if battery_list and isinstance(battery_list, list):
-            day_data = battery_list[0]
-            values = [v[1] for v in day_data.get('bodyBatteryValuesArray', []) if len(v) > 1 and v[1] is not None]
-            if values:
-                data['body_battery_high'] = max(values)
-                data['body_battery_low'] = min(values)
-    except Exception as e:
-        print(f"    ボディバッテリー取得失敗: {e}")
+def _health_sleep(garmin_client, date_str: str) -> dict:
+    sleep = garmin_client.get_sleep_data(date_str)
+    if sleep and 'dailySleepDTO' in sleep:
+        dto = sleep['dailySleepDTO']
+        return {
+            'sleep_score': (dto.get('sleepScores') or {}).get('overall', {}).get('value'),
+            'sleep_total_min': round(dto['sleepTimeSeconds'] / 60) if dto.get('sleepTimeSeconds') else None,
+            'sleep_deep_min': round(dto['deepSleepSeconds'] / 60) if dto.get('deepSleepSeconds') else None,
+            'sleep_rem_min': round(dto['remSleepSeconds'] / 60) if dto.get('remSleepSeconds') else None,
+            'sleep_light_min': round(dto['lightSleepSeconds'] / 60) if dto.get('lightSleepSeconds') else None,
+            'sleep_awake_min': round(dto['awakeSleepSeconds'] / 60) if dto.get('awakeSleepSeconds') else None,
+        }
+    return {}
 
-    # Stress
-    try:
-        stress = garmin_client.get_stress_data(date_str)
-        if stress:
-            data['stress_avg'] = stress.get('avgStressLevel')
-    except Exception as e:
-        print(f"    ストレス取得失敗: {e}")
 
-    # Training Readiness — list形式、levelフィールドを使用
-    try:
-        readiness = garmin_client.get_training_readiness(date_str)
-        if isinstance(readiness, list):
-            readiness = readiness[0] if readiness else {}
-        if readiness and isinstance(readiness, dict):
-            data['training_readiness'] = readiness.get('score')
-            level = readiness.get('level') or readiness.get('scoreQualifier') or readiness.get('feedbackLongKey', '')
-            data['training_readiness_desc'] = READINESS_QUALIFIER_JP.get(level, level)
-    except Exception as e:
-        print(f"    トレーニング準備度取得失敗: {e}")
+def _parse_steps(entry: dict) -> dict:
+    return {'steps': entry.get('totalSteps')}
 
-    # VO2max — list形式: [{'generic': {'vo2MaxPreciseValue': X, 'vo2MaxValue': Y}}]
-    try:
-        metrics = garmin_client.get_max_metrics(date_str)
-        if metrics and isinstance(metrics, list) and metrics[0].get('generic'):
-            generic = metrics[0]['generic']
-            vo2 = generic.get('vo2MaxPreciseValue') or generic.get('vo2MaxValue')
-            if vo2 is not None:
-                data['vo2max'] = round(float(vo2), 1)
-    except Exception as e:
-        print(f"    VO2max取得失敗: {e}")
 
-    # Training Status — mostRecentTrainingStatus.latestTrainingStatusData.<deviceId>.trainingStatusFeedbackPhrase
-    try:
-        status = garmin_client.get_training_status(date_str)
-        if status and isinstance(status, dict):
-            ts_data = (status.get('mostRecentTrainingStatus') or {}).get('latestTrainingStatusData') or {}
-            if ts_data:
-                first_device = next(iter(ts_data.values()), {})
-                phrase = first_device.get('trainingStatusFeedbackPhrase', '')
-                data['training_status'] = format_training_message(phrase) if phrase else ''
-    except Exception as e:
-        print(f"    トレーニングステータス取得失敗: {e}")
+def _parse_body_battery(day_data: dict) -> dict:
+    # bodyBatteryValuesArray: [[timestamp_ms, level], ...]
+    values = [v[1] for v in day_data.get('bodyBatteryValuesArray') or [] if len(v) > 1 and v[1] is not None]
+    if values:
+        return {'body_battery_high': max(values), 'body_battery_low': min(values)}
+    return {}
 
-    # SpO2
-    try:
-        spo2 = garmin_client.get_spo2_data(date_str)
-        if spo2:
-            data['spo2_avg'] = spo2.get('averageSpO2') or spo2.get('avgSpO2')
-    except Exception as e:
-        print(f"    SpO2取得失敗: {e}")
 
-    # Respiration
-    try:
-        resp = garmin_client.get_respiration_data(date_str)
-        if resp:
-            data['respiration_avg'] = resp.get('avgWakingRespirationValue') or resp.get('lowestRespirationValue')
-    except Exception as e:
-        print(f"    呼吸数取得失敗: {e}")
+def _health_steps(garmin_client, date_str: str) -> dict:
+    steps_list = garmin_client.get_daily_steps(date_str, date_str)
+    if steps_list:
+        return _parse_steps(steps_list[0])
+    return {}
+
+
+def _health_body_battery(garmin_client, date_str: str) -> dict:
+    battery_list = garmin_client.get_body_battery(date_str)
+    if battery_list and isinstance(battery_list, list):
+        return _parse_body_battery(battery_list[0])
+    return {}
+
+
+def _split_range_result(entries, date_strs: List[str], date_key: str, parse) -> dict:
+    """期間 API のリストを {date_str: fields} に分解する。日付キーが無ければ並び順で対応付ける。"""
+    out = {}
+    for i, entry in enumerate(entries if isinstance(entries, list) else []):
+        if not isinstance(entry, dict):
+            continue
+        date_str = entry.get(date_key) or (date_strs[i] if i < len(date_strs) else None)
+        if date_str in date_strs:
+            out[date_str] = parse(entry)
+    return out
+
+
+def _health_steps_range(garmin_client, date_strs: List[str]) -> dict:
+    entries = garmin_client.get_daily_steps(date_strs[0], date_strs[-1])
+    return _split_range_result(entries, date_strs, 'calendarDate', _parse_steps)
+
+
+def _health_body_battery_range(garmin_client, date_strs: List[str]) -> dict:
+    entries = garmin_client.get_body_battery(date_strs[0], date_strs[-1])
+    return _split_range_result(entries, date_strs, 'date', _parse_body_battery)
+
+
+def _health_stress(garmin_client, date_str: str) -> dict:
+    stress = garmin_client.get_stress_data(date_str)
+    if stress:
+        return {'stress_avg': stress.get('avgStressLevel')}
+    return {}
+
+
+def _health_readiness(garmin_client, date_str: str) -> dict:
+    # list形式、levelフィールドを使用
+    readiness = garmin_client.get_training_readiness(date_str)
+    if isinstance(readiness, list):
+        readiness = readiness[0] if readiness else {}
+    if readiness and isinstance(readiness, dict):
+        level = readiness.get('level') or readiness.get('scoreQualifier') or readiness.get('feedbackLongKey', '')
+        return {
+            'training_readiness': readiness.get('score'),
+            'training_readiness_desc': READINESS_QUALIFIER_JP.get(level, level),
+        }
+    return {}
+
+
+def _health_vo2max(garmin_client, date_str: str) -> dict:
+    # list形式: [{'generic': {'vo2MaxPreciseValue': X, 'vo2MaxValue': Y}}]
+    metrics = garmin_client.get_max_metrics(date_str)
+    if metrics and isinstance(metrics, list) and metrics[0].get('generic'):
+        generic = metrics[0]['generic']
+        vo2 = generic.get('vo2MaxPreciseValue') or generic.get('vo2MaxValue')
+        if vo2 is not None:
+            return {'vo2max': round(float(vo2), 1)}
+    return {}
+
+
+def _health_training_status(garmin_client, date_str: str) -> dict:
+    # mostRecentTrainingStatus.latestTrainingStatusData.<deviceId>.trainingStatusFeedbackPhrase
+    status = garmin_client.get_training_status(date_str)
+    if status and isinstance(status, dict):
+        ts_data = (status.get('mostRecentTrainingStatus') or {}).get('latestTrainingStatusData') or {}
+        if ts_data:
+            first_device = next(iter(ts_data.values()), {})
+            phrase = first_device.get('trainingStatusFeedbackPhrase', '')
+            return {'training_status': format_training_message(phrase) if phrase else ''}
+    return {}
+
+
+def _health_spo2(garmin_client, date_str: str) -> dict:
+    spo2 = garmin_client.get_spo2_data(date_str)
+    if spo2:
+        return {'spo2_avg': spo2.get('averageSpO2') or spo2.get('avgSpO2')}
+    return {}
+
+
+def _health_respiration(garmin_client, date_str: str) -> dict:
+    resp = garmin_client.get_respiration_data(date_str)
+    if resp:
+        return {'respiration_avg': resp.get('avgWakingRespirationValue') or resp.get('lowestRespirationValue')}
+    return {}
+
+
+# (指標キー, ログ用ラベル, 取得関数) — この順で dict にマージする
+HEALTH_METRICS = [
+    ('hrv', 'HRV', _health_hrv),
+    ('rhr', 'RHR', _health_rhr),
+    ('sleep', '睡眠データ', _health_sleep),
+    ('steps', '歩数', _health_steps),
+    ('body_battery', 'ボディバッテリー', _health_body_battery),
+    ('stress', 'ストレス', _health_stress),
+    ('readiness', 'トレーニング準備度', _health_readiness),
+    ('vo2max', 'VO2max', _health_vo2max),
+    ('training_status', 'トレーニングステータス', _health_training_status),
+    ('spo2', 'SpO2', _health_spo2),
+    ('respiration', '呼吸数', _health_respiration),
+]
+
+# 期間指定に対応した指標（1回の呼び出しで複数日を取得できる）: 指標キー → 取得関数
+HEALTH_RANGE_METRICS = {
+    'steps': _health_steps_range,
+    'body_battery': _health_body_battery_range,
+}
+
+HEALTH_MAX_WORKERS = int(os.getenv("GARMIN_HEALTH_WORKERS", "6"))
+HEALTH_RANGE_FETCH = os.getenv("GARMIN_HEALTH_RANGE_FETCH", "1") != "0"
+
+
+def _health_date_str(target_date) -> str:
+    return target_date.isoformat() if hasattr(target_date, 'isoformat') else str(target_date)
 
+
+def fetch_daily_health_data(garmin_client: GarminClient, target_date) -> dict:
+    """指定日のデイリーヘルスデータを取得する。各APIの失敗は個別にスキップ。"""
+    date_str = _health_date_str(target_date)
+    data = {"date": date_str}
+    for _key, label, fetch in HEALTH_METRICS:
+        try:
+            data.update(fetch(garmin_client, date_str))
+        except Exception as e:
+            print(f"    {label}取得失敗: {e}")
     return data
 
 
+def fetch_health_window(garmin_client: GarminClient, dates, max_workers: int = HEALTH_MAX_WORKERS,
+                        use_ranges: bool = HEALTH_RANGE_FETCH):
+    """複数日 × 全指標を並列に取得する。
+
+    use_ranges=True のとき、期間 API がある指標（歩数・ボディバッテリー）は
+    連続した日付を最大 28 日ずつまとめて 1 回で取得し、日ごとに分解する。
+    レートは garmin_client 側の共有トークンバケットで制御される。
+    戻り値は (日付ごとの dict のリスト（dates の順）, {date_str: {指標キー: エラー文字列}})。
+    """
+    date_strs = [_health_date_str(d) for d in dates]
+    range_keys = set(HEALTH_RANGE_METRICS) if use_ranges else set()
+    range_date_str_chunks = [
+        [d.isoformat() for d in chunk]
+        for chunk in range_chunks([datetime.strptime(d, '%Y-%m-%d').date() for d in date_strs])
+    ]
+
+    # タスク: (対象日リスト, 指標キー, 取得関数 -> {date_str: fields})
+    tasks = []
+    for key, _label, fetch in HEALTH_METRICS:
+        if key in range_keys:
+            for chunk in range_date_str_chunks:
+                tasks.append((chunk, key, lambda c, f=HEALTH_RANGE_METRICS[key]: f(garmin_client, c)))
+        else:
+            for date_str in date_strs:
+                tasks.append(([date_str], key, lambda c, f=fetch: {c[0]: f(garmin_client, c[0])}))
+
+    def _run(task):
+        chunk, key, run = task
+        try:
+            return chunk, key, run(chunk), None
+        except Exception as e:
+            return chunk, key, None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        results = list(pool.map(_run, tasks))
+
+    by_date = {date_str: {"date": date_str} for date_str in date_strs}
+    failures: dict = {}
+    labels = {key: label for key, label, _ in HEALTH_METRICS}
+    for chunk, key, fields_by_date, error in results:
+        if error is not None:
+            for date_str in chunk:
+                failures.setdefault(date_str, {})[key] = str(error)
+            print(f"    {chunk[0]}〜{chunk[-1]} {labels[key]}取得失敗: {error}" if len(chunk) > 1
+                  else f"    {chunk[0]} {labels[key]}取得失敗: {error}")
+            continue
+        for date_str, fields in fields_by_date.items():
+            if fields:
+                by_date[date_str].update(fields)
+    if range_keys:
+        print(f"  Health fetch: {len(tasks)} API calls for {len(date_strs)} days "
+              f"(per-day mode would use {len(date_strs) * len(HEALTH_METRICS)}).")
+    return [by_date[d] for d in date_strs], failures
+
+
 def fetch_race_predictions(garmin_client: GarminClient) -> dict:
     """現在のレース予測タイムを取得する（日付非依存）。"""
     try:
@@ -458,97 +601,46 @@ def fetch_race_predictions(garmin_client: GarminClient) -> dict:
 
 
 def get_google_credentials(service_account_json_str):
-    try:
-        info = json.loads(service_account_json_str)
-        creds = Credentials.from_service_account_info(
-            info, scopes=[
-                'https://www.googleapis.com/auth/drive',
-                'https://www.googleapis.com/auth/spreadsheets',
-                'https://www.googleapis.com/auth/documents'
-            ]
-        )
-        return creds
-    except Exception as e:
-        print(f"Error loading Google Service Account: {e}")
-        return None
+    return load_google_credentials(service_account_json_str)
+
+
+def _diff_summary(stats: dict) -> str:
+    return (f"+{stats['inserted']} / -{stats['deleted']} rows, "
+            f"{stats['updated']} updated, {stats['unchanged']} unchanged")
+
+
+def _report_google_error(session: GoogleSession, err) -> None:
+    """保存済み ID が無効になった可能性のあるエラーなら ID キャッシュを破棄する。"""
+    if is_stale_id_error(err):
+        print("  ℹ 保存済みの Google ファイル ID を破棄します（次回再検索）")
+        session.forget_ids()
+
 
 def sync_weekly_summary_to_sheet(
-    activities: List[dict],
+    activities: List[ActivityRecord],
     health_data_list: List[dict],
     folder_id: str,
     service_account_json: str,
+    session: Optional[GoogleSession] = None,
 ) -> None:
     """全アクティビティと健康データから週次サマリーを生成し 'Weekly Summary' タブに書き込む。"""
     print("\n--- Starting Weekly Summary Sheet Sync ---")
-    creds = get_google_credentials(service_account_json)
-    if not creds:
+    session = session or GoogleSession(service_account_json, folder_id)
+    if not session.credentials:
         return
 
     try:
-        drive_service = build('drive', 'v3', credentials=creds)
-        sheets_service = build('sheets', 'v4', credentials=creds)
-
-        file_name = "Garmin Running Log"
-        query = f"name = '{file_name}' and '{folder_id}' in parents and mimeType = 'application/vnd.google-apps.spreadsheet' and trashed = false"
-        results = drive_service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
-        files = results.get('files', [])
-        if not files:
+        spreadsheet_id = session.find_spreadsheet(SPREADSHEET_NAME)
+        if not spreadsheet_id:
             print("  Spreadsheet not found. Skipping weekly summary sync.")
             return
-        spreadsheet_id = files[0]['id']
-
-        meta = sheets_service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-        existing_titles = [s['properties']['title'] for s in meta.get('sheets', [])]
-        if 'Weekly Summary' not in existing_titles:
-            sheets_service.spreadsheets().batchUpdate(
-                spreadsheetId=spreadsheet_id,
-                body={'requests': [{'addSheet': {'properties': {'title': 'Weekly Summary'}}}]}
-            ).execute()
-            print("  Created 'Weekly Summary' tab.")
-
-        # ランニングのみ抽出して週ごとにグループ化
-        running_acts = [
-            a for a in activities
-            if format_activity_type(
-                (a.get('activityType') or {}).get('typeKey', ''), a.get('activityName', '')
-            )[0] == 'ランニング'
-        ]
 
-        week_groups: dict = {}
-        for act in running_acts:
-            try:
-                act_dt = datetime.strptime(
-                    act.get('startTimeGMT'), '%Y-%m-%d %H:%M:%S'
-                ).replace(tzinfo=pytz.UTC).astimezone(local_tz)
-                week_start = (act_dt - timedelta(days=act_dt.weekday())).date()
-                week_groups.setdefault(week_start, []).append(act)
-            except Exception:
-                continue
+        session.ensure_tab(spreadsheet_id, 'Weekly Summary')
 
-        # 健康データを日付でマップ化
-        health_map = {d['date']: d for d in (health_data_list or [])}
-
-        def week_health_avg(week_start, week_end):
-            vals = []
-            d = week_start
-            while d <= week_end:
-                hd = health_map.get(d.isoformat())
-                if hd:
-                    vals.append(hd)
-                d += timedelta(days=1)
-            if not vals:
-                return {}
-            def avg(key):
-                v = [h[key] for h in vals if h.get(key) is not None]
-                return round(sum(v) / len(v), 1) if v else ''
-            return {
-                'sleep_score': avg('sleep_score'),
-                'hrv': avg('hrv_last_night') if any(h.get('hrv_last_night') for h in vals) else avg('hrv_weekly_avg'),
-                'rhr': avg('rhr'),
-                'body_battery_high': avg('body_battery_high'),
-                'stress_avg': avg('stress_avg'),
-                'training_readiness': avg('training_readiness'),
-            }
+        # ランニングと健康データを1パスで週ごとに集計（Doc の週次サマリーと同じ集計）
+        rollups = build_rollups(
+            (r for r in build_activity_records(activities) if r.is_running), health_data_list
+        )
 
         header = [
             "週", "ランニング回数", "総距離(km)", "平均ペース", "平均HR(bpm)", "総カロリー",
@@ -557,77 +649,46 @@ def sync_weekly_summary_to_sheet(
         ]
         values = [header]
 
-        for week_start in sorted(week_groups.keys(), reverse=True):
-            week_end = week_start + timedelta(days=6)
-            acts = week_groups[week_start]
-            count = len(acts)
-            total_dist = round(sum(a.get('distance', 0) for a in acts) / 1000, 1)
-            total_dist_m = sum(a.get('distance', 0) for a in acts)
-            total_time_s = sum(a.get('duration', 0) for a in acts)
-            avg_pace = format_pace(total_dist_m / total_time_s) if total_time_s and total_dist_m else ''
-            hr_list = [a.get('averageHR') for a in acts if a.get('averageHR')]
-            avg_hr = round(sum(hr_list) / len(hr_list)) if hr_list else ''
-            total_cal = round(sum(a.get('calories', 0) for a in acts))
-            aero_list = [a.get('aerobicTrainingEffect') for a in acts if a.get('aerobicTrainingEffect')]
-            avg_aero = round(sum(aero_list) / len(aero_list), 1) if aero_list else ''
-            anaero_list = [a.get('anaerobicTrainingEffect') for a in acts if a.get('anaerobicTrainingEffect')]
-            avg_anaero = round(sum(anaero_list) / len(anaero_list), 1) if anaero_list else ''
-
-            wh = week_health_avg(week_start, week_end)
+        def _cell(value):
+            return '' if value is None else value
+
+        for week in rollups.running_weeks():
             row = [
-                f"{week_start.strftime('%Y-%m-%d')}〜{week_end.strftime('%m-%d')}",
-                count, total_dist, avg_pace, avg_hr, total_cal, avg_aero, avg_anaero,
-                wh.get('sleep_score', ''), wh.get('hrv', ''), wh.get('rhr', ''),
-                wh.get('body_battery_high', ''), wh.get('stress_avg', ''), wh.get('training_readiness', ''),
-            ]
+                f"{week.week_start.strftime('%Y-%m-%d')}〜{week.week_end.strftime('%m-%d')}",
+                week.count, round(week.distance_km, 1), week.avg_pace, _cell(week.avg_hr),
+                round(week.calories), _cell(week.avg_aerobic_te), _cell(week.avg_anaerobic_te),
+            ] + [_cell(week.health_avg(key)) for key in (
+                'sleep_score', 'hrv', 'rhr', 'body_battery_high', 'stress_avg', 'training_readiness',
+            )]
             values.append(row)
 
-        sheets_service.spreadsheets().values().clear(
-            spreadsheetId=spreadsheet_id, range="'Weekly Summary'!A1:Z200"
-        ).execute()
-        sheets_service.spreadsheets().values().update(
-            spreadsheetId=spreadsheet_id,
-            range="'Weekly Summary'!A1",
-            valueInputOption='USER_ENTERED',
-            body={'values': values}
-        ).execute()
-        print(f"  Weekly Summary tab updated ({len(values)-1} weeks).")
+        # 週ラベルをキーに、変更・追加された週だけを書き込む
+        stats = write_rows_diff(session, spreadsheet_id, 'Weekly Summary', values[0], values[1:])
+        print(f"  Weekly Summary tab updated ({len(values)-1} weeks, {_diff_summary(stats)}).")
 
     except HttpError as err:
         print(f"Google API Error (Weekly Summary): {err}")
+        _report_google_error(session, err)
     except Exception as e:
         print(f"Error syncing weekly summary: {e}")
 
 
-def sync_daily_health_to_sheet(health_data_list: List[dict], folder_id: str, service_account_json: str, race_predictions: dict = None):
+def sync_daily_health_to_sheet(health_data_list: List[dict], folder_id: str, service_account_json: str,
+                               race_predictions: dict = None, session: Optional[GoogleSession] = None):
     """日次健康データを Garmin Running Log スプレッドシートの 'Daily Health' タブに書き込む。"""
     print("\n--- Starting Daily Health Sheet Sync ---")
-    creds = get_google_credentials(service_account_json)
-    if not creds:
+    session = session or GoogleSession(service_account_json, folder_id)
+    if not session.credentials:
         return
 
     try:
-        drive_service = build('drive', 'v3', credentials=creds)
-        sheets_service = build('sheets', 'v4', credentials=creds)
-
-        file_name = "Garmin Running Log"
-        query = f"name = '{file_name}' and '{folder_id}' in parents and mimeType = 'application/vnd.google-apps.spreadsheet' and trashed = false"
-        results = drive_service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
-        files = results.get('files', [])
-        if not files:
+        spreadsheet_id = session.find_spreadsheet(SPREADSHEET_NAME)
+        if not spreadsheet_id:
             print("  Garmin Running Log spreadsheet not found. Skipping daily health sync.")
             return
-        spreadsheet_id = files[0]['id']
 
         # Daily Health タブを確認・作成
-        meta = sheets_service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-        existing_titles = [s['properties']['title'] for s in meta.get('sheets', [])]
-        if 'Daily Health' not in existing_titles:
-            sheets_service.spreadsheets().batchUpdate(
-                spreadsheetId=spreadsheet_id,
-                body={'requests': [{'addSheet': {'properties': {'title': 'Daily Health'}}}]}
-            ).execute()
-            print("  Created 'Daily Health' tab.")
+        session.ensure_tab(spreadsheet_id, 'Daily Health')
 
         header = [
             "日付", "睡眠スコア", "総睡眠(分)", "深い睡眠(分)", "REM睡眠(分)", "浅い睡眠(分)", "覚醒(分)",
@@ -669,42 +730,60 @@ def sync_daily_health_to_sheet(health_data_list: List[dict], folder_id: str, ser
             ]
             values.append(row)
 
-        sheets_service.spreadsheets().values().clear(
-            spreadsheetId=spreadsheet_id, range="'Daily Health'!A1:Z200"
-        ).execute()
-        sheets_service.spreadsheets().values().update(
-            spreadsheetId=spreadsheet_id,
-            range="'Daily Health'!A1",
-            valueInputOption='USER_ENTERED',
-            body={'values': values}
-        ).execute()
-        print(f"  Daily Health tab updated ({len(values)-1} rows).")
+        # 日付をキーに、変更・追加された日だけを書き込む
+        stats = write_rows_diff(session, spreadsheet_id, 'Daily Health', values[0], values[1:])
+        print(f"  Daily Health tab updated ({len(values)-1} rows, {_diff_summary(stats)}).")
 
     except HttpError as err:
         print(f"Google API Error (Daily Health Sheet): {err}")
+        _report_google_error(session, err)
     except Exception as e:
         print(f"Error syncing daily health to sheet: {e}")
 
 
-def sync_to_google_sheet(activities: List[dict], folder_id: str, service_account_json: str):
+def sync_training_load_to_sheet(training_load_days: List[dict], folder_id: str, service_account_json: str,
+                                session: Optional[GoogleSession] = None) -> None:
+    """日次のトレーニング負荷（ATL / CTL / TSB / ACWR）を 'Training Load' タブに書き込む。"""
+    print("\n--- Starting Training Load Sheet Sync ---")
+    session = session or GoogleSession(service_account_json, folder_id)
+    if not session.credentials:
+        return
+
+    try:
+        spreadsheet_id = session.find_spreadsheet(SPREADSHEET_NAME)
+        if not spreadsheet_id:
+            print("  Garmin Running Log spreadsheet not found. Skipping training load sync.")
+            return
+
+        session.ensure_tab(spreadsheet_id, 'Training Load')
+
+        header = ["日付", "負荷", "ATL(急性)", "CTL(慢性)", "TSB", "ACWR"]
+        values = [header]
+        for d in training_load_days:
+            acwr = d.get('acwr')
+            values.append([
+                d['date'], d['load'], d['atl'], d['ctl'], d['tsb'], '' if acwr is None else acwr,
+            ])
+
+        # 日付をキーに、変更・追加された日だけを書き込む
+        stats = write_rows_diff(session, spreadsheet_id, 'Training Load', values[0], values[1:])
+        print(f"  Training Load tab updated ({len(values)-1} rows, {_diff_summary(stats)}).")
+
+    except HttpError as err:
+        print(f"Google API Error (Training Load Sheet): {err}")
+        _report_google_error(session, err)
+    except Exception as e:
+        print(f"Error syncing training load to sheet: {e}")
+
+
+def sync_to_google_sheet(activities: List[ActivityRecord], folder_id: str, service_account_json: str,
+                         session: Optional[GoogleSession] = None):
     print("\n--- Starting Google Sheets Sync (Direct from Garmin) ---")
-    creds = get_google_credentials(service_account_json)
-    if not creds: return
+    session = session or GoogleSession(service_account_json, folder_id)
+    if not session.credentials: return
 
     try:
-        drive_service = build('drive', 'v3', credentials=creds)
-        sheets_service = build('sheets', 'v4', credentials=creds)
-        
-        file_name = "Garmin Running Log"
-        query = f"name = '{file_name}' and '{folder_id}' in parents and mimeType = 'application/vnd.google-apps.spreadsheet' and trashed = false"
-        results = drive_service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
-        files = results.get('files', [])
-        
-        if files: spreadsheet_id = files[0]['id']
-        else:
-            file_metadata = {'name': file_name, 'parents': [folder_id], 'mimeType': 'application/vnd.google-apps.spreadsheet'}
-            file = drive_service.files().create(body=file_metadata, fields='id').execute()
-            spreadsheet_id = file.get('id')
+        spreadsheet_id = session.find_spreadsheet(SPREADSHEET_NAME, create=True)
 
         # Header with Laps restored
         header = ["日付", "種目", "詳細種目", "アクティビティ名", "距離 (km)", "タイム (分)", 
@@ -713,94 +792,69 @@ def sync_to_google_sheet(activities: List[dict], folder_id: str, service_account
         
         values = [header]
         
-        for activity in activities:
-            # Parse Date
-            activity_date_raw = activity.get('startTimeGMT')
-            date_str = datetime.strptime(activity_date_raw, '%Y-%m-%d %H:%M:%S').replace(tzinfo=pytz.UTC).astimezone(local_tz).strftime('%Y-%m-%d %H:%M')
-            activity_name = activity.get('activityName', '無題')
-            activity_type, activity_subtype = format_activity_type((activity.get('activityType') or {}).get('typeKey', 'Unknown'), activity_name)
-            
-            distance_km = round(activity.get('distance', 0) / 1000, 2)
-            duration_min = round(activity.get('duration', 0) / 60, 2)
-            calories = round(activity.get('calories', 0))
-            avg_pace = format_pace(activity.get('averageSpeed', 0))
-            avg_hr = round(activity.get('averageHR')) if activity.get('averageHR') else ""
-            max_hr = round(activity.get('maxHR')) if activity.get('maxHR') else ""
+        for rec in build_activity_records(activities):
+            # 日時・種目・数値はレコードで解析済み
+            date_str = rec.start_local.strftime('%Y-%m-%d %H:%M') if rec.start_local else ''
             
-            cadence = round(activity.get('averageRunningCadenceInStepsPerMinute', 0)) if activity.get('averageRunningCadenceInStepsPerMinute') else ""
-            stride = round(activity.get('averageStrideLength', 0) / 100, 2) if activity.get('averageStrideLength') else "" # cm to m? normally displayed in m or cm. Garmin sends cm usually. Notion asks for what? Let's assume m for now or cm. usually cm.
-            
-            aerobic = round(activity.get('aerobicTrainingEffect', 0), 1)
-            anaerobic = round(activity.get('anaerobicTrainingEffect', 0), 1)
-            
-            avg_gap_speed = activity.get('avgGradeAdjustedSpeed')
-            gap_str = format_pace(avg_gap_speed) if avg_gap_speed else "-"
+            avg_hr = round(rec.avg_hr) if rec.avg_hr else ""
+            max_hr = round(rec.max_hr) if rec.max_hr else ""
+            cadence = round(rec.cadence_spm) if rec.cadence_spm else ""
+            stride = round(rec.stride_m, 2) if rec.stride_m else "" # Garmin は cm で返すので m に変換済み
             
             row = [
                 date_str,
-                activity_type,
-                activity_subtype,
-                activity_name,
-                distance_km,
-                duration_min,
-                calories,
-                avg_pace,
-                gap_str,
+                rec.type_jp,
+                rec.subtype_jp,
+                rec.name,
+                round(rec.distance_km, 2),
+                round(rec.duration_min, 2),
+                round(rec.calories),
+                rec.avg_pace,
+                rec.gap_pace or "-",
                 avg_hr,
                 max_hr,
                 cadence,
                 stride,
-                aerobic,
-                anaerobic,
-                activity.get('laps_text', "")
+                round(rec.aerobic_te, 1),
+                round(rec.anaerobic_te, 1),
+                rec.laps_text
             ]
             values.append(row)
             
         # Write Data
-        body = {'values': values}
-        sheet_metadata = sheets_service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-        first_sheet_title = sheet_metadata.get('sheets', '')[0].get('properties', {}).get('title', 'Sheet1')
+        first_sheet_title = session.first_tab_title(spreadsheet_id)
         
         if len(values) > 1:
             print(f"Preparing to write {len(values)-1} rows. Range: {values[1][0]} ~ {values[-1][0]}")
 
-        sheets_service.spreadsheets().values().clear(spreadsheetId=spreadsheet_id, range=f"'{first_sheet_title}'!A1:Z2000").execute()
-        sheets_service.spreadsheets().values().update(spreadsheetId=spreadsheet_id, range=f"'{first_sheet_title}'!A1", valueInputOption='USER_ENTERED', body=body).execute()
-        print(f"Successfully synced to Sheets.")
+        # 日時 + アクティビティ名をキーに、変更・追加された行だけを書き込む
+        stats = write_rows_diff(session, spreadsheet_id, first_sheet_title, values[0], values[1:],
+                                key_columns=(0, 3))
+        print(f"Successfully synced to Sheets. ({_diff_summary(stats)})")
         
     except HttpError as err:
         print(f"Google API Error: {err}")
+        _report_google_error(session, err)
 
 
-def sync_to_google_doc(activities: List[dict], folder_id: str, service_account_json: str) -> None:
+def sync_to_google_doc(activities: List[ActivityRecord], folder_id: str, service_account_json: str,
+                       session: Optional[GoogleSession] = None) -> None:
     """Garminから取得したランニングデータをGoogle ドキュメントに書き込む"""
     print("\n--- Starting Google Doc Sync (Running Only) ---")
     
-    creds = get_google_credentials(service_account_json)
-    if not creds:
+    session = session or GoogleSession(service_account_json, folder_id)
+    if not session.credentials:
         return
     
-    doc_name = "Garmin Running Log (Document)"
+    doc_name = DOCUMENT_NAME
     
     try:
-        drive_service = build('drive', 'v3', credentials=creds)
-        docs_service = build('docs', 'v1', credentials=creds)
+        docs_service = session.docs
         
-        # 既存ドキュメントを検索
-        list_query = (
-            f"'{folder_id}' in parents and trashed = false "
-            f"and mimeType = 'application/vnd.google-apps.document' "
-            f"and name = '{doc_name}'"
-        )
-        results = drive_service.files().list(
-            q=list_query,
-            spaces='drive',
-            fields='files(id, name)'
-        ).execute()
-        files = results.get('files', [])
+        # 既存ドキュメントを検索（ID は GoogleSession がキャッシュ）
+        document_id = session.find_document(doc_name)
         
-        if files:
-            document_id = files[0]['id']
+        if document_id:
             print(f"Found existing document. ID: {document_id}")
         else:
             print(f"\nError: Google Document '{doc_name}' not found in the folder.")
@@ -811,9 +865,11 @@ def sync_to_google_doc(activities: List[dict], folder_id: str, service_account_j
             print("4. Re-run this script.")
             return
         
-        # ドキュメントのテキストを組み立てる
+        # ドキュメントのテキストをセクション単位で組み立てる
+        builder = SectionBuilder()
         now_str = datetime.now(local_tz).strftime('%Y-%m-%d %H:%M JST')
-        lines = [f"# ランニングログ (最終更新: {now_str})\n\n"]
+        lines = builder.section("header")
+        lines.append(f"# ランニングログ (最終更新: {now_str})\n\n")
         lines.append(
             "このドキュメントはGarminのランニングデータを自動的に更新します。\n"
             "AIコーチング用途として最新データを参照してください。\n\n"
@@ -821,47 +877,28 @@ def sync_to_google_doc(activities: List[dict], folder_id: str, service_account_j
         lines.append("---\n\n")
         
         # ランニングのみフィルタリング
-        running_acts = [
-            a for a in activities
-            if format_activity_type(
-                a.get('activityType', {}).get('typeKey', ''), a.get('activityName', '')
-            )[0] == 'ランニング'
-        ]
+        running_acts = [r for r in build_activity_records(activities) if r.is_running]
         
         print(f"  Writing {len(running_acts)} running activities to document...")
         
-        for activity in running_acts:
+        for rec in running_acts:
             try:
-                activity_date_raw = activity.get('startTimeGMT')
-                activity_date_jst = datetime.strptime(
-                    activity_date_raw, '%Y-%m-%d %H:%M:%S'
-                ).replace(tzinfo=pytz.UTC).astimezone(local_tz)
-                date_str = activity_date_jst.strftime('%Y-%m-%d (%a)')
-                
-                distance_km = round(activity.get('distance', 0) / 1000, 2)
-                duration_min = activity.get('duration', 0) / 60
-                m = int(duration_min)
-                s = int((duration_min - m) * 60)
-                time_str = f"{m}:{s:02d}"
-                
-                avg_pace = format_pace(activity.get('averageSpeed', 0))
-                avg_gap_speed = activity.get('avgGradeAdjustedSpeed')
-                gap_str = format_pace(avg_gap_speed) if avg_gap_speed else None
-                avg_hr = round(activity.get('averageHR')) if activity.get('averageHR') else None
-                max_hr_val = round(activity.get('maxHR')) if activity.get('maxHR') else None
-                aerobic_te = round(activity.get('aerobicTrainingEffect', 0), 1)
-                anaerobic_te = round(activity.get('anaerobicTrainingEffect', 0), 1)
-                te_label = format_training_effect(activity.get('trainingEffectLabel', 'Unknown'))
-                laps_text = activity.get('laps_text', '')
+                date_str = rec.start_local.strftime('%Y-%m-%d (%a)')
+                avg_hr = round(rec.avg_hr) if rec.avg_hr else None
+                max_hr_val = round(rec.max_hr) if rec.max_hr else None
+                aerobic_te = round(rec.aerobic_te, 1)
+                anaerobic_te = round(rec.anaerobic_te, 1)
+                laps_text = rec.laps_text
                 
+                lines = builder.section(f"run:{rec.activity_id}")
                 lines.append(f"## {date_str} ランニング\n")
-                lines.append(f"- 距離: {distance_km} km\n")
-                lines.append(f"- タイム: {time_str} ({avg_pace})\n")
-                if gap_str:
-                    lines.append(f"- GAP: {gap_str}\n")
+                lines.append(f"- 距離: {round(rec.distance_km, 2)} km\n")
+                lines.append(f"- タイム: {rec.time_str} ({rec.avg_pace})\n")
+                if rec.gap_pace:
+                    lines.append(f"- GAP: {rec.gap_pace}\n")
                 if avg_hr:
                     lines.append(f"- 平均心拍: {avg_hr} bpm / 最大: {max_hr_val} bpm\n")
-                lines.append(f"- トレーニング効果: {te_label} (有酸素TE: {aerobic_te} / 無酸素TE: {anaerobic_te})\n")
+                lines.append(f"- トレーニング効果: {rec.te_label} (有酸素TE: {aerobic_te} / 無酸素TE: {anaerobic_te})\n")
                 if laps_text and laps_text.strip():
                     lines.append("- ラップ:\n")
                     for lap_line in laps_text.strip().split('\n'):
@@ -872,52 +909,29 @@ def sync_to_google_doc(activities: List[dict], folder_id: str, service_account_j
                 print(f"  Warning: Skipping activity due to error: {e}")
                 continue
         
-        full_text = "".join(lines)
-        
-        # ドキュメントを全削除→再書き込み
-        doc = docs_service.documents().get(documentId=document_id).execute()
-        content = doc.get('body', {}).get('content', [])
-        end_index = 1
-        for element in content:
-            if 'endIndex' in element:
-                end_index = element['endIndex']
-        
-        update_requests = []
-        if end_index > 2:
-            update_requests.append({
-                'deleteContentRange': {
-                    'range': {'startIndex': 1, 'endIndex': end_index - 1}
-                }
-            })
-        update_requests.append({
-            'insertText': {
-                'location': {'index': 1},
-                'text': full_text
-            }
-        })
+        # テキストが変わったセクションだけを書き換える
+        result = write_doc_sections(docs_service, document_id, builder.sections())
         
-        docs_service.documents().batchUpdate(
-            documentId=document_id,
-            body={'requests': update_requests}
-        ).execute()
-        
-        print(f"Google Doc updated successfully! ({len(running_acts)} running records)")
+        print(f"Google Doc updated successfully! ({len(running_acts)} running records, "
+              f"{result['mode']}: {result['requests']} requests, {result['chars']} chars sent)")
         print(f"  Document URL: https://docs.google.com/document/d/{document_id}/edit")
         
     except HttpError as err:
         print(f"Google API Error (Docs): {err}")
+        _report_google_error(session, err)
     except Exception as e:
         print(f"Error syncing to Google Doc: {e}")
         import traceback
         traceback.print_exc()
 
 
-def _build_health_summary_lines(health_data_list: List[dict], race_predictions: dict) -> List[str]:
+def _build_health_summary_lines(health_data_list: List[dict], race_predictions: dict,
+                                training_load: Optional[dict] = None) -> List[str]:
     """デイリーヘルスデータを Google Doc 用テキスト（行リスト）に変換する。"""
     if not health_data_list:
         return []
 
-    lines = ["## 健康データ概要（直近7日）\n\n"]
+    lines = [f"## 健康データ概要（直近{len(health_data_list)}日）\n\n"]
 
     weekdays_jp = ["月", "火", "水", "木", "金", "土", "日"]
     sorted_data = sorted(health_data_list, key=lambda x: x['date'], reverse=True)
@@ -990,6 +1004,14 @@ def _build_health_summary_lines(health_data_list: List[dict], race_predictions:
     if fitness_parts:
         lines.append(" | ".join(fitness_parts) + "\n\n")
 
+    # トレーニング負荷（training_load.TrainingLoad の最新日）
+    if training_load:
+        acwr = training_load.get('acwr')
+        lines.append(
+            f"**トレーニング負荷:** ATL {training_load['atl']} / CTL {training_load['ctl']} / "
+            f"TSB {training_load['tsb']}" + (f" / ACWR {acwr}" if acwr is not None else "") + "\n\n"
+        )
+
     # レース予測
     rp = race_predictions or {}
     rp_parts = []
@@ -1005,52 +1027,39 @@ def _build_health_summary_lines(health_data_list: List[dict], race_predictions:
 
 
 def sync_doc_from_garmin(
-    enriched_activities: List[dict],
+    enriched_activities: List[ActivityRecord],
     folder_id: str,
     service_account_json: str,
     health_data_list: List[dict] = None,
     race_predictions: dict = None,
+    session: Optional[GoogleSession] = None,
+    training_load: Optional[dict] = None,
 ) -> None:
     """Garminから取得済みのenrichedアクティビティをGoogle ドキュメントに書き込む（ランニングのみ）。"""
     print("\n--- Starting Google Doc Sync (Running Only) ---")
 
     # ランニングのみ抽出（新しい順）
-    running_acts = [
-        a for a in enriched_activities
-        if format_activity_type(
-            (a.get('activityType') or {}).get('typeKey', ''), a.get('activityName', '')
-        )[0] == 'ランニング'
-    ]
-    running_acts.sort(key=lambda a: a.get('startTimeGMT', ''), reverse=True)
+    running_acts = [r for r in build_activity_records(enriched_activities) if r.is_running]
+    running_acts.sort(key=lambda r: r.start_gmt, reverse=True)
     print(f"  {len(running_acts)} running activities found.")
 
     if not running_acts:
         print("  No running activities to write. Skipping Google Doc update.")
         return
 
-    creds = get_google_credentials(service_account_json)
-    if not creds:
+    session = session or GoogleSession(service_account_json, folder_id)
+    if not session.credentials:
         return
 
-    doc_name = "Garmin Running Log (Document)"
+    doc_name = DOCUMENT_NAME
 
     try:
-        drive_service = build('drive', 'v3', credentials=creds)
-        docs_service = build('docs', 'v1', credentials=creds)
+        docs_service = session.docs
 
-        list_query = (
-            f"'{folder_id}' in parents and trashed = false "
-            f"and mimeType = 'application/vnd.google-apps.document' "
-            f"and name = '{doc_name}'"
-        )
-        results = drive_service.files().list(
-            q=list_query, spaces='drive', fields='files(id, name)',
-            supportsAllDrives=True, includeItemsFromAllDrives=True
-        ).execute()
-        files = results.get('files', [])
-        print(f"  Drive search returned {len(files)} file(s) for '{doc_name}'.")
-
-        if not files:
+        # ID は GoogleSession がキャッシュ（前回の実行で解決済みなら Drive 検索なし）
+        document_id = session.find_document(doc_name)
+
+        if not document_id:
             print(f"\nError: Google Document '{doc_name}' not found in the folder (ID: {folder_id}).")
             print("Action Required:")
             print("1. Open Google Drive and go to your Garmin data folder.")
@@ -1060,19 +1069,22 @@ def sync_doc_from_garmin(
             print("5. Re-run this script.")
             return
 
-        document_id = files[0]['id']
         print(f"  Found document. ID: {document_id}")
 
-        # --- テキスト組み立て ---
+        # --- テキスト組み立て（セクション単位。変更のあったセクションだけ書き換える） ---
+        builder = SectionBuilder()
         now_str = datetime.now(local_tz).strftime('%Y-%m-%d %H:%M JST')
-        lines = [f"# ランニングログ (最終更新: {now_str})\n\n"]
+        lines = builder.section("header")
+        lines.append(f"# ランニングログ (最終更新: {now_str})\n\n")
         lines.append(
             "このドキュメントはGarminのランニングデータを自動的に更新します。\n"
             "AIコーチング用途として最新データを参照してください。\n\n"
         )
 
         # 健康データ要約（日次健康データがある場合）
-        health_lines = _build_health_summary_lines(health_data_list or [], race_predictions or {})
+        health_lines = _build_health_summary_lines(health_data_list or [], race_predictions or {},
+                                                   training_load)
+        lines = builder.section("health")
         if health_lines:
             lines.extend(health_lines)
         else:
@@ -1084,60 +1096,45 @@ def sync_doc_from_garmin(
 
         recent_runs = []
         older_runs = []
-        for activity in running_acts:
-            try:
-                act_dt = datetime.strptime(
-                    activity.get('startTimeGMT'), '%Y-%m-%d %H:%M:%S'
-                ).replace(tzinfo=pytz.UTC).astimezone(local_tz)
-                if act_dt >= four_weeks_ago:
-                    recent_runs.append((act_dt, activity))
-                else:
-                    older_runs.append((act_dt, activity))
-            except Exception:
-                older_runs.append((datetime.min.replace(tzinfo=local_tz), activity))
+        for rec in running_acts:
+            if rec.start_local is not None and rec.start_local >= four_weeks_ago:
+                recent_runs.append(rec)
+            else:
+                older_runs.append(rec)
 
         # ── セクション1: 直近4週（フル詳細 + ラップ） ──
+        lines = builder.section("recent")
         lines.append(f"## 直近4週のランニング詳細 ({len(recent_runs)}件)\n\n")
         written = 0
-        for act_dt, activity in recent_runs:
+        for rec in recent_runs:
             try:
+                act_dt = rec.start_local
                 date_label = f"{act_dt.strftime('%Y-%m-%d')} ({weekdays[act_dt.weekday()]})"
-                distance_km = round(activity.get('distance', 0) / 1000, 2)
-                duration_min = activity.get('duration', 0) / 60
-                m_part = int(duration_min)
-                s_part = int((duration_min - m_part) * 60)
-                time_str = f"{m_part}:{s_part:02d}"
-
-                avg_pace = format_pace(activity.get('averageSpeed', 0))
-                avg_gap_speed = activity.get('avgGradeAdjustedSpeed')
-                gap_str = format_pace(avg_gap_speed) if avg_gap_speed else None
-                avg_hr = round(activity.get('averageHR')) if activity.get('averageHR') else None
-                max_hr_val = round(activity.get('maxHR')) if activity.get('maxHR') else None
-                aerobic_te = round(activity.get('aerobicTrainingEffect', 0), 1)
-                anaerobic_te = round(activity.get('anaerobicTrainingEffect', 0), 1)
-                te_label = format_training_effect(activity.get('trainingEffectLabel', 'Unknown'))
-                calories = round(activity.get('calories', 0))
-
-                cadence = round(activity.get('averageRunningCadenceInStepsPerMinute', 0)) if activity.get('averageRunningCadenceInStepsPerMinute') else None
-                stride = round(activity.get('averageStrideLength', 0) / 100, 2) if activity.get('averageStrideLength') else None
-                gct = round(activity.get('avgGroundContactTime')) if activity.get('avgGroundContactTime') else None
-                vo = round(activity.get('avgVerticalOscillation', 0) / 10, 1) if activity.get('avgVerticalOscillation') else None
-                balance = activity.get('avgGroundContactBalance')
+                avg_hr = round(rec.avg_hr) if rec.avg_hr else None
+                max_hr_val = round(rec.max_hr) if rec.max_hr else None
+                aerobic_te = round(rec.aerobic_te, 1)
+                anaerobic_te = round(rec.anaerobic_te, 1)
+
+                cadence = round(rec.cadence_spm) if rec.cadence_spm else None
+                stride = round(rec.stride_m, 2) if rec.stride_m else None
+                gct = round(rec.gct_ms) if rec.gct_ms else None
+                vo = round(rec.vo_cm, 1) if rec.vo_cm else None
                 balance_str = None
-                if balance:
-                    left_b = round(balance / 100, 1)
+                if rec.balance_left:
+                    left_b = round(rec.balance_left, 1)
                     balance_str = f"L {left_b}% / R {round(100 - left_b, 1)}%"
 
-                laps_text = activity.get('laps_text', '')
+                laps_text = rec.laps_text
 
+                lines = builder.section(f"run:{rec.activity_id}")
                 lines.append(f"### {date_label} ランニング\n")
-                lines.append(f"- 距離: {distance_km} km / タイム: {time_str} ({avg_pace})")
-                if gap_str:
-                    lines.append(f" / GAP: {gap_str}")
-                lines.append(f" / カロリー: {calories} kcal\n")
+                lines.append(f"- 距離: {round(rec.distance_km, 2)} km / タイム: {rec.time_str} ({rec.avg_pace})")
+                if rec.gap_pace:
+                    lines.append(f" / GAP: {rec.gap_pace}")
+                lines.append(f" / カロリー: {round(rec.calories)} kcal\n")
                 if avg_hr:
                     lines.append(f"- 心拍: 平均 {avg_hr} bpm / 最大 {max_hr_val} bpm\n")
-                lines.append(f"- トレーニング効果: {te_label} (有酸素TE: {aerobic_te} / 無酸素TE: {anaerobic_te})\n")
+                lines.append(f"- トレーニング効果: {rec.te_label} (有酸素TE: {aerobic_te} / 無酸素TE: {anaerobic_te})\n")
                 dynamics_parts = []
                 if cadence: dynamics_parts.append(f"ピッチ: {cadence} spm")
                 if stride: dynamics_parts.append(f"ストライド: {stride} m")
@@ -1159,64 +1156,32 @@ def sync_doc_from_garmin(
 
         # ── セクション2: 4週以前（週次サマリーのみ） ──
         if older_runs:
+            lines = builder.section("older")
             lines.append("---\n\n")
             lines.append("## 過去のランニング（週次サマリー）\n\n")
 
-            week_groups: dict = {}
-            for act_dt, activity in older_runs:
-                week_start = (act_dt - timedelta(days=act_dt.weekday())).date()
-                week_groups.setdefault(week_start, []).append(activity)
-
-            for week_start in sorted(week_groups.keys(), reverse=True):
-                week_end = week_start + timedelta(days=6)
-                acts = week_groups[week_start]
-                count = len(acts)
-                total_dist = round(sum(a.get('distance', 0) for a in acts) / 1000, 1)
-                total_dist_m = sum(a.get('distance', 0) for a in acts)
-                total_time_s = sum(a.get('duration', 0) for a in acts)
-                avg_pace_str = format_pace(total_dist_m / total_time_s) if total_time_s and total_dist_m else ""
-                hr_list = [a.get('averageHR') for a in acts if a.get('averageHR')]
-                avg_hr_w = f" / 平均HR: {round(sum(hr_list)/len(hr_list))} bpm" if hr_list else ""
+            for week in build_rollups(older_runs).running_weeks():
+                avg_hr_w = f" / 平均HR: {week.avg_hr} bpm" if week.avg_hr is not None else ""
+                lines = builder.section(f"week:{week.week_start.isoformat()}")
                 lines.append(
-                    f"### {week_start.strftime('%Y-%m-%d')} 〜 {week_end.strftime('%m-%d')}\n"
-                    f"- {count}回 / 合計 {total_dist} km / 平均ペース: {avg_pace_str}{avg_hr_w}\n\n"
+                    f"### {week.week_start.strftime('%Y-%m-%d')} 〜 {week.week_end.strftime('%m-%d')}\n"
+                    f"- {week.count}回 / 合計 {round(week.distance_km, 1)} km / 平均ペース: {week.avg_pace}{avg_hr_w}\n\n"
                 )
 
-        full_text = "".join(lines)
-        print(f"  Built text for {written} activities ({len(full_text)} chars).")
-
-        # --- ドキュメントを全削除→再書き込み ---
-        doc = docs_service.documents().get(documentId=document_id).execute()
-        content = doc.get("body", {}).get("content", [])
-        end_index = 1
-        for element in content:
-            if "endIndex" in element:
-                end_index = element["endIndex"]
-
-        update_requests = []
-        if end_index > 2:
-            update_requests.append({
-                "deleteContentRange": {
-                    "range": {"startIndex": 1, "endIndex": end_index - 1}
-                }
-            })
-        update_requests.append({
-            "insertText": {
-                "location": {"index": 1},
-                "text": full_text
-            }
-        })
+        sections = builder.sections()
+        print(f"  Built text for {written} activities "
+              f"({sum(len(t) for _, t in sections)} chars, {len(sections)} sections).")
 
-        docs_service.documents().batchUpdate(
-            documentId=document_id,
-            body={"requests": update_requests}
-        ).execute()
+        # --- テキストが変わったセクションだけを書き換える ---
+        result = write_doc_sections(docs_service, document_id, sections)
 
-        print(f"Google Doc updated successfully! ({written} running records)")
+        print(f"Google Doc updated successfully! ({written} running records, "
+              f"{result['mode']}: {result['requests']} requests, {result['chars']} chars sent)")
         print(f"  Document URL: https://docs.google.com/document/d/{document_id}/edit")
 
     except HttpError as err:
         print(f"Google API Error (Docs): {err}")
+        _report_google_error(session, err)
     except Exception as e:
         print(f"Error syncing to Google Doc: {e}")
         import traceback
@@ -1238,9 +1203,37 @@ def _load_from_cache(token_dir):
     return client
 
 
-# リトライ設定
-AUTH_MAX_RETRIES = 3
-AUTH_INITIAL_BACKOFF = 60  # 60s → 120s → 240s
+def fetch_run_async(cookies: dict, limiter: TokenBucket, policy: RetryPolicy,
+                    activity_store: ActivityStore,
+                    enrichment_cache: EnrichmentCache, health_store: HealthStore,
+                    today_date, fetch_limit: int, health_days: int):
+    """ステップ1〜4の Garmin データを非同期パイプラインで並行取得し、プリロードクライアントを返す。
+
+    httpx がない・取得に失敗した場合は None（呼び出し側は同期の Cookie クライアントで続ける）。
+    """
+    from garmin_async_client import HAS_HTTPX, run_async_prefetch
+    if not HAS_HTTPX:
+        print("ℹ GARMIN_ASYNC=1 ですが httpx が未インストールのため同期クライアントで取得します")
+        return None
+    cutoff_date = datetime.now(local_tz) - timedelta(days=TARGET_HISTORY_DAYS)
+    print("\nFetching Garmin data with the async pipeline...")
+    started = time.monotonic()
+    try:
+        counts = run_async_prefetch(
+            cookies, ASYNC_PREFETCH_DB, limiter=limiter, policy=policy,
+            activities_limit=fetch_limit,
+            cutoff_gmt=cutoff_date.astimezone(pytz.UTC).strftime('%Y-%m-%d %H:%M:%S'),
+            activity_store=activity_store,
+            enrichment_cache=enrichment_cache,
+            health_dates=health_store.prefetch_dates(today_date, health_days),
+        )
+        print(f"  ✓ 非同期取得 {time.monotonic() - started:.1f}s: "
+              + ", ".join(f"{k} {v}" for k, v in counts.items()))
+        from garmin_preloaded_client import GarminPreloadedClient
+        return GarminPreloadedClient(ASYNC_PREFETCH_DB)
+    except Exception as e:
+        print(f"  ✗ 非同期パイプライン失敗（同期クライアントで続行）: {e}")
+        return None
 
 
 def main():
@@ -1248,6 +1241,7 @@ def main():
     garmin_email = os.getenv("GARMIN_EMAIL")
     garmin_password = os.getenv("GARMIN_PASSWORD")
     garmin_fetch_limit = int(os.getenv("GARMIN_ACTIVITIES_FETCH_LIMIT", "200"))
+    health_days = int(os.getenv("GARMIN_HEALTH_DAYS", "7"))
 
     google_json = os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON")
     drive_folder_id = os.getenv("GOOGLE_DRIVE_FOLDER_ID")
@@ -1255,11 +1249,16 @@ def main():
     token_dir = os.path.expanduser("~/.garth")
     tokens_b64 = os.getenv("GARTH_TOKENS_B64")
 
+    # すべての Garmin 呼び出しで共有するリトライポリシー（期限はここから数える）。
+    # 認証は 429 が長引きやすいので、待機の長い専用ポリシーを使う
+    retry_policy = RetryPolicy()
+    login_retry_policy = auth_policy()
+
     # ── Garmin 認証フロー ──────────────────────────────────────────────────
     # 優先度0: Cookie認証（JWT_WEB / GARMIN_SESSION_COOKIES）
     # 優先度1: GARTH_TOKENS_B64 シークレット（前回成功時に自動更新される）
     # 優先度2: Actions cache (~/.garth)
-    # 優先度3: メール+パスワードで再ログイン（指数バックオフ付きリトライ）
+    # 優先度3: メール+パスワードで再ログイン（429 等は RetryPolicy で再試行）
     #
     # NOTE: connectapi.garmin.com の OAuth exchange エンドポイントが
     #       GitHub Actions IP からレート制限される問題があるため、
@@ -1270,7 +1269,8 @@ def main():
     def _try_refresh_oauth2_direct(garth_obj) -> bool:
         """
         garth の oauth1_token を使って connectapi/exchange で oauth2 を更新する。
-        429 は呼び出し元へ伝播して _try_auth_with_retry のリトライ対象にする。
+        429・5xx・接続エラー（retry_policy.is_retryable）は呼び出し元へ伝播して
+        _try_auth_with_retry（RetryPolicy）のリトライ対象にする。
         oauth1_token が存在しない場合のみ False を返す（NonRetriable扱い）。
         """
         if not garth_obj.oauth1_token:
@@ -1280,15 +1280,14 @@ def main():
             garth_obj.refresh_oauth2()  # connectapi/exchange を使う（oauth1必須）
             return True
         except Exception as e:
-            msg = str(e)
-            if "429" in msg:
-                # レート制限 → 上位へ伝播してリトライさせる
+            if is_retryable(e):
+                # レート制限・一時的なエラー → 上位へ伝播してリトライさせる
                 raise
             print(f"    OAuth2 refresh 失敗: {e}")
             return False
 
-    def _try_auth(client_fn, label):
-        """クライアントを作成して認証テストを行う。失敗したら None を返す。
+    def _try_auth(client_fn, label, reraise=False):
+        """クライアントを作成して認証テストを行う。失敗したら None を返す（reraise=True なら例外を raise）。
         リトライしても解決しないエラーは _NonRetriableError として再 raise する。"""
         try:
             client = client_fn()
@@ -1322,35 +1321,36 @@ def main():
             raise  # _try_auth_with_retry で即時終了させる
         except Exception as e:
             print(f"✗ Garmin 認証失敗 ({label}): {e}")
+            if reraise:
+                raise
             return None
 
     def _try_auth_with_retry(client_fn, label):
-        """429 エラー時に指数バックオフ付きリトライで認証を試みる。
-        _NonRetriableError（期限切れトークン等）は即時 None を返す。"""
-        for attempt in range(1, AUTH_MAX_RETRIES + 1):
-            try:
-                result = _try_auth(client_fn, f"{label} (試行 {attempt}/{AUTH_MAX_RETRIES})")
-            except _NonRetriableError as e:
-                print(f"✗ 非リトライエラー ({label}): {e}")
-                return None
-            if result is not None:
-                return result
-            # 次の試行前にバックオフ待機
-            if attempt < AUTH_MAX_RETRIES:
-                wait = AUTH_INITIAL_BACKOFF * (2 ** (attempt - 1))
-                print(f"  ⏳ {wait}秒待機して再試行します...")
-                time.sleep(wait)
+        """認証を試み、429 などの一時的なエラーは認証用の RetryPolicy（60s → 120s、Retry-After 優先）で再試行する。
+        _NonRetriableError（期限切れトークン等）や再試行で解決しないエラーは None を返す。"""
+        attempts = []
+
+        def _attempt():
+            attempts.append(1)
+            return _try_auth(client_fn, f"{label} (試行 {len(attempts)})", reraise=True)
+
+        try:
+            return login_retry_policy.call("auth", _attempt)
+        except _NonRetriableError as e:
+            print(f"✗ 非リトライエラー ({label}): {e}")
+        except Exception:
+            pass
         return None
 
     garmin_client = None
 
     # 優先度-1: Playwright プリロードデータ（/gc-api/ が Python から 403 になる環境で確実）
-    # Playwright ステップが /tmp/garmin_prefetch.json に事前取得したデータを使う。
+    # Playwright ステップが /tmp/garmin_prefetch.db に事前取得したデータを使う。
     # connectapi.garmin.com への OAuth アクセス不要。
-    _prefetch_file = "/tmp/garmin_prefetch.json"
-    if os.path.exists(_prefetch_file):
+    # 空・古いストアは使わない（その場合は Cookie / トークン認証へ進む）
+    from garmin_preloaded_client import GarminPreloadedClient, is_available
+    if is_available():
         try:
-            from garmin_preloaded_client import GarminPreloadedClient
             _preloaded = GarminPreloadedClient()
             garmin_client = _preloaded
             print("✓ Garmin 認証成功: Playwright プリロードデータ (OAuth 不要)")
@@ -1372,6 +1372,7 @@ def main():
         if session_cookies_str:
             print("ℹ Cookie ソース: GARMIN_SESSION_COOKIES シークレット")
 
+    cookies = cookie_client = None
     if garmin_client is None and session_cookies_str:
         try:
             from garmin_cookie_client import GarminCookieClient, parse_cookie_string
@@ -1402,7 +1403,7 @@ def main():
     # 優先度3: パスワードログイン（指数バックオフ付きリトライ）
     if garmin_client is None:
         if garmin_email and garmin_password:
-            print("パスワードで再ログインします（指数バックオフ付きリトライ）...")
+            print("パスワードで再ログインします（429 等はリトライ）...")
 
             def _password_login():
                 tmp = GarminClient(garmin_email, garmin_password)
@@ -1450,8 +1451,33 @@ def main():
     except Exception as _e:
         print(f"⚠ トークン保存失敗（シークレット自動更新はスキップ）: {_e}")
 
-    # 1. Fetch Summaries
-    activities = get_all_activities(garmin_client, garmin_fetch_limit)
+    # 以降の Garmin 呼び出しはすべて共有トークンバケットを通す（429 で自動減速し、RetryPolicy で再試行する）。
+    rate_limiter = TokenBucket()
+    activity_store = ActivityStore()
+    enrichment_cache = EnrichmentCache()
+    health_store = HealthStore()
+    today_date = datetime.now(local_tz).date()
+
+    # GARMIN_ASYNC=1 で Cookie 認証のときは、ステップ1〜4の取得を非同期パイプラインで先に済ませ、
+    # 以降はその結果をプリロードクライアントで読む（同じトークンバケットを使う）。
+    if ASYNC_FETCH and cookies and garmin_client is cookie_client:
+        garmin_client = fetch_run_async(
+            cookies, rate_limiter, retry_policy, activity_store, enrichment_cache, health_store,
+            today_date, garmin_fetch_limit, health_days,
+        ) or garmin_client
+
+    from garmin_preloaded_client import GarminPreloadedClient
+    if not isinstance(garmin_client, GarminPreloadedClient):
+        garmin_client = RateLimitedClient(garmin_client, rate_limiter, retry_policy)
+        print(f"ℹ Garmin API レート上限: {rate_limiter.rate:.1f} req/s (burst {rate_limiter.capacity}), "
+              f"リトライ期限 残り {retry_policy.remaining():.0f}s")
+
+    # 1. Fetch Summaries（ローカルストアで既知の活動は再取得しない）
+    # プリロードクライアントはローカルのストアを読むだけなので、日付区間モードでもページネーションで読む
+    if ACTIVITY_FETCH_MODE == "date" and not isinstance(garmin_client, GarminPreloadedClient):
+        activities = get_activities_by_date_window(garmin_client, garmin_fetch_limit, activity_store)
+    else:
+        activities = get_all_activities(garmin_client, garmin_fetch_limit, store=activity_store)
     print(f"Fetched {len(activities)} activities.")
 
     if not activities:
@@ -1459,38 +1485,77 @@ def main():
         import sys
         sys.exit(1)
 
+    # 日時・種目・単位変換は活動ごとに1回だけ行い、以降のステップはレコードを使う
+    records = build_activity_records(activities)
+
     # 2. Fetch laps for running activities only (targeted, low API call count).
     # This runs before full enrichment so the Doc always gets lap data even if
     # the later bulk enrichment hits Garmin rate limits.
+    # 詳細キャッシュにある活動はキャッシュ済みのラップを使う。
+    # スプリットは SplitFetcher でメモ化し、ステップ6では再取得しない。
+    splits_fetcher = SplitFetcher(garmin_client)
     running_count = 0
-    for act in activities:
-        act_type = format_activity_type(
-            (act.get('activityType') or {}).get('typeKey', ''), act.get('activityName', '')
-        )[0]
-        if act_type == 'ランニング':
+    for rec in records:
+        if rec.is_running:
+            act = rec.raw
             running_count += 1
+            cached = enrichment_cache.get(act)
+            if cached is not None:
+                act['laps_text'] = cached.get('laps_text', '')
+                continue
             try:
-                act['laps_text'] = fetch_and_format_laps(garmin_client, act.get('activityId'))
+                act['laps_text'] = fetch_and_format_laps(garmin_client, act.get('activityId'), splits_fetcher)
             except Exception as e:
                 print(f"  Warning: Could not fetch laps for {act.get('activityId')}: {e}")
                 act['laps_text'] = ''
     print(f"Fetched laps for {running_count} running activities.")
 
-    # 3. Fetch daily health data (last 7 days) for AI coaching context.
+    # 3. Fetch daily health data (last GARMIN_HEALTH_DAYS days, default 7) for AI coaching context.
     # display_name が必要な API（RHR等）のために事前に取得を試みる。
     _ensure_display_name(garmin_client)
-    print("\nFetching daily health data (last 7 days)...")
-    health_data_list = []
-    today_date = datetime.now(local_tz).date()
-    for days_ago in range(7):
-        target = today_date - timedelta(days=days_ago)
-        try:
-            hd = fetch_daily_health_data(garmin_client, target)
-            health_data_list.append(hd)
-            time.sleep(0.5)  # レートリミット回避
-        except Exception as e:
-            print(f"  Warning: Daily health fetch failed for {target}: {e}")
-    print(f"Fetched daily health data for {len(health_data_list)} days.")
+    print(f"\nFetching daily health data (last {health_days} days)...")
+    # ヘルスストアに揃っている日は取得せず、今日・昨日と未取得/不完全な日だけ取得する。
+    # 日数 × 11指標を並列に取得（レートは共有トークンバケットで制御）。
+    # 歩数・ボディバッテリーは期間 API で窓全体をまとめて取得する。
+    health_dates = health_store.days_to_fetch(today_date, health_days)
+    if health_dates:
+        fetched_health, health_failures = fetch_health_window(garmin_client, health_dates)
+        health_store.update(fetched_health, health_failures)
+        health_store.save()
+        for date_str, failed in sorted(health_failures.items()):
+            print(f"  ⚠ {date_str}: 取得失敗 {', '.join(sorted(failed))}")
+    health_data_list = health_store.days(since=today_date - timedelta(days=health_days - 1))
+    print(f"Fetched daily health data for {len(health_dates)} days "
+          f"({len(health_data_list)} days available for the last {health_days} days).")
+
+    # 過去の未取得日をバックグラウンドで少しずつ埋める（ステップ7の前に合流）。
+    backfill_dates = health_store.backfill_dates(today_date, health_days)
+    backfill_thread = None
+    if backfill_dates:
+        def _backfill_health():
+            try:
+                fetched, failures = fetch_health_window(garmin_client, backfill_dates, max_workers=2)
+                health_store.update(fetched, failures)
+            except Exception as e:
+                print(f"  ⚠ ヘルスデータのバックフィル失敗: {e}")
+
+        print(f"  Backfilling health history in background: {len(backfill_dates)} days "
+              f"({backfill_dates[-1]} 〜 {backfill_dates[0]}).")
+        backfill_thread = threading.Thread(target=_backfill_health, name="health-backfill", daemon=True)
+        backfill_thread.start()
+
+    # トレーニング負荷（ATL / CTL / TSB / ACWR）。反映済みの活動はスキップし、今日まで日を進めるだけ。
+    # 初回はアクティビティストア全体から作る。ストアから消えた（Garmin 側で削除された）活動は取り消す。
+    training_load = TrainingLoad()
+    load_records = records if len(training_load) else build_activity_records(activity_store.recent())
+    load_added = training_load.add_activities(load_records)
+    load_removed = training_load.retain(activity_store)
+    load_steps = training_load.advance_to(today_date)
+    training_load.save()
+    latest_load = training_load.latest()
+    print(f"Training load: +{load_added} / -{load_removed} activities, {load_steps} days advanced"
+          + (f" (ATL {latest_load['atl']} / CTL {latest_load['ctl']} / TSB {latest_load['tsb']})"
+             if latest_load else "") + ".")
 
     # 4. Fetch race predictions (once, not date-specific).
     print("Fetching race predictions...")
@@ -1501,31 +1566,45 @@ def main():
         print("  Race predictions not available.")
 
     # 5. Sync to Google Doc (running activities + health summary).
-    if google_json and drive_folder_id:
-        sync_doc_from_garmin(activities, drive_folder_id, google_json,
+    # Google の認証情報・サービス・ファイル ID は1つのセッションで全 sync 関数が共有する。
+    google_session = GoogleSession(google_json, drive_folder_id) if google_json and drive_folder_id else None
+    if google_session:
+        sync_doc_from_garmin(records, drive_folder_id, google_json,
                              health_data_list=health_data_list,
-                             race_predictions=race_predictions)
+                             race_predictions=race_predictions,
+                             session=google_session,
+                             training_load=latest_load)
 
     # 6. Enrich Data (Fetch Details & Laps) — used for Google Sheets columns.
     # Enrichment makes multiple API calls per activity and may hit Garmin rate limits.
     # Failures are caught per-activity; unenriched activities fall back to summary data.
+    # 詳細キャッシュにヒットした活動（概要が変わっていないもの）は API を呼ばない。
+    # 未ヒット分はスレッドプールで並列取得する（レートは共有トークンバケットで制御）。
     print("\nStarting enrichment (details/laps for Sheets)...")
-    enriched_activities = []
-    for i, act in enumerate(activities):
-        enriched = garmin_enhance_activity(garmin_client, act)
-        enriched_activities.append(enriched)
-        # レートリミット回避: API呼び出し間に短い待機
-        if i < len(activities) - 1:
-            time.sleep(0.3)
-    print("Enrichment complete.")
+    enrich_activities(garmin_client, activities, cache=enrichment_cache, splits_fetcher=splits_fetcher)
+    enrichment_cache.save()
+    # 詳細取得で更新された dict から数値だけ作り直す
+    for rec in records:
+        rec.refresh_metrics()
+    print(f"Enrichment complete. (cache: {enrichment_cache.hits} hits, "
+          f"{enrichment_cache.misses} fetched, {enrichment_cache.invalidated} invalidated)")
+    print(f"  Splits: {splits_fetcher.calls} API calls, {splits_fetcher.saved_calls} saved by per-run memo.")
+
+    if backfill_thread is not None:
+        backfill_thread.join()
+        health_store.save()
+    health_history = health_store.days()
+    print(f"Health history: {len(health_history)} days stored.")
 
     # 7. Sync to Google Sheets (enriched activities + daily health tab + weekly summary tab)
-    if google_json and drive_folder_id:
-        sync_to_google_sheet(enriched_activities, drive_folder_id, google_json)
-        sync_daily_health_to_sheet(health_data_list, drive_folder_id, google_json,
-                                   race_predictions=race_predictions)
-        sync_weekly_summary_to_sheet(enriched_activities, health_data_list,
-                                     drive_folder_id, google_json)
+    if google_session:
+        sync_to_google_sheet(records, drive_folder_id, google_json, session=google_session)
+        sync_daily_health_to_sheet(health_history, drive_folder_id, google_json,
+                                   race_predictions=race_predictions, session=google_session)
+        sync_weekly_summary_to_sheet(records, health_history,
+                                     drive_folder_id, google_json, session=google_session)
+        sync_training_load_to_sheet(training_load.days(), drive_folder_id, google_json,
+                                    session=google_session)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,91 @@
+"""endpoint_routes のテスト（tmp_path に保存し、時計を差し替える）。"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from endpoint_routes import EndpointRoutes, path_template  # noqa: E402
+
+KINDS = ["dynamic", "gc-api", "direct", "proxy", "connectapi"]
+SPLITS = "/activity-service/activity/{id}/splits"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def _routes(tmp_path, clock, cooldown=900):
+    return EndpointRoutes(str(tmp_path / "routes.json"), cooldown=cooldown, clock=clock)
+
+
+def test_path_template_normalizes_ids_dates_and_query():
+    assert path_template("/activity-service/activity/123456/splits") == SPLITS
+    assert path_template("/wellness-service/wellness/dailySleepData/runner?date=2026-10-17") \
+        == "/wellness-service/wellness/dailySleepData/runner"
+    assert path_template("/hrv-service/hrv/2026-10-17") == "/hrv-service/hrv/{date}"
+    assert path_template("/usersummary-service/stats/steps/daily/2026-10-01/2026-10-17") \
+        == "/usersummary-service/stats/steps/daily/{date}/{date}"
+
+
+def test_default_order_is_unchanged_until_a_route_succeeds(tmp_path, clock):
+    routes = _routes(tmp_path, clock)
+
+    assert routes.order(SPLITS, KINDS) == KINDS
+    routes.record_success(SPLITS, "proxy")
+
+    assert routes.order(SPLITS, KINDS) == ["proxy", "dynamic", "gc-api", "direct", "connectapi"]
+    assert routes.resolved(SPLITS) == "proxy"
+    assert routes.order("/other", KINDS) == KINDS
+
+
+def test_resolved_route_missing_from_candidates_is_ignored(tmp_path, clock):
+    routes = _routes(tmp_path, clock)
+    routes.record_success(SPLITS, "connectapi")
+
+    assert routes.order(SPLITS, KINDS[:-1]) == KINDS[:-1]  # JWT_WEB がなく connectapi 候補がない
+
+
+def test_blocked_candidate_is_skipped_until_cooldown_expires(tmp_path, clock):
+    routes = _routes(tmp_path, clock, cooldown=900)
+    routes.record_success(SPLITS, "gc-api")
+    routes.record_blocked(SPLITS, "gc-api")
+
+    assert routes.order(SPLITS, KINDS) == ["dynamic", "direct", "proxy", "connectapi"]
+    assert routes.resolved(SPLITS) is None  # 遮断した候補は覚えた経路からも外す
+
+    clock.now += 901
+    assert routes.order(SPLITS, KINDS) == KINDS
+
+
+def test_success_clears_the_breaker(tmp_path, clock):
+    routes = _routes(tmp_path, clock)
+    routes.record_blocked(SPLITS, "direct")
+    routes.record_success(SPLITS, "direct")
+
+    assert routes.order(SPLITS, KINDS)[0] == "direct"
+
+
+def test_routes_and_active_breakers_persist_across_runs(tmp_path, clock):
+    routes = _routes(tmp_path, clock, cooldown=900)
+    routes.record_success(SPLITS, "proxy")
+    routes.record_blocked(SPLITS, "gc-api")
+    routes.record_blocked("/hrv-service/hrv/{date}", "gc-api")
+
+    clock.now += 300
+    reloaded = _routes(tmp_path, clock)
+    assert reloaded.order(SPLITS, KINDS) == ["proxy", "dynamic", "direct", "connectapi"]
+
+    clock.now += 700
+    expired = _routes(tmp_path, clock)
+    assert expired.order(SPLITS, KINDS) == ["proxy", "dynamic", "gc-api", "direct", "connectapi"]
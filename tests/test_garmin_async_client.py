@@ -0,0 +1,150 @@
+"""garmin_async_client のテスト（httpx.MockTransport で送信を差し替える）。"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import retry_policy  # noqa: E402
+from endpoint_routes import EndpointRoutes  # noqa: E402
+from garmin_async_client import AsyncGarminCookieClient, prefetch_run_async  # noqa: E402
+from garmin_endpoints import ACTIVITY_LIST, SOCIAL_PROFILE  # noqa: E402
+from prefetch_store import PrefetchReader, PrefetchWriter, health_key  # noqa: E402
+from rate_limiter import TokenBucket  # noqa: E402
+from retry_policy import RateLimitError, RetryPolicy  # noqa: E402
+
+PROFILE = {"displayName": "runner", "fullName": "Runner Taro"}
+SPLITS = "/activity-service/activity/1/splits"
+
+
+class _Garmin:
+    """パスごとの応答を返す MockTransport のハンドラー。gc-api 候補だけ blocked を返せる。"""
+
+    def __init__(self, routes=None, block_gc_api=False):
+        self.routes = {SOCIAL_PROFILE: PROFILE, **(routes or {})}
+        self.block_gc_api = block_gc_api
+        self.requests = []
+        self.rate_limited = 0
+
+    def __call__(self, request):
+        self.requests.append(request)
+        path = request.url.path
+        if path.startswith("/gc-api"):
+            if self.block_gc_api:
+                return httpx.Response(403)
+            path = path[len("/gc-api"):]
+        if self.rate_limited:
+            self.rate_limited -= 1
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        if path not in self.routes:
+            return httpx.Response(404)
+        return httpx.Response(200, json=self.routes[path])
+
+
+@pytest.fixture(autouse=True)
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(retry_policy.random, "uniform", lambda a, b: a)
+
+
+def _client(garmin, tmp_path):
+    return AsyncGarminCookieClient(
+        {"JWT_WEB": "jwt"},
+        limiter=TokenBucket(rate=1000, burst=100),
+        policy=RetryPolicy(deadline=60),
+        transport=httpx.MockTransport(garmin),
+        routes=EndpointRoutes(str(tmp_path / "routes.json")),
+    )
+
+
+def _run(garmin, tmp_path, fn):
+    async def _main():
+        async with _client(garmin, tmp_path) as client:
+            return await fn(client)
+    return asyncio.run(_main())
+
+
+def test_enter_authenticates_and_sets_display_name(tmp_path):
+    garmin = _Garmin()
+
+    async def _names(client):
+        return client.display_name, client.full_name
+
+    names = _run(garmin, tmp_path, _names)
+
+    assert names == ("runner", "Runner Taro")
+    assert "gzip" in garmin.requests[0].headers["Accept-Encoding"]
+    assert garmin.requests[0].url.path == "/gc-api" + SOCIAL_PROFILE
+
+
+def test_blocked_candidate_falls_back_and_is_remembered(tmp_path):
+    garmin = _Garmin({SPLITS: {"lapDTOs": []}}, block_gc_api=True)
+
+    async def _twice(client):
+        await client.get_activity_splits(1)
+        garmin.requests.clear()
+        return await client.get_activity_splits(1)
+
+    assert _run(garmin, tmp_path, _twice) == {"lapDTOs": []}
+    # 2回目は遮断中の gc-api を飛ばし、前回成功した direct を最初に試す
+    assert [r.url.path for r in garmin.requests] == [SPLITS]
+
+
+def test_429_is_retried_through_the_policy_and_throttles_the_bucket(tmp_path):
+    garmin = _Garmin({SPLITS: {"lapDTOs": [{"distance": 1000.0}]}})
+
+    async def _rate_limited(client):
+        garmin.rate_limited = 1
+        return await client.get_activity_splits(1), client.limiter.throttled, client.policy.retries
+
+    data, throttled, retries = _run(garmin, tmp_path, _rate_limited)
+
+    assert data == {"lapDTOs": [{"distance": 1000.0}]}
+    assert (throttled, retries) == (1, 1)
+
+
+def test_429_is_raised_once_the_budget_is_spent(tmp_path):
+    garmin = _Garmin({SPLITS: {}})
+
+    async def _exhausted(client):
+        client.policy.budget = 0
+        garmin.rate_limited = 1
+        await client.get_activity_splits(1)
+
+    with pytest.raises(RateLimitError):
+        _run(garmin, tmp_path, _exhausted)
+
+
+def test_prefetch_run_writes_activities_details_and_profile(tmp_path):
+    activities = [
+        {"activityId": 2, "startTimeGMT": "2026-10-16 22:00:00"},
+        {"activityId": 1, "startTimeGMT": "2026-10-15 22:00:00"},
+    ]
+    garmin = _Garmin({
+        ACTIVITY_LIST: activities,
+        SPLITS: {"lapDTOs": [{"distance": 1000.0}]},
+        "/activity-service/activity/1/details": {"activityId": 1, "geoPolylineDTO": {"big": 1}},
+    })
+    db = str(tmp_path / "prefetch.db")
+
+    async def _prefetch(client):
+        store = PrefetchWriter(db)
+        try:
+            return await prefetch_run_async(client, store, activities_limit=100,
+                                            cutoff_gmt="2026-01-01 00:00:00")
+        finally:
+            store.close()
+
+    counts = _run(garmin, tmp_path, _prefetch)
+    reader = PrefetchReader(db)
+
+    assert counts["activities"] == 2
+    assert reader.slice("activities", 0, 10) == activities
+    assert reader.get("details", 1) == {"activityId": 1}  # 巨大なキーは書く前に削る
+    assert reader.get("splits", 1) == {"lapDTOs": [{"distance": 1000.0}]}
+    assert reader.get("splits", 2) is None  # 取得に失敗した呼び出しは書かない
+    assert reader.get("health", health_key("profile")) == {"displayName": "runner"}
+    assert counts["failed_calls"] > 0
@@ -0,0 +1,105 @@
+"""fetch_health_window（複数日 × 全指標の並列取得）のテスト。
+
+本体スクリプトを import するので、requirements.txt の依存が入っていない環境ではスキップする。
+"""
+import importlib
+import os
+import sys
+import threading
+from datetime import date
+
+import pytest
+
+for _module in ("dotenv", "garminconnect", "googleapiclient", "pytz"):
+    pytest.importorskip(_module)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+main_script = importlib.import_module("ガーミン活動データ取得")
+
+
+class _FakeHealthClient:
+    """歩数・ボディバッテリー（期間 API）と HRV だけ答え、他の指標は例外にする。"""
+
+    def __init__(self, fail_hrv_on=()):
+        self.range_calls = []
+        self.daily_calls = []
+        self.fail_hrv_on = set(fail_hrv_on)
+        self._lock = threading.Lock()
+
+    def get_daily_steps(self, start, end):
+        with self._lock:
+            self.range_calls.append(("steps", start, end))
+        return [{"calendarDate": d, "totalSteps": int(d[-2:]) * 1000}
+                for d in _days_between(start, end)]
+
+    def get_body_battery(self, start, end=None):
+        with self._lock:
+            self.range_calls.append(("body_battery", start, end))
+        return [{"date": d, "bodyBatteryValuesArray": [[0, 20], [1, 90]]}
+                for d in _days_between(start, end or start)]
+
+    def get_hrv_data(self, date_str):
+        with self._lock:
+            self.daily_calls.append(("hrv", date_str))
+        if date_str in self.fail_hrv_on:
+            raise ValueError("503 Server Error")
+        return {"hrvSummary": {"lastNightAvg": 50, "weeklyAvg": 48}}
+
+    def __getattr__(self, name):
+        if name.startswith("get_"):
+            def _missing(*args):
+                raise LookupError(f"{name} not available")
+            return _missing
+        raise AttributeError(name)
+
+
+def _days_between(start, end):
+    first, last = date.fromisoformat(start), date.fromisoformat(end)
+    return [date.fromordinal(o).isoformat() for o in range(first.toordinal(), last.toordinal() + 1)]
+
+
+DATES = [date(2026, 10, 15), date(2026, 10, 16), date(2026, 10, 17), date(2026, 9, 1)]
+
+
+def test_range_metrics_are_fetched_once_per_contiguous_run():
+    client = _FakeHealthClient()
+
+    rows, _failures = main_script.fetch_health_window(client, DATES, max_workers=4)
+
+    assert sorted(client.range_calls) == [
+        ("body_battery", "2026-09-01", "2026-09-01"), ("body_battery", "2026-10-15", "2026-10-17"),
+        ("steps", "2026-09-01", "2026-09-01"), ("steps", "2026-10-15", "2026-10-17"),
+    ]
+    assert len(client.daily_calls) == len(DATES)
+    assert [r["date"] for r in rows] == [d.isoformat() for d in DATES]
+    assert rows[0]["steps"] == 15000
+    assert rows[3]["body_battery_high"] == 90
+    assert rows[2]["hrv_last_night"] == 50
+
+
+def test_failures_are_recorded_per_day_and_metric():
+    client = _FakeHealthClient(fail_hrv_on={"2026-10-16"})
+
+    rows, failures = main_script.fetch_health_window(client, DATES, max_workers=4)
+
+    assert "hrv" in failures["2026-10-16"]
+    assert "hrv" not in failures["2026-10-17"]
+    assert "hrv_last_night" not in rows[1]
+    assert rows[1]["steps"] == 16000
+    assert set(failures["2026-10-17"]) == {
+        key for key, _label, _fetch in main_script.HEALTH_METRICS
+        if key not in ("hrv", "steps", "body_battery")
+    }
+
+
+def test_per_day_mode_does_not_use_range_calls():
+    client = _FakeHealthClient()
+
+    rows, _failures = main_script.fetch_health_window(client, DATES[:2], max_workers=2, use_ranges=False)
+
+    assert sorted(client.range_calls) == [
+        ("body_battery", "2026-10-15", None), ("body_battery", "2026-10-16", None),
+        ("steps", "2026-10-15", "2026-10-15"), ("steps", "2026-10-16", "2026-10-16"),
+    ]
+    assert rows[1]["steps"] == 16000
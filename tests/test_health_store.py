@@ -0,0 +1,98 @@
+"""health_store.HealthStore のテスト（tmp_path のファイルに保存する）。"""
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from health_store import MAX_ATTEMPTS, REFRESH_DAYS, HealthStore  # noqa: E402
+
+TODAY = date(2026, 10, 17)
+
+
+def _day(days_ago, **values):
+    return {"date": (TODAY - timedelta(days=days_ago)).isoformat(), **values}
+
+
+def _store(tmp_path):
+    return HealthStore(str(tmp_path / "health.json"))
+
+
+def test_empty_store_fetches_every_recent_day_newest_first(tmp_path):
+    store = _store(tmp_path)
+
+    days = store.days_to_fetch(TODAY, 7)
+
+    assert days == [TODAY - timedelta(days=n) for n in range(7)]
+
+
+def test_complete_days_are_skipped_except_the_refresh_window(tmp_path):
+    store = _store(tmp_path)
+    store.update([_day(n, sleep_score=80) for n in range(7)])
+
+    days = store.days_to_fetch(TODAY, 7)
+
+    assert days == [TODAY - timedelta(days=n) for n in range(REFRESH_DAYS)]
+
+
+def test_incomplete_days_are_retried_until_max_attempts(tmp_path):
+    store = _store(tmp_path)
+    target = TODAY - timedelta(days=5)
+    for _ in range(MAX_ATTEMPTS):
+        assert target in store.days_to_fetch(TODAY, 7)
+        store.update([_day(5, sleep_score=70)], failures={target.isoformat(): {"hrv": "500"}})
+
+    assert target not in store.days_to_fetch(TODAY, 7)
+
+
+def test_days_with_no_data_are_incomplete(tmp_path):
+    store = _store(tmp_path)
+    store.update([_day(5, sleep_score=None)])
+
+    assert TODAY - timedelta(days=5) in store.days_to_fetch(TODAY, 7)
+
+
+def test_refetch_keeps_previous_values_for_failed_metrics(tmp_path):
+    store = _store(tmp_path)
+    store.update([_day(3, sleep_score=80, rhr=50)])
+    store.update([_day(3, sleep_score=None, rhr=49)], failures={_day(3)["date"]: {"sleep": "429"}})
+
+    assert store.days()[0] == _day(3, sleep_score=80, rhr=49)
+
+
+def test_backfill_walks_back_from_the_display_window_within_budget(tmp_path):
+    store = _store(tmp_path)
+    store.update([_day(8, rhr=50), _day(10, rhr=50)])
+
+    dates = store.backfill_dates(TODAY, 7, history_days=30, budget=3)
+
+    assert dates == [TODAY - timedelta(days=n) for n in (7, 9, 11)]
+
+
+def test_backfill_stops_at_history_days(tmp_path):
+    store = _store(tmp_path)
+
+    dates = store.backfill_dates(TODAY, 7, history_days=10, budget=100)
+
+    assert dates == [TODAY - timedelta(days=n) for n in (7, 8, 9)]
+
+
+def test_prefetch_dates_are_unique_and_oldest_first(tmp_path):
+    store = _store(tmp_path)
+
+    dates = store.prefetch_dates(TODAY, 3)
+
+    assert dates == sorted(set(dates))
+    assert dates[-1] == TODAY
+
+
+def test_save_and_reload_round_trip(tmp_path):
+    store = _store(tmp_path)
+    store.update([_day(n, rhr=50 + n) for n in range(7)])
+    store.save()
+
+    reloaded = _store(tmp_path)
+
+    assert len(reloaded) == 7
+    assert reloaded.days(since=TODAY - timedelta(days=1)) == [_day(0, rhr=50), _day(1, rhr=51)]
+    assert reloaded.days_to_fetch(TODAY, 7) == [TODAY - timedelta(days=n) for n in range(REFRESH_DAYS)]
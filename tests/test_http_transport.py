@@ -0,0 +1,123 @@
+"""http_transport のテスト（送信をモックしたアダプターで、実際の requests / urllib3 の経路を通す）。"""
+import gzip
+import importlib
+import io
+import json
+import os
+import sys
+import types
+
+import pytest
+import requests
+import urllib3.util.request
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import http_transport  # noqa: E402
+from http_transport import NOT_JSON, JsonResponse, parse_json  # noqa: E402
+
+
+class _MockAdapter(HTTPAdapter):
+    """送信しないアダプター。送ったリクエストを sent に記録し、gzip 圧縮した body を返す。"""
+
+    def __init__(self, body: bytes, content_type: str = "application/json"):
+        super().__init__()
+        self.body = body
+        self.content_type = content_type
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        self.sent.append(request)
+        raw = HTTPResponse(
+            body=io.BytesIO(gzip.compress(self.body)),
+            headers={"Content-Type": self.content_type, "Content-Encoding": "gzip"},
+            status=200,
+            preload_content=False,
+            decode_content=True,
+        )
+        return self.build_response(request, raw)
+
+
+def _session(adapter: HTTPAdapter) -> requests.Session:
+    session = requests.Session()
+    session.mount("https://", adapter)
+    http_transport.configure_session(session)
+    return session
+
+
+@pytest.fixture
+def without_brotli(monkeypatch):
+    """brotli / brotlicffi が入っていない環境を再現する（終わったら urllib3 の判定を元に戻す）。"""
+    monkeypatch.setitem(sys.modules, "brotli", None)
+    monkeypatch.setitem(sys.modules, "brotlicffi", None)
+    importlib.reload(urllib3.util.request)
+    monkeypatch.setattr(http_transport, "ACCEPT_ENCODING", urllib3.util.request.ACCEPT_ENCODING)
+    yield
+    monkeypatch.undo()
+    importlib.reload(urllib3.util.request)
+
+
+def test_configure_session_keeps_the_mounted_adapter_and_sends_accept_encoding():
+    adapter = _MockAdapter(b"{}")
+    session = _session(adapter)
+
+    session.get("https://connect.garmin.com/x")
+
+    assert session.adapters["https://"] is adapter
+    assert adapter.max_retries.total == http_transport.HTTP_CONNECT_RETRIES
+    sent = adapter.sent[0].headers
+    assert sent["Accept-Encoding"] == urllib3.util.request.ACCEPT_ENCODING
+    assert "gzip" in sent["Accept-Encoding"]
+    assert sent["Connection"] == "keep-alive"
+
+
+def test_accept_encoding_advertises_br_only_when_brotli_is_importable(monkeypatch):
+    monkeypatch.setitem(sys.modules, "brotlicffi", types.ModuleType("brotlicffi"))
+    try:
+        importlib.reload(urllib3.util.request)
+        monkeypatch.setattr(http_transport, "ACCEPT_ENCODING", urllib3.util.request.ACCEPT_ENCODING)
+        adapter = _MockAdapter(b"{}")
+        _session(adapter).get("https://connect.garmin.com/x")
+    finally:
+        monkeypatch.undo()
+        importlib.reload(urllib3.util.request)
+
+    assert "br" in adapter.sent[0].headers["Accept-Encoding"].split(",")
+
+
+def test_accept_encoding_falls_back_without_brotli(without_brotli):
+    adapter = _MockAdapter(b"{}")
+    session = _session(adapter)
+
+    session.get("https://connect.garmin.com/x")
+
+    encodings = adapter.sent[0].headers["Accept-Encoding"].split(",")
+    assert "br" not in encodings
+    assert {"gzip", "deflate"} <= set(encodings)
+
+
+def test_body_is_decoded_and_parsed_once(monkeypatch):
+    adapter = _MockAdapter(json.dumps({"activityId": 1, "name": "ラン"}).encode())
+    session = _session(adapter)
+    calls = []
+    loads = json.loads
+    monkeypatch.setattr(json, "loads", lambda s, **kw: calls.append(s) or loads(s, **kw))
+
+    r = session.get("https://connect.garmin.com/x")
+    data = parse_json(r)
+    wrapped = JsonResponse(r, data)
+
+    assert data == {"activityId": 1, "name": "ラン"}
+    assert wrapped.json() is data
+    assert wrapped.json() is data
+    assert len(calls) == 1
+    assert isinstance(calls[0], bytes)  # 展開済みの bytes をそのまま解析する（text へのデコードを挟まない）
+
+
+def test_html_body_is_not_json():
+    adapter = _MockAdapter(b"<html>login</html>", content_type="text/html; charset=utf-8")
+    session = _session(adapter)
+
+    assert parse_json(session.get("https://connect.garmin.com/x")) is NOT_JSON
@@ -0,0 +1,142 @@
+"""Playwright ステップの活動エンドポイント事前取得（_prefetch_activity_endpoint）のテスト。
+
+ブラウザの代わりに、evaluate に渡された JS からタスク一覧を読んで応答を返す偽の page を使う。
+"""
+import importlib.util
+import json
+import os
+import re
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from local_cache import load_json, save_json  # noqa: E402
+from prefetch_store import PrefetchReader, PrefetchWriter  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def playwright_script():
+    # スクリプトは import 時に GARMIN_EMAIL / GARMIN_PASSWORD を要求する
+    env = {"GARMIN_EMAIL": "runner@example.com", "GARMIN_PASSWORD": "x"}
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    try:
+        spec = importlib.util.spec_from_file_location(
+            "refresh_garmin_cookies_playwright",
+            os.path.join(ROOT, "scripts", "refresh_garmin_cookies_playwright.py"),
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+class _FakePage:
+    """url → JSON の表で応答する。evaluate ごとのタスクを tasks に記録する。"""
+
+    def __init__(self, responses, throttled=0, fail_calls=()):
+        self.responses = responses
+        self.throttled = throttled
+        self.fail_calls = set(fail_calls)
+        self.scripts = []
+        self.tasks = []
+
+    def evaluate(self, script):
+        self.scripts.append(script)
+        if len(self.scripts) in self.fail_calls:
+            raise RuntimeError("Target closed")
+        tasks = json.loads(re.search(r"const tasks = (\[.*?\]);", script).group(1))
+        self.tasks.append(tasks)
+        out = []
+        for task in tasks:
+            for url in task["urls"]:
+                if url in self.responses:
+                    out.append({"id": task["id"], "data": self.responses[url]})
+                    break
+        return {"out": out, "throttled": self.throttled}
+
+
+def _url(aid, endpoint):
+    return f"/gc-api/activity-service/activity/{aid}{endpoint}"
+
+
+@pytest.fixture
+def store(tmp_path):
+    writer = PrefetchWriter(str(tmp_path / "prefetch.db"))
+    yield writer
+    writer.close()
+
+
+def test_fetches_only_uncached_ids_and_writes_cache_once(playwright_script, tmp_path, store, monkeypatch):
+    cache_file = str(tmp_path / "splits.json")
+    save_json(cache_file, {"1": {"lapDTOs": ["cached"]}, "old": {"lapDTOs": ["stale"]}})
+    page = _FakePage({
+        _url("2", "/splits"): {"lapDTOs": ["fetched"]},
+        _url("3", "/typedsplits"): {"lapDTOs": ["typed"]},
+    })
+    saves = []
+    monkeypatch.setattr(playwright_script, "save_json", lambda path, data: saves.append(path) or save_json(path, data))
+
+    stored = playwright_script._prefetch_activity_endpoint(
+        page, {}, ["1", "2", "3", "4"], ["/splits", "/typedsplits"], "スプリット", cache_file, store, "splits",
+    )
+
+    assert [t["id"] for t in page.tasks[0]] == ["2", "3", "4"]
+    assert page.tasks[0][0]["urls"] == [_url("2", "/splits"), _url("2", "/typedsplits")]
+    assert f"const concurrency = {playwright_script.PREFETCH_CONCURRENCY};" in page.scripts[0]
+    assert stored == 3
+    assert saves == [cache_file]
+    # 対象外になった活動（old）はキャッシュから消え、応答のなかった活動（4）は書かない
+    assert load_json(cache_file, {}) == {
+        "1": {"lapDTOs": ["cached"]}, "2": {"lapDTOs": ["fetched"]}, "3": {"lapDTOs": ["typed"]},
+    }
+    reader = PrefetchReader(store.path)
+    assert reader.get("splits", "3") == {"lapDTOs": ["typed"]}
+    assert reader.get("splits", "4") is None
+
+
+def test_empty_responses_are_cached_but_not_stored(playwright_script, tmp_path, store):
+    cache_file = str(tmp_path / "weather.json")
+    page = _FakePage({_url("1", "/weather"): {}})
+
+    stored = playwright_script._prefetch_activity_endpoint(
+        page, {}, ["1"], ["/weather"], "天気", cache_file, store, "weather",
+    )
+
+    assert stored == 0
+    assert load_json(cache_file, {}) == {"1": {}}
+    assert PrefetchReader(store.path).count("weather") == 0
+
+
+def test_window_ids_keep_cache_entries_outside_this_fetch(playwright_script, tmp_path, store):
+    cache_file = str(tmp_path / "splits.json")
+    save_json(cache_file, {"9": {"lapDTOs": ["intercepted earlier"]}, "old": {}})
+    page = _FakePage({_url("2", "/splits"): {"lapDTOs": ["fetched"]}})
+
+    playwright_script._prefetch_activity_endpoint(
+        page, {}, ["2"], ["/splits"], "スプリット", cache_file, store, "splits", window_ids=["2", "9"],
+    )
+
+    assert set(load_json(cache_file, {})) == {"2", "9"}
+
+
+def test_failed_chunk_keeps_progress_from_earlier_chunks(playwright_script, tmp_path, store):
+    cache_file = str(tmp_path / "details.json")
+    ids = [str(i) for i in range(60)]  # 50 件ずつ evaluate するので 2 回目の呼び出しが失敗する
+    page = _FakePage({_url(aid, "/details"): {"activityId": aid} for aid in ids}, fail_calls={2})
+
+    stored = playwright_script._prefetch_activity_endpoint(
+        page, {}, ids, ["/details"], "詳細", cache_file, store, "details",
+    )
+
+    assert stored == 50
+    assert len(load_json(cache_file, {})) == 50
+    assert PrefetchReader(store.path).count("details") == 50
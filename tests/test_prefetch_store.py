@@ -0,0 +1,97 @@
+"""prefetch_store と GarminPreloadedClient のテスト（tmp_path の SQLite に書いて読み戻す）。"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from garmin_preloaded_client import GarminPreloadedClient, is_available  # noqa: E402
+from prefetch_store import PrefetchReader, PrefetchWriter, health_key  # noqa: E402
+
+
+def _activity(aid, name=""):
+    return {"activityId": aid, "activityName": name or f"run {aid}"}
+
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / "prefetch.db")
+
+
+def test_round_trip_keeps_fetch_order_and_ids(db):
+    writer = PrefetchWriter(db)
+    writer.append("activities", [(a["activityId"], a) for a in map(_activity, (30, 20, 10))])
+    writer.append("splits", [(20, {"lapDTOs": [{"distance": 1000.0}]})])
+    writer.close()
+
+    reader = PrefetchReader(db)
+
+    assert reader.count("activities") == 3
+    assert [a["activityId"] for a in reader.slice("activities", 0, 10)] == [30, 20, 10]
+    assert [a["activityId"] for a in reader.slice("activities", 1, 1)] == [20]
+    assert reader.get("splits", "20") == {"lapDTOs": [{"distance": 1000.0}]}
+    assert reader.get("splits", 10, []) == []
+    assert reader.count("weather") == 0
+
+
+def test_rewriting_an_id_updates_data_but_keeps_its_position(db):
+    writer = PrefetchWriter(db)
+    writer.append("activities", [(1, _activity(1)), (2, _activity(2))])
+    writer.append("activities", [(1, _activity(1, "edited")), (3, _activity(3))])
+    writer.close()
+
+    reader = PrefetchReader(db)
+
+    assert reader.count("activities") == 3
+    assert [a["activityName"] for a in reader.slice("activities", 0, 10)] == ["edited", "run 2", "run 3"]
+
+
+def test_reopening_without_reset_continues_sequence(db):
+    writer = PrefetchWriter(db)
+    writer.append("activities", [(1, _activity(1))])
+    writer.close()
+    writer = PrefetchWriter(db, reset=False)
+    writer.append("activities", [(2, _activity(2))])
+    writer.close()
+
+    assert [a["activityId"] for a in PrefetchReader(db).slice("activities", 0, 10)] == [1, 2]
+
+
+def test_reset_discards_the_previous_run(db):
+    writer = PrefetchWriter(db)
+    writer.append("activities", [(1, _activity(1))])
+    writer.close()
+    PrefetchWriter(db).close()
+
+    assert PrefetchReader(db).count("activities") == 0
+    assert not is_available(db)
+
+
+def test_preloaded_client_reads_activities_and_health(db):
+    writer = PrefetchWriter(db)
+    writer.append("activities", [(1, _activity(1))])
+    writer.append("health", [
+        (health_key("hrv", "2026-10-17"), {"lastNightAvg": 48}),
+        (health_key("steps", "2026-10-16"), {"totalSteps": 9000}),
+        (health_key("steps", "2026-10-17"), {}),
+        (health_key("profile"), {"displayName": "runner"}),
+    ])
+    writer.close()
+
+    assert is_available(db)
+    client = GarminPreloadedClient(db)
+
+    assert client.get_activities(0, 20) == [_activity(1)]
+    assert client.get_activity_splits(1) == []
+    assert client.get_hrv_data("2026-10-17") == {"lastNightAvg": 48}
+    assert client.get_daily_steps("2026-10-16", "2026-10-17") == [{"totalSteps": 9000}]
+    assert client.display_name == "runner"
+    with pytest.raises(LookupError):
+        client.get_sleep_data("2026-10-17")  # 事前取得していない指標は取得失敗として扱う
+
+
+def test_missing_store_is_not_available(db):
+    assert not is_available(db)
+    with pytest.raises(FileNotFoundError):
+        GarminPreloadedClient(db)
@@ -0,0 +1,138 @@
+"""rate_limiter.TokenBucket / RateLimitedClient のテスト（時計を差し替えて実時間は待たない）。"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from rate_limiter import MIN_RATE, RateLimitedClient, TokenBucket  # noqa: E402
+from retry_policy import RateLimitError, RetryPolicy  # noqa: E402
+
+
+class FakeClock:
+    """sleep で時刻が進むだけの時計。"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _bucket(clock, rate=2.0, burst=2):
+    return TokenBucket(rate=rate, burst=burst, clock=clock, sleep=clock.sleep)
+
+
+def test_burst_then_refill_at_rate():
+    clock = FakeClock()
+    bucket = _bucket(clock)
+
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.5)  # 2 req/s なので次の1トークンは 0.5 秒後
+    clock.now += 0.5
+    assert bucket.try_acquire() == 0
+    assert bucket.waited == pytest.approx(0.5)
+
+
+def test_acquire_sleeps_until_a_token_is_available():
+    clock = FakeClock()
+    bucket = _bucket(clock, rate=4.0, burst=1)
+
+    for _ in range(5):
+        bucket.acquire()
+
+    assert clock.now - 100.0 == pytest.approx(1.0)  # 1トークン目は即時、残り4つは 0.25 秒ずつ
+    assert sum(clock.sleeps) == pytest.approx(1.0)
+
+
+def test_tokens_do_not_exceed_capacity():
+    clock = FakeClock()
+    bucket = _bucket(clock, rate=2.0, burst=3)
+    clock.now += 60
+
+    assert [bucket.try_acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.try_acquire() > 0
+
+
+def test_rate_limit_halves_rate_and_success_recovers_additively():
+    clock = FakeClock()
+    bucket = _bucket(clock, rate=2.0)
+
+    bucket.on_rate_limited()
+    assert bucket.rate == pytest.approx(1.0)
+    bucket.on_rate_limited()
+    assert bucket.rate == pytest.approx(0.5)
+    assert bucket.throttled == 2
+
+    bucket.on_success()
+    assert bucket.rate == pytest.approx(0.6)  # 設定レートの 5% ずつ戻す
+    for _ in range(100):
+        bucket.on_success()
+    assert bucket.rate == pytest.approx(2.0)
+
+
+def test_rate_never_drops_below_minimum():
+    clock = FakeClock()
+    bucket = _bucket(clock, rate=0.2)
+
+    for _ in range(10):
+        bucket.on_rate_limited()
+
+    assert bucket.rate == pytest.approx(MIN_RATE)
+
+
+def test_retry_after_pauses_the_whole_bucket_with_negative_tokens():
+    clock = FakeClock()
+    bucket = _bucket(clock, rate=2.0, burst=4)
+
+    bucket.on_rate_limited(retry_after=5)
+
+    # レートは 1 req/s。トークンは -5 なので、次の1トークンまで Retry-After + 1 秒
+    assert bucket.try_acquire() == pytest.approx(6.0)
+    clock.now += 5.9
+    assert bucket.try_acquire() > 0
+    clock.now += 0.1
+    assert bucket.try_acquire() == 0
+
+
+def test_rate_limit_without_retry_after_discards_saved_tokens():
+    clock = FakeClock()
+    bucket = _bucket(clock, rate=2.0, burst=4)
+
+    bucket.on_rate_limited()
+
+    assert bucket.try_acquire() == pytest.approx(1.0)
+
+
+class _FlakyClient:
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self.calls = 0
+        self.display_name = "runner"
+
+    def get_activity_splits(self, activity_id):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return {"activityId": activity_id}
+
+
+def test_rate_limited_client_retries_429_and_throttles_the_bucket():
+    clock = FakeClock()
+    bucket = _bucket(clock, rate=2.0)
+    client = _FlakyClient([RateLimitError("429 Too Many Requests", retry_after=3)])
+    policy = RetryPolicy(deadline=600, clock=clock, sleep=clock.sleep)
+    wrapped = RateLimitedClient(client, bucket, policy)
+
+    assert wrapped.get_activity_splits(1) == {"activityId": 1}
+    assert client.calls == 2
+    assert bucket.throttled == 1
+    assert policy.retries == 1
+    assert wrapped.display_name == "runner"
@@ -0,0 +1,163 @@
+"""retry_policy のテスト（時計を差し替えて実時間は待たない）。"""
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from retry_policy import (  # noqa: E402
+    AUTH_BASE_WAIT, RateLimitError, RetryPolicy, auth_policy, is_rate_limit_error, is_retryable,
+    parse_retry_after, retry_after_seconds,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _http_error(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.HTTPError(f"{status} Error", response=response)
+
+
+def _failing(errors, result="ok"):
+    errors = list(errors)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return result
+    return fn, calls
+
+
+def _policy(clock, **kwargs):
+    return RetryPolicy(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_rate_limit_detection_ignores_429_inside_ids_and_urls():
+    assert is_rate_limit_error(RateLimitError("x"))
+    assert is_rate_limit_error(_http_error(429))
+    assert is_rate_limit_error(ValueError("429 Client Error: Too Many Requests for url"))
+    assert not is_rate_limit_error(ValueError("404 for /activity-service/activity/14290/splits"))
+    assert not is_rate_limit_error(ValueError("no data for 2024-04-29"))
+
+
+def test_rate_limit_detection_follows_the_cause_chain():
+    try:
+        try:
+            raise _http_error(429)
+        except requests.HTTPError as e:
+            raise RuntimeError("wrapped") from e
+    except RuntimeError as e:
+        assert is_rate_limit_error(e)
+
+
+def test_retryable_errors():
+    assert is_retryable(_http_error(503))
+    assert is_retryable(requests.ConnectionError("reset"))
+    assert not is_retryable(_http_error(404))
+    assert not is_retryable(ValueError("bad json"))
+
+
+def test_retry_after_header_and_exception_attribute():
+    assert parse_retry_after("7") == 7
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0  # 過去の日付は 0 秒
+    assert retry_after_seconds(_http_error(429, {"Retry-After": "12"})) == 12
+    assert retry_after_seconds(RateLimitError("429", retry_after=3)) == 3
+
+
+def test_call_retries_transient_errors_then_succeeds():
+    clock = FakeClock()
+    policy = _policy(clock, deadline=600)
+    fn, calls = _failing([_http_error(503), _http_error(502)])
+
+    assert policy.call("splits", fn) == "ok"
+    assert len(calls) == 3
+    assert policy.retries == 2
+    # フルジッター: attempt 回目の失敗後は 0〜base_wait * 2**attempt 秒
+    assert 0 <= clock.sleeps[0] <= 4 and 0 <= clock.sleeps[1] <= 8
+
+
+def test_non_retryable_error_is_raised_without_waiting():
+    clock = FakeClock()
+    policy = _policy(clock)
+    fn, calls = _failing([_http_error(404)])
+
+    with pytest.raises(requests.HTTPError):
+        policy.call("splits", fn)
+    assert len(calls) == 1
+    assert clock.sleeps == []
+
+
+def test_retry_after_is_honoured_with_small_jitter():
+    clock = FakeClock()
+    policy = _policy(clock, deadline=600)
+    fn, _ = _failing([RateLimitError("429", retry_after=30)])
+
+    policy.call("details", fn)
+
+    assert 30 <= clock.sleeps[0] <= 30 + 3 + 0.5
+
+
+def test_max_attempts_caps_retries():
+    clock = FakeClock()
+    policy = _policy(clock, deadline=600, max_attempts=3)
+    fn, calls = _failing([_http_error(503)] * 5)
+
+    with pytest.raises(requests.HTTPError):
+        policy.call("splits", fn)
+    assert len(calls) == 3
+
+
+def test_endpoint_budget_is_shared_across_calls_and_separate_per_endpoint():
+    clock = FakeClock()
+    policy = _policy(clock, deadline=600, budget=2)
+
+    policy.call("splits", _failing([_http_error(503)])[0])
+    fn, calls = _failing([_http_error(503)] * 2)
+    with pytest.raises(requests.HTTPError):
+        policy.call("splits", fn)
+    assert len(calls) == 2  # 予算の残り 1 回だけ再試行した
+
+    fn, calls = _failing([_http_error(503)])
+    assert policy.call("weather", fn) == "ok"
+    assert policy.retries == 3
+
+
+def test_deadline_stops_retries_whose_wait_would_overrun():
+    clock = FakeClock()
+    policy = _policy(clock, deadline=100)
+    clock.now = 80
+    fn, calls = _failing([RateLimitError("429", retry_after=30)])
+
+    with pytest.raises(RateLimitError):
+        policy.call("health", fn)
+    assert len(calls) == 1
+    assert clock.sleeps == []
+    assert policy.remaining() == pytest.approx(20)
+
+
+def test_auth_policy_waits_a_minute_then_two():
+    policy = auth_policy()
+    first = policy.next_wait("auth", _http_error(429), 1)
+    second = policy.next_wait("auth", _http_error(429), 2)
+
+    assert AUTH_BASE_WAIT * 2 <= first <= AUTH_BASE_WAIT * 2 * 1.2
+    assert AUTH_BASE_WAIT * 4 <= second <= AUTH_BASE_WAIT * 4 * 1.2
+    assert policy.next_wait("auth", _http_error(429), 3) is None
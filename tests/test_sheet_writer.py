@@ -0,0 +1,85 @@
+"""sheet_writer の差分判定（シートから読み戻した値との比較）のテスト。"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sheet_writer import _normalize_cell, _rows_equal, write_rows_diff  # noqa: E402
+
+
+class _Request:
+    def __init__(self, result=None, log=None, call=None):
+        self._result = result or {}
+        self._log = log
+        self._call = call
+
+    def execute(self):
+        if self._log is not None:
+            self._log.append(self._call)
+        return self._result
+
+
+class _FakeSheets:
+    """values().get が current を返し、書き込み系の呼び出しを calls に記録する。"""
+
+    def __init__(self, current):
+        self.current = current
+        self.calls = []
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def get(self, **kwargs):
+        return _Request({"values": self.current})
+
+    def batchUpdate(self, **kwargs):
+        return _Request(log=self.calls, call=kwargs)
+
+
+class _FakeSession:
+    def __init__(self, current):
+        self.sheets = _FakeSheets(current)
+
+    def ensure_tab(self, spreadsheet_id, title):
+        return 0
+
+
+def test_time_strings_match_their_sheets_readback():
+    # USER_ENTERED で書いた H:MM / H:MM:SS は Sheets で時刻・時間になり、秒付きで読み戻る
+    assert _normalize_cell("19:30") == _normalize_cell("19:30:00")
+    assert _normalize_cell("1:05:30") == _normalize_cell("1:05:30")
+    assert _normalize_cell("5:03") == _normalize_cell("5:03:00")
+    assert _normalize_cell("19:30") != _normalize_cell("19:31:00")
+    assert _normalize_cell("5:03 /km") == "5:03 /km"
+
+
+def test_rows_with_time_cells_are_unchanged():
+    old = ["2026-10-17", "23:10:00", "1:05:30", 42]
+    new = ["2026-10-17", "23:10", "1:05:30", 42]
+    assert _rows_equal(old, new)
+
+
+def test_write_rows_diff_skips_rows_that_only_differ_by_time_format():
+    header = ["日付", "就寝", "睡眠時間"]
+    session = _FakeSession([header, ["2026-10-16", "23:10:00", "7:05:00"],
+                            ["2026-10-17", "22:45:00", "6:50:00"]])
+    rows = [["2026-10-16", "23:10", "7:05"], ["2026-10-17", "22:45", "6:50"]]
+
+    stats = write_rows_diff(session, "sheet", "Daily Health", header, rows)
+
+    assert stats["unchanged"] == 2
+    assert stats["rows_written"] == 0
+    assert session.sheets.calls == []
+
+
+def test_write_rows_diff_rewrites_rows_whose_time_changed():
+    header = ["日付", "就寝"]
+    session = _FakeSession([header, ["2026-10-17", "22:45:00"]])
+
+    stats = write_rows_diff(session, "sheet", "Daily Health", header, [["2026-10-17", "23:00"]])
+
+    assert stats["updated"] == 1
+    assert stats["rows_written"] == 1
@@ -0,0 +1,80 @@
+"""split_fetcher.SplitFetcher のメモ化のテスト。"""
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from split_fetcher import SplitFetcher  # noqa: E402
+
+
+class _CountingClient:
+    def __init__(self, fail_first=0):
+        self.calls = []
+        self.fail_first = fail_first
+        self._lock = threading.Lock()
+
+    def get_activity_splits(self, activity_id):
+        with self._lock:
+            self.calls.append(activity_id)
+            if self.fail_first:
+                self.fail_first -= 1
+                raise ValueError("503")
+        return {"lapDTOs": [{"activityId": activity_id}]}
+
+
+def test_same_activity_is_fetched_once_regardless_of_id_type():
+    client = _CountingClient()
+    fetcher = SplitFetcher(client)
+
+    first = fetcher.get_activity_splits(123)
+    again = fetcher.get_activity_splits("123")
+    other = fetcher.get_activity_splits(456)
+
+    assert again is first
+    assert other["lapDTOs"][0]["activityId"] == 456
+    assert client.calls == [123, 456]
+    assert (fetcher.calls, fetcher.saved_calls) == (2, 1)
+
+
+def test_failures_are_not_memoized():
+    client = _CountingClient(fail_first=1)
+    fetcher = SplitFetcher(client)
+
+    with pytest.raises(ValueError):
+        fetcher.get_activity_splits(1)
+    assert fetcher.get_activity_splits(1) == {"lapDTOs": [{"activityId": 1}]}
+    assert client.calls == [1, 1]
+    assert fetcher.calls == 1
+
+
+def test_empty_results_are_memoized():
+    class _Empty:
+        calls = 0
+
+        def get_activity_splits(self, activity_id):
+            self.calls += 1
+            return []
+
+    client = _Empty()
+    fetcher = SplitFetcher(client)
+
+    assert fetcher.get_activity_splits(1) == []
+    assert fetcher.get_activity_splits(1) == []
+    assert client.calls == 1
+
+
+def test_shared_across_threads():
+    client = _CountingClient()
+    fetcher = SplitFetcher(client)
+    ids = [1, 2, 3] * 20
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(fetcher.get_activity_splits, ids))
+    list(map(fetcher.get_activity_splits, ids))
+
+    assert sorted(set(client.calls)) == [1, 2, 3]
+    assert fetcher.calls + fetcher.saved_calls == len(ids) * 2